@@ -0,0 +1,228 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Optional
+import asyncio
+import itertools
+import time
+import weakref
+import metrics
+
+# ----------------------------------------
+# Admission control
+# ----------------------------------------
+# Request priorities, most important first
+INTERACTIVE, STANDARD, BATCH = 0, 1, 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", STANDARD: "standard", BATCH: "batch"}
+
+class Overloaded(Exception):
+    """The admission queue is full (or this request was pushed out of it)"""
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before it finished"""
+
+class ClientDisconnected(Exception):
+    """The client went away before the request finished"""
+
+class AdmissionController:
+    """
+    At most `max_concurrency` requests run at once; up to `max_queue` more
+    wait for a slot, most important priority first (FIFO within one).
+
+    When the queue is full, a request either pushes out the least
+    important waiter (if it is more important) or is rejected with
+    `Overloaded` right away, so callers can shed load with a 503 instead
+    of queueing without bound. `max_concurrency <= 0` admits everything.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, name: str = "api"):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.name = name
+        self.active = 0
+        self._waiters = []  # [priority, sequence, future]; few enough to scan
+        self._sequence = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        self._drop_abandoned()
+        return len(self._waiters)
+
+    def _drop_abandoned(self):
+        """Forget waiters whose future is already done (cancelled before their task could clean up)"""
+        if any(waiter[2].done() for waiter in self._waiters):
+            self._waiters = [waiter for waiter in self._waiters if not waiter[2].done()]
+
+    def _free(self) -> bool:
+        return self.max_concurrency <= 0 or (self.active < self.max_concurrency and not self._waiters)
+
+    def has_room(self, priority: int) -> bool:
+        """Whether a request of `priority` would be admitted or queued right now"""
+        self._drop_abandoned()
+        return (self._free() or len(self._waiters) < self.max_queue
+                or any(waiter[0] > priority for waiter in self._waiters))
+
+    async def acquire(self, priority: int):
+        self._drop_abandoned()
+        if self._free():
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            worst = max(self._waiters, default=None)
+            if worst is None or worst[0] <= priority:
+                metrics.incr("admission_rejected", priority=PRIORITY_NAMES.get(priority, priority))
+                raise Overloaded(f"Server overloaded: {self.active} running, {len(self._waiters)} queued")
+            self._waiters.remove(worst)
+            metrics.incr("admission_rejected", priority=PRIORITY_NAMES.get(worst[0], worst[0]))
+            worst[2].set_exception(Overloaded("Server overloaded: pushed out of the queue by a more important request"))
+
+        waiter = [priority, next(self._sequence), asyncio.get_running_loop().create_future()]
+        self._waiters.append(waiter)
+        try:
+            await waiter[2]
+        except BaseException:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter[2].done() and not waiter[2].cancelled() and waiter[2].exception() is None:
+                self.release()  # granted a slot just as the waiter was cancelled
+            raise
+
+    def release(self):
+        """Hand the slot to the most important waiter, or free it"""
+        self._drop_abandoned()
+        if self._waiters:
+            waiter = min(self._waiters)
+            self._waiters.remove(waiter)
+            waiter[2].set_result(None)
+        else:
+            self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int = STANDARD):
+        """Hold a slot for the block; the wait is recorded as `queue` in the request timings"""
+        with metrics.timer("admission_wait_seconds", key="queue", priority=PRIORITY_NAMES.get(priority, priority)):
+            await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+# ----------------------------------------
+# Deadlines and cancellation
+# ----------------------------------------
+def deadline_after(timeout_ms: Optional[float]) -> Optional[float]:
+    """Monotonic deadline `timeout_ms` from now, or None for no deadline"""
+    return time.monotonic() + timeout_ms / 1000.0 if timeout_ms else None
+
+async def guard(awaitable: Awaitable, deadline: Optional[float] = None,
+                is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None, poll_interval: float = 0.1):
+    """
+    Await `awaitable` in its own task and cancel it when the deadline
+    passes (`DeadlineExceeded`) or `is_disconnected()` turns true
+    (`ClientDisconnected`). Cancellation reaches whatever the task is
+    awaiting, e.g. an in-flight LLM request.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            timeout = poll_interval if is_disconnected else None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    metrics.incr("requests_cancelled", reason="deadline")
+                    raise DeadlineExceeded("Deadline exceeded")
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if done:
+                return task.result()
+            if is_disconnected and await is_disconnected():
+                metrics.incr("requests_cancelled", reason="disconnect")
+                raise ClientDisconnected("Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+_spawned = ContextVar("spawned", default=None)  # tasks started inside the current `cancel_leftover_tasks` block
+
+def _track_spawned(loop: asyncio.AbstractEventLoop):
+    """Install (once per loop) a task factory that records new tasks in the creator's `_spawned` set"""
+    factory = loop.get_task_factory()
+    if getattr(factory, "tracks_spawned", False):
+        return
+
+    def tracking_factory(loop, coro, **kwargs):
+        task = factory(loop, coro, **kwargs) if factory else asyncio.Task(coro, loop=loop, **kwargs)
+        spawned = _spawned.get()
+        if spawned is not None:
+            spawned.add(task)
+        return task
+
+    tracking_factory.tracks_spawned = True
+    loop.set_task_factory(tracking_factory)
+
+@asynccontextmanager
+async def cancel_leftover_tasks():
+    """
+    Cancel the tasks started inside the block that are still pending when
+    it exits. LangGraph does not cancel its stream waiter when a run is
+    interrupted (deadline, disconnect), which would otherwise stay pending
+    until it is garbage collected.
+    """
+    spawned = weakref.WeakSet()
+    _track_spawned(asyncio.get_running_loop())
+    outer = _spawned.get()
+    _spawned.set(spawned)
+    try:
+        yield
+    finally:
+        _spawned.set(outer)
+        leftovers = [task for task in spawned if not task.done()]
+        for task in leftovers:
+            task.cancel()
+        if leftovers:
+            await asyncio.wait(leftovers)
+
+_END = object()  # closes the pump's queue
+
+async def iterate_until(iterator: AsyncIterator, deadline: Optional[float]) -> AsyncIterator:
+    """
+    Items of `iterator` until the deadline passes, then `DeadlineExceeded`.
+    The iterator is driven from one pump task, which is cancelled and
+    awaited on the way out, so the iterator is closed in the task that ran
+    it rather than left to the garbage collector.
+    """
+    if deadline is None:
+        try:
+            async for item in iterator:
+                yield item
+        finally:
+            await iterator.aclose()
+        return
+
+    items = asyncio.Queue(maxsize=1)
+
+    async def pump():
+        try:
+            async for item in iterator:
+                await items.put((item, None))
+            await items.put((_END, None))
+        except Exception as e:
+            await items.put((_END, e))
+        finally:
+            await iterator.aclose()
+
+    task = asyncio.ensure_future(pump())
+    try:
+        while True:
+            try:
+                item, error = await asyncio.wait_for(items.get(), max(deadline - time.monotonic(), 0.0))
+            except asyncio.TimeoutError:
+                metrics.incr("requests_cancelled", reason="deadline")
+                raise DeadlineExceeded("Deadline exceeded")
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        task.cancel()
+        await asyncio.wait({task})
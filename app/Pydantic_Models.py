@@ -1,10 +1,18 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 from datetime import datetime
+from corpora import CORPUS_NAME_PATTERN
+
+FilterValue = Union[str, int, float, bool]
 
 class QueryRequest(BaseModel):
     """Request model for query endpoint"""
     query: str = Field(..., min_length=1, max_length=2000, description="User query")
+    session_id: Optional[str] = Field(None, min_length=1, max_length=128, description="Continue a conversation; omit for a one-off query")
+    rerank: Optional[bool] = Field(None, description="Rerank retrieved candidates with the cross-encoder; omit for the server default")
+    timeout_ms: Optional[int] = Field(None, ge=1, le=600000, description="Deadline in ms, queueing included; the request is cancelled with a 504 when it passes")
+    corpus: Optional[str] = Field(None, pattern=CORPUS_NAME_PATTERN, description="Named corpus to retrieve from; omit for HumanEval")
+    filter: Optional[Dict[str, Union[FilterValue, List[FilterValue]]]] = Field(None, description="Metadata filter, e.g. {\"team\": \"payments\"} or {\"task_id\": [\"HumanEval/0\", \"HumanEval/1\"]}; applied inside the search")
     
     model_config = {
         "json_schema_extra": {
@@ -26,8 +34,27 @@ class QueryResponse(BaseModel):
     intent: str
     response: str
     retrieved_context: List[ContextItem]
+    session_id: Optional[str] = None
+    timings: Optional[Dict[str, float]] = Field(None, description="Per-stage durations in ms (nodes, embedding, search, llm, total)")
     timestamp: datetime = Field(default_factory=datetime.now)
 
+class BatchItemResult(BaseModel):
+    """One line of a /query/batch response"""
+    id: Union[str, int]
+    success: bool
+    query: str
+    intent: Optional[str] = None
+    response: Optional[str] = None
+    retrieved_context: List[ContextItem] = []
+    error: Optional[str] = None
+
+class CorporaResponse(BaseModel):
+    """Built corpora and the LRU of opened ones"""
+    corpora: List[str]
+    open: List[str]
+    open_mb: float
+    budget_mb: float
+
 class HealthResponse(BaseModel):
     """Health check response"""
     status: str
@@ -9,12 +9,35 @@ class Settings(BaseSettings):
     # API
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    WORKERS: int = 1                    # forked workers for `python -m app.serve`
+    LOG_LEVEL: str = "INFO"             # DEBUG shows per-node progress
+    COALESCE_REQUESTS: bool = True      # identical concurrent stateless queries share one graph run
+    MAX_CONCURRENT_REQUESTS: int = 16   # graph runs at once per worker, 0 = unlimited
+    ADMISSION_QUEUE_SIZE: int = 64      # requests waiting for a slot; beyond that they get a 503
+    REQUEST_TIMEOUT_MS: int = 0         # default deadline when a request sets no timeout_ms, 0 = none
     
 
+    # Query embedding model
+    EMBEDDING_BACKEND: str = "torch"    # "torch" (sentence-transformers) or "onnx" (onnxruntime, no torch import)
+    EMBEDDING_ONNX_QUANTIZE: bool = False  # onnx backend: int8 dynamically quantized weights
+    EMBEDDING_ONNX_DIR: str = "./onnx_models"  # written by `python -m onnx_embeddings`
+    
     # Optional: Override if needed
     LLM_MODEL: Optional[str] = None
     LLM_TEMPERATURE: Optional[float] = None
     
+    # LLM client
+    LLM_FALLBACK_MODELS: str = ""        # comma-separated, tried in order after LLM_MODEL
+    LLM_MAX_TOKENS: int = 1000
+    LLM_TIMEOUT: float = 60.0            # seconds per HTTP request
+    LLM_MAX_CONCURRENCY: int = 8         # in-flight completions per process
+    LLM_RATE_LIMIT: float = 0.0          # requests per second, 0 = unlimited
+    LLM_RATE_BURST: Optional[float] = None
+    LLM_MAX_RETRIES: int = 3             # per model, on 429 / 5xx / connection errors
+    LLM_BACKOFF_BASE: float = 0.5
+    LLM_BACKOFF_MAX: float = 20.0
+    LLM_POOL_CONNECTIONS: int = 20       # keep-alive connections shared by all models
+    
     class Config:
         env_file = ".env"
         extra = "allow"
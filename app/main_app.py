@@ -1,8 +1,11 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List
+from typing import AsyncIterator, List
+import asyncio
+import json
 
 from app.config import settings
 from app.Pydantic_Models import (
@@ -10,26 +13,41 @@ from app.Pydantic_Models import (
     QueryResponse, 
     ContextItem,
     HealthResponse,
-    ExamplesResponse
+    ExamplesResponse,
+    CorporaResponse,
+    BatchItemResult
 )
 
 # Import your existing modules
+from admission import (INTERACTIVE, STANDARD, BATCH, AdmissionController, ClientDisconnected, DeadlineExceeded,
+                       Overloaded, cancel_leftover_tasks, deadline_after, guard, iterate_until)
+from batch import DEFAULT_CONCURRENCY, aprocess_batch, parse_batch_lines
 from graph import graph
-from rag_langchain import code_rag_chain, explain_rag_chain, retriever
+from rag_langchain import get_pipeline, init_pipeline
+from sessions import open_async_session_graph, session_config, turn_input
+from singleflight import SingleFlight, normalize_query
 from state import AssistantState
+from vector_stores import normalize_where
+from langchain_core.messages import AIMessageChunk
+import metrics
+
+metrics.configure_logging(settings.LOG_LEVEL)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize RAG system on startup"""
     print("🚀 Initializing RAG LangGraph System...")
     
-    # Your RAG system is already initialized in rag_langchain.py
-    # Just verify it's ready
-    if code_rag_chain is None or explain_rag_chain is None:
+    # Build the shared pipeline once, off the event loop
+    pipeline = await asyncio.to_thread(init_pipeline)
+    if pipeline.code_rag_chain is None or pipeline.explain_rag_chain is None:
         raise RuntimeError("RAG chains not initialized!")
     
-    print("✅ System ready!")
-    yield
+    # Checkpointed graph for requests with a session_id
+    async with open_async_session_graph() as session_graph:
+        app.state.session_graph = session_graph
+        print("✅ System ready!")
+        yield
     print("👋 Shutting down...")
 
 # Create FastAPI app
@@ -83,8 +101,106 @@ async def get_examples():
         ]
     )
 
+@app.get("/corpora", response_model=CorporaResponse)
+async def list_corpora():
+    """Corpora that can be passed as `corpus`, and the ones currently open"""
+    corpora = get_pipeline().corpora
+    names = await asyncio.to_thread(corpora.names)
+    return CorporaResponse(corpora=names, **corpora.stats())
+
+async def _run_session_turn(request: QueryRequest, intent: str = "") -> dict:
+    """One conversation turn; history is loaded from and saved to the session checkpoint"""
+    return await app.state.session_graph.ainvoke(
+        turn_input(request.query, intent, request.rerank, request.corpus, request.filter),
+        session_config(request.session_id),
+    )
+
+def _initial_state(request: QueryRequest, intent: str = "") -> AssistantState:
+    return {
+        "messages": [],
+        "user_input": request.query,
+        "intent": intent,
+        "documents": None,
+        "query_embedding": [],
+        "rerank": request.rerank,
+        "corpus": request.corpus,
+        "filter": request.filter,
+        "retrieved_context": [],
+        "llm_response": ""
+    }
+
+# Identical stateless requests in flight at the same time share one execution
+inflight = SingleFlight("api")
+
+# Bounded, prioritized admission of graph runs; excess load is shed with a 503
+admission = AdmissionController(settings.MAX_CONCURRENT_REQUESTS, settings.ADMISSION_QUEUE_SIZE)
+PRIORITIES = {"/query": INTERACTIVE, "/generate": INTERACTIVE, "/explain": STANDARD}
+
+def _priority(endpoint: str) -> int:
+    return PRIORITIES[endpoint.replace("/stream", "")]
+
+def _deadline(request: QueryRequest):
+    return deadline_after(request.timeout_ms or settings.REQUEST_TIMEOUT_MS)
+
+def _overloaded(detail: str) -> HTTPException:
+    return HTTPException(status_code=503, detail=detail, headers={"Retry-After": "1"})
+
+def _flight_key(endpoint: str, request: QueryRequest):
+    where = json.dumps(request.filter, sort_keys=True) if request.filter else None
+    return endpoint, normalize_query(request.query), request.rerank, request.corpus, where
+
+def _check_scope(request: QueryRequest):
+    """Reject an unknown corpus (404) or an invalid filter (422) before any work is queued"""
+    if not get_pipeline().corpora.exists(request.corpus):
+        raise HTTPException(status_code=404, detail=f"Unknown corpus: {request.corpus}")
+    try:
+        normalize_where(request.filter)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+async def _execute(endpoint: str, request: QueryRequest, http_request: Request, run) -> tuple:
+    """
+    (final_state, timings) of `run()`. Session turns depend on their
+    history and always run on their own; other requests are coalesced
+    with identical ones already in flight on the same endpoint.
+    
+    The run waits for an admission slot at the endpoint's priority, and
+    is cancelled (LLM and retrieval calls included) when the request's
+    deadline passes or the client disconnects.
+    """
+    _check_scope(request)
+    
+    async def timed_run():
+        with metrics.collect_timings() as timings:
+            async with admission.slot(_priority(endpoint)):
+                final_state = await run()
+        return final_state, timings
+    
+    if request.session_id or not settings.COALESCE_REQUESTS:
+        work = timed_run()
+    else:
+        work = inflight.run(_flight_key(endpoint, request), timed_run)
+    try:
+        return await guard(work, _deadline(request), http_request.is_disconnected)
+    except Overloaded as e:
+        raise _overloaded(str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except ClientDisconnected as e:
+        raise HTTPException(status_code=499, detail=str(e))
+
+async def _run_forced(state: AssistantState, intent: str, generation_node) -> dict:
+    """Retrieval, context and one generation node, skipping the router"""
+    from nodes_langchain import chat_node, aretrieve_node, context_node
+    
+    state = chat_node(state)
+    state["intent"] = intent
+    state.update(await aretrieve_node(state))
+    state.update(context_node(state))
+    return await generation_node(state)
+
 @app.post("/query", response_model=QueryResponse)
-async def process_query(request: QueryRequest):
+async def process_query(request: QueryRequest, http_request: Request):
     """
     Process a user query through the RAG LangGraph system
     
@@ -92,16 +208,14 @@ async def process_query(request: QueryRequest):
     """
     try:
         # Use your existing state structure
-        initial_state: AssistantState = {
-            "messages": [],
-            "user_input": request.query,
-            "intent": "",
-            "retrieved_context": [],
-            "llm_response": ""
-        }
+        initial_state = _initial_state(request)
         
-        # Execute your graph
-        final_state = graph.invoke(initial_state)
+        # Execute your graph (checkpointed per session when a session_id is given)
+        if request.session_id:
+            run = lambda: _run_session_turn(request)
+        else:
+            run = lambda: graph.ainvoke(initial_state)
+        final_state, timings = await _execute("/query", request, http_request, run)
         
         # Extract response
         response_text = final_state.get("llm_response", "No response generated.")
@@ -117,9 +231,13 @@ async def process_query(request: QueryRequest):
                     metadata=ctx.get("metadata", {})
                 )
                 for ctx in final_state.get("retrieved_context", [])
-            ]
+            ],
+            session_id=request.session_id,
+            timings=timings
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -127,28 +245,24 @@ async def process_query(request: QueryRequest):
         )
 
 @app.post("/generate", response_model=QueryResponse)
-async def generate_code(request: QueryRequest):
+async def generate_code(request: QueryRequest, http_request: Request):
     """
     Force code generation (skip router)
     
     Uses your existing generate_code_node directly
     """
     try:
-        from nodes_langchain import chat_node, generate_code_node
+        from nodes_langchain import agenerate_code_node
         
         # Create initial state
-        initial_state: AssistantState = {
-            "messages": [],
-            "user_input": request.query,
-            "intent": "generate_code",
-            "retrieved_context": [],
-            "llm_response": ""
-        }
+        initial_state = _initial_state(request, "generate_code")
         
         # Process through nodes
-        state = chat_node(initial_state)
-        state["intent"] = "generate_code"
-        final_state = generate_code_node(state)
+        if request.session_id:
+            run = lambda: _run_session_turn(request, intent="generate_code")
+        else:
+            run = lambda: _run_forced(initial_state, "generate_code", agenerate_code_node)
+        final_state, timings = await _execute("/generate", request, http_request, run)
         
         return QueryResponse(
             success=True,
@@ -161,9 +275,13 @@ async def generate_code(request: QueryRequest):
                     metadata=ctx.get("metadata", {})
                 )
                 for ctx in final_state.get("retrieved_context", [])
-            ]
+            ],
+            session_id=request.session_id,
+            timings=timings
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -171,28 +289,24 @@ async def generate_code(request: QueryRequest):
         )
 
 @app.post("/explain", response_model=QueryResponse)
-async def explain_code(request: QueryRequest):
+async def explain_code(request: QueryRequest, http_request: Request):
     """
     Force code explanation (skip router)
     
     Uses your existing explain_code_node directly
     """
     try:
-        from nodes_langchain import chat_node, explain_code_node
+        from nodes_langchain import aexplain_code_node
         
         # Create initial state
-        initial_state: AssistantState = {
-            "messages": [],
-            "user_input": request.query,
-            "intent": "explain_code",
-            "retrieved_context": [],
-            "llm_response": ""
-        }
+        initial_state = _initial_state(request, "explain_code")
         
         # Process through nodes
-        state = chat_node(initial_state)
-        state["intent"] = "explain_code"
-        final_state = explain_code_node(state)
+        if request.session_id:
+            run = lambda: _run_session_turn(request, intent="explain_code")
+        else:
+            run = lambda: _run_forced(initial_state, "explain_code", aexplain_code_node)
+        final_state, timings = await _execute("/explain", request, http_request, run)
         
         return QueryResponse(
             success=True,
@@ -205,15 +319,167 @@ async def explain_code(request: QueryRequest):
                     metadata=ctx.get("metadata", {})
                 )
                 for ctx in final_state.get("retrieved_context", [])
-            ]
+            ],
+            session_id=request.session_id,
+            timings=timings
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error explaining code: {str(e)}"
         )
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Counters and latency histograms in the Prometheus text format"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+# ============= STREAMING =============
+
+GENERATION_NODES = ("generate_code", "explain_code")
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _stream_graph(request: QueryRequest, intent: str = "", session_id: str = None,
+                        priority: int = INTERACTIVE) -> AsyncIterator[str]:
+    """
+    Stream a graph run as SSE: one `context` event (intent + retrieved
+    context), then `token` events from the generation node, then `done`.
+    The run holds an admission slot at `priority` while it streams.
+    """
+    query = request.query
+    response_text = ""
+    routed_intent = intent
+    
+    try:
+        async with admission.slot(priority):
+            if session_id:
+                runs = app.state.session_graph.astream(
+                    turn_input(query, intent, request.rerank, request.corpus, request.filter),
+                    session_config(session_id), stream_mode=["updates", "messages"]
+                )
+            else:
+                runs = graph.astream(_initial_state(request, intent), stream_mode=["updates", "messages"])
+            async with cancel_leftover_tasks():
+                try:
+                    async for mode, chunk in runs:
+                        if mode == "updates":
+                            for node, update in chunk.items():
+                                if node == "router":
+                                    routed_intent = update.get("intent", intent)
+                                elif node == "context":
+                                    # Router and retrieval have both finished
+                                    yield _sse("context", {
+                                        "query": query,
+                                        "intent": routed_intent,
+                                        "retrieved_context": update.get("retrieved_context", []),
+                                    })
+                                elif node in GENERATION_NODES:
+                                    response_text = update.get("llm_response", "")
+                        else:
+                            message, metadata = chunk
+                            if metadata.get("langgraph_node") in GENERATION_NODES and isinstance(message, AIMessageChunk) and message.content:
+                                yield _sse("token", {"content": message.content})
+                finally:
+                    await runs.aclose()
+        
+            yield _sse("done", {"response": response_text})
+    
+    except Exception as e:
+        yield _sse("error", {"detail": f"Error processing query: {str(e)}"})
+
+async def _until_deadline(events: AsyncIterator[str], deadline: float) -> AsyncIterator[str]:
+    """Cut the stream off with an `error` event once the deadline passes"""
+    try:
+        async for event in iterate_until(events, deadline):
+            yield event
+    except DeadlineExceeded as e:
+        yield _sse("error", {"detail": str(e)})
+
+def _event_stream(endpoint: str, request: QueryRequest, intent: str = "") -> StreamingResponse:
+    """
+    SSE response for `request`. When the queue is already full the request
+    is shed with a 503 before streaming starts; a client that disconnects
+    cancels its stream (and the run, once no one else shares it).
+    """
+    _check_scope(request)
+    priority = _priority(endpoint)
+    if not admission.has_room(priority):
+        metrics.incr("admission_rejected", priority="stream")
+        raise _overloaded(f"Server overloaded: {admission.active} running, {admission.queued} queued")
+    
+    if request.session_id or not settings.COALESCE_REQUESTS:
+        events = _stream_graph(request, intent, request.session_id, priority)
+    else:
+        # Subscribers to an identical stream in flight get every event from its start
+        events = inflight.stream(_flight_key(endpoint, request),
+                                 lambda: _stream_graph(request, intent, None, priority))
+    deadline = _deadline(request)
+    if deadline is not None:
+        events = _until_deadline(events, deadline)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/query/stream")
+async def process_query_stream(request: QueryRequest):
+    """Stream the routed response as Server-Sent Events"""
+    return _event_stream("/query/stream", request)
+
+@app.post("/generate/stream")
+async def generate_code_stream(request: QueryRequest):
+    """Stream forced code generation as Server-Sent Events"""
+    return _event_stream("/generate/stream", request, intent="generate_code")
+
+@app.post("/explain/stream")
+async def explain_code_stream(request: QueryRequest):
+    """Stream forced code explanation as Server-Sent Events"""
+    return _event_stream("/explain/stream", request, intent="explain_code")
+
+# ============= BATCH =============
+
+async def _batch_lines(items: List[dict], concurrency: int) -> AsyncIterator[str]:
+    results = aprocess_batch(items, concurrency=concurrency, admission=admission)
+    try:
+        async for result in results:
+            yield BatchItemResult(**result).model_dump_json() + "\n"
+    finally:
+        # A disconnected client cancels the items still running
+        await results.aclose()
+
+@app.post("/query/batch")
+async def process_query_batch(
+    request: Request,
+    concurrency: int = Query(DEFAULT_CONCURRENCY, ge=1, le=64, description="Concurrent LLM calls")
+):
+    """
+    Process many queries in one request.
+    
+    The body is a JSON array or JSON Lines; each item has a `query` (or a
+    `title`/`body`, so a requests.jsonl backlog can be posted as-is) and
+    optionally a `corpus` and `filter`. One
+    result line is streamed per item, in completion order. Items run at
+    batch priority, behind interactive requests.
+    """
+    try:
+        items = parse_batch_lines((await request.body()).decode("utf-8"))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch payload: {str(e)}")
+    if not items:
+        raise HTTPException(status_code=400, detail="Empty batch")
+    if not admission.has_room(BATCH):
+        metrics.incr("admission_rejected", priority="batch")
+        raise _overloaded(f"Server overloaded: {admission.active} running, {admission.queued} queued")
+    
+    return StreamingResponse(_batch_lines(items, concurrency), media_type="application/x-ndjson")
+
 # Run with uvicorn
 if __name__ == "__main__":
     import uvicorn
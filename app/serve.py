@@ -0,0 +1,185 @@
+"""
+Prefork launcher: load once, fork the workers.
+
+    python -m app.serve --workers 4 --port 8000
+
+The master builds the RAG pipeline, binds the listening socket and then
+forks the workers. The pipeline covers the embedding model, the index
+sync (under the index file lock) and the memory-mapped vectors.
+
+Workers inherit the loaded model and the index pages copy-on-write
+instead of loading their own copies. They never write the index, the
+named corpora or the embedding cache: all of them are opened read-only.
+The master runs torch single-threaded, so no OpenMP pool exists at fork
+time; each worker sizes its own. Each worker re-creates what cannot cross a fork
+(`RAGPipeline.after_fork`) and serves the app with uvicorn on the shared
+socket. The master restarts workers that die, and forwards SIGTERM and
+SIGINT to them for a graceful shutdown.
+
+Use the `numpy` or `hnsw` vector store; a Chroma client cannot be shared,
+so every worker opens its own. Metrics live in each worker's memory, so
+/metrics reports the worker that answered the scrape. POSIX only.
+"""
+import argparse
+import gc
+import json
+import os
+import select
+import signal
+import socket
+import sys
+import time
+
+from app.config import settings
+
+RESPAWN_DELAY = 1.0  # seconds before restarting a worker that died right after starting
+
+def _bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def _rss_mb() -> float:
+    with open("/proc/self/status", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+def _run_worker(index: int, sock: socket.socket, threads: int, report_fd: int):
+    """Body of a forked worker; never returns"""
+    status = 0
+    try:
+        import asyncio
+        import uvicorn
+        from app.main_app import app
+        from rag_langchain import get_pipeline
+
+        start = time.perf_counter()
+        # The master's handlers are inherited; uvicorn installs its own while serving
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        get_pipeline().after_fork(threads)
+
+        config = uvicorn.Config(app, log_level=settings.LOG_LEVEL.lower(), lifespan="on")
+        server = uvicorn.Server(config)
+
+        async def serve():
+            serving = asyncio.create_task(server.serve(sockets=[sock]))
+            while not server.started and not serving.done():
+                await asyncio.sleep(0.01)
+            if server.started:
+                report = {"worker": index, "pid": os.getpid(), "startup_s": time.perf_counter() - start, "rss_mb": _rss_mb()}
+                os.write(report_fd, (json.dumps(report) + "\n").encode("utf-8"))
+            await serving
+
+        config.setup_event_loop()
+        asyncio.run(serve())
+    except BaseException:
+        import traceback
+
+        traceback.print_exc()
+        status = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+
+class PreforkMaster:
+    """Forks `workers` children that serve on one inherited socket, and keeps them running"""
+
+    def __init__(self, sock: socket.socket, workers: int, threads: int):
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.children = {}  # pid -> (worker index, start time)
+        self.stopping = False
+        self._reports, self._report_fd = os.pipe()
+
+    def spawn(self, index: int):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(index, self.sock, self.threads, self._report_fd)
+        self.children[pid] = (index, time.monotonic())
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _read_reports(self, pending: str) -> str:
+        pending += os.read(self._reports, 65536).decode("utf-8")
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            report = json.loads(line)
+            print(f"✓ Worker {report['worker']} ready: pid {report['pid']}, "
+                  f"startup {report['startup_s']:.2f}s, RSS {report['rss_mb']:.1f}MB", flush=True)
+        return pending
+
+    def _reap(self):
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            index, started = self.children.pop(pid, (None, 0.0))
+            if index is None or self.stopping:
+                continue
+            print(f"⚠️ Worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}; restarting",
+                  flush=True)
+            if time.monotonic() - started < RESPAWN_DELAY:
+                time.sleep(RESPAWN_DELAY)
+            self.spawn(index)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for index in range(self.workers):
+            self.spawn(index)
+
+        pending = ""
+        while self.children:
+            readable, _, _ = select.select([self._reports], [], [], 0.5)
+            if readable:
+                pending = self._read_reports(pending)
+            self._reap()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API from N forked workers sharing one preloaded pipeline")
+    parser.add_argument("--workers", type=int, default=settings.WORKERS)
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument("--threads", type=int, default=None, help="Embedding threads per worker (default: cores / workers)")
+    args = parser.parse_args()
+
+    from embeddings import before_fork
+    from rag_langchain import init_pipeline
+    import app.main_app  # noqa: F401 - imported before forking so workers share it
+
+    start = time.perf_counter()
+    before_fork()
+    init_pipeline()
+    print(f"✓ Pipeline preloaded in {time.perf_counter() - start:.2f}s (master pid {os.getpid()}, "
+          f"RSS {_rss_mb():.1f}MB)", flush=True)
+
+    sock = _bind(args.host, args.port)
+    # Objects that exist now are never scanned by the collector again, which
+    # keeps it from touching (and so un-sharing) inherited pages
+    gc.collect()
+    gc.freeze()
+
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+    print(f"🚀 Serving on {args.host}:{args.port} with {args.workers} workers ({threads} embedding threads each)",
+          flush=True)
+    PreforkMaster(sock, args.workers, threads).run()
+    print("👋 All workers stopped", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Batch processing: many prompts through the graph with shared retrieval.
+
+Queries are handled in windows. Each window costs one batched embedding
+call and one multi-query vector lookup per (corpus, filter) group, and
+then the LLM calls fan out with bounded concurrency. A failing item
+never fails the batch.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import AsyncIterator, Iterable, Iterator, List, Optional
+import asyncio
+import json
+
+from admission import BATCH, AdmissionController
+from graph import graph
+from rag_langchain import get_pipeline
+
+BATCH_WINDOW = 256
+DEFAULT_CONCURRENCY = 8
+MAX_QUERY_LENGTH = 2000  # Same limit as QueryRequest.query on /query
+INTENTS = ("generate_code", "explain_code")
+
+def normalize_batch_item(item, index: int) -> dict:
+    """
+    Accept {"query": ...} items as well as backlog-style records such as
+    {"request_id": ..., "title": ..., "body": ...} (e.g. requests.jsonl).
+    """
+    if isinstance(item, str):
+        item = {"query": item}
+    if not isinstance(item, dict):
+        # Reported as this item's error by process_batch, not a failure of the whole batch
+        return {"id": index, "query": "", "intent": "", "corpus": None, "filter": None,
+                "invalid": f"Item {index} must be a string or an object, not {type(item).__name__}"}
+    query = str(item.get("query") or item.get("body") or item.get("title") or "")
+    intent = item.get("intent") if item.get("intent") in INTENTS else ""
+    # "invalid" survives a second normalization (parse_batch_lines output fed to process_batch)
+    return {"id": item.get("id") or item.get("request_id") or index, "query": query, "intent": intent,
+            "corpus": item.get("corpus"), "filter": item.get("filter"), "invalid": item.get("invalid")}
+
+def parse_batch_lines(text: str) -> List[dict]:
+    """Parse a JSON array or JSON Lines payload into normalized items"""
+    stripped = text.strip()
+    if stripped.startswith("["):
+        records = json.loads(stripped)
+    else:
+        records = [json.loads(line) for line in stripped.splitlines() if line.strip()]
+    return [normalize_batch_item(record, i) for i, record in enumerate(records)]
+
+def _split_invalid(items: List[dict]):
+    """(valid items, error results): malformed items and blank or overlong queries never reach embedding or the LLM"""
+    valid, errors = [], []
+    for item in items:
+        if item.get("invalid"):
+            errors.append(_error(item, ValueError(item["invalid"])))
+        elif not item["query"].strip():
+            errors.append(_error(item, ValueError("Query must not be empty")))
+        elif len(item["query"]) > MAX_QUERY_LENGTH:
+            errors.append(_error(item, ValueError(f"Query longer than {MAX_QUERY_LENGTH} characters")))
+        else:
+            valid.append(item)
+    return valid, errors
+
+def _initial_state(item: dict, retrieval: dict) -> dict:
+    return {
+        "messages": [],
+        "user_input": item["query"],
+        "intent": item["intent"],
+        "documents": retrieval["documents"],
+        "query_embedding": retrieval["query_embedding"],
+        "corpus": item["corpus"],
+        "filter": item["filter"],
+        "retrieved_context": [],
+        "llm_response": ""
+    }
+
+def _result(item: dict, final_state: dict) -> dict:
+    return {
+        "id": item["id"],
+        "success": True,
+        "query": item["query"],
+        "intent": final_state.get("intent", "unknown"),
+        "response": final_state.get("llm_response", "No response generated."),
+        "retrieved_context": final_state.get("retrieved_context", []),
+    }
+
+def _error(item: dict, error: Exception) -> dict:
+    return {"id": item["id"], "success": False, "query": item["query"], "error": str(error)}
+
+def _windows(items: List[dict], size: int = BATCH_WINDOW):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _prefetch(window: List[dict]) -> list:
+    """
+    Retrieval for a window, one batched call per (corpus, filter) group.
+    Returns a retrieval dict per item, or the exception that failed its group.
+    """
+    groups = {}
+    for position, item in enumerate(window):
+        key = (item["corpus"], json.dumps(item["filter"], sort_keys=True, default=str))
+        groups.setdefault(key, []).append(position)
+    retrievals = [None] * len(window)
+    for positions in groups.values():
+        first = window[positions[0]]
+        try:
+            results = get_pipeline().search_batch(
+                [window[position]["query"] for position in positions], corpus=first["corpus"], where=first["filter"]
+            )
+        except Exception as e:
+            results = [e] * len(positions)
+        for position, result in zip(positions, results):
+            retrievals[position] = result
+    return retrievals
+
+def process_batch(items: Iterable, concurrency: int = DEFAULT_CONCURRENCY) -> Iterator[dict]:
+    """Run many queries through the graph; yields one result dict per item as it completes"""
+    items, errors = _split_invalid([normalize_batch_item(item, i) for i, item in enumerate(items)])
+    yield from errors
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for window in _windows(items):
+            retrievals = _prefetch(window)
+            for item, retrieval in zip(window, retrievals):
+                if isinstance(retrieval, Exception):
+                    yield _error(item, retrieval)
+
+            def run(item, retrieval):
+                try:
+                    return _result(item, graph.invoke(_initial_state(item, retrieval)))
+                except Exception as e:
+                    return _error(item, e)
+
+            futures = [pool.submit(run, item, retrieval) for item, retrieval in zip(window, retrievals)
+                       if not isinstance(retrieval, Exception)]
+            for future in as_completed(futures):
+                yield future.result()
+
+async def aprocess_batch(items: Iterable, concurrency: int = DEFAULT_CONCURRENCY,
+                         admission: Optional[AdmissionController] = None) -> AsyncIterator[dict]:
+    """
+    Async process_batch used by /query/batch. With an `admission`
+    controller every item takes a slot at batch priority, so interactive
+    requests go first. Closing the iterator (e.g. the client disconnected)
+    cancels the items still running.
+    """
+    items, errors = _split_invalid([normalize_batch_item(item, i) for i, item in enumerate(items)])
+    for error in errors:
+        yield error
+    pipeline = get_pipeline()
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    async def run(item, retrieval):
+        async with semaphore:
+            try:
+                if admission is None:
+                    return _result(item, await graph.ainvoke(_initial_state(item, retrieval)))
+                async with admission.slot(BATCH):
+                    return _result(item, await graph.ainvoke(_initial_state(item, retrieval)))
+            except Exception as e:
+                return _error(item, e)
+
+    for window in _windows(items):
+        retrievals = await loop.run_in_executor(pipeline.embedding_executor, _prefetch, window)
+        for item, retrieval in zip(window, retrievals):
+            if isinstance(retrieval, Exception):
+                yield _error(item, retrieval)
+
+        tasks = [asyncio.create_task(run(item, retrieval)) for item, retrieval in zip(window, retrievals)
+                 if not isinstance(retrieval, Exception)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
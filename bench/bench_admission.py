@@ -0,0 +1,103 @@
+"""
+Admission control and deadline edge cases, without a server or an LLM.
+
+    python -m bench.bench_admission
+
+Checks that a waiter cancelled before it could leave the queue neither
+leaks the slot it is handed on `release` nor breaks a push-out, and that
+a stream cut off by its deadline is closed with nothing it started left
+pending. Exits non-zero if any check fails.
+"""
+import argparse
+import asyncio
+import sys
+
+from bench.common import write_results
+
+from admission import (INTERACTIVE, BATCH, AdmissionController, DeadlineExceeded, Overloaded,
+                       cancel_leftover_tasks, deadline_after, iterate_until)
+
+async def cancelled_waiter_then_release() -> dict:
+    """A queued waiter is cancelled and the holder releases in the same tick"""
+    controller = AdmissionController(max_concurrency=1, max_queue=4)
+    await controller.acquire(INTERACTIVE)
+    waiter = asyncio.ensure_future(controller.acquire(INTERACTIVE))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    controller.release()  # before the waiter's task has run its cancellation handler
+    await asyncio.gather(waiter, return_exceptions=True)
+    state = {"active": controller.active, "queued": controller.queued}
+    await asyncio.wait_for(controller.acquire(INTERACTIVE), 1.0)
+    controller.release()
+    return {**state, "ok": state == {"active": 0, "queued": 0}}
+
+async def cancelled_waiter_then_push_out() -> dict:
+    """A full queue whose only waiter was just cancelled admits a more important request"""
+    controller = AdmissionController(max_concurrency=1, max_queue=1)
+    await controller.acquire(INTERACTIVE)
+    waiter = asyncio.ensure_future(controller.acquire(BATCH))
+    await asyncio.sleep(0)
+    # Scheduled ahead of the cancelled waiter's task, so the push-out still finds it queued
+    important = asyncio.ensure_future(controller.acquire(INTERACTIVE))
+    waiter.cancel()
+    try:
+        await asyncio.sleep(0)
+        controller.release()
+        await asyncio.wait_for(important, 1.0)
+    except (Overloaded, asyncio.InvalidStateError, asyncio.TimeoutError) as e:
+        return {"error": repr(e), "ok": False}
+    await asyncio.gather(waiter, return_exceptions=True)
+    controller.release()
+    state = {"active": controller.active, "queued": controller.queued}
+    return {**state, "ok": state == {"active": 0, "queued": 0}}
+
+async def stream_past_deadline() -> dict:
+    """A stream that outlives its deadline is closed, and so is the helper task it started"""
+    closed = []
+
+    async def events():
+        async with cancel_leftover_tasks():
+            # Like LangGraph's stream waiter: started by the run, never cancelled by it
+            asyncio.ensure_future(asyncio.Event().wait())
+            try:
+                for index in range(100):
+                    await asyncio.sleep(0.05)
+                    yield index
+            finally:
+                closed.append(True)
+
+    received = []
+    try:
+        async for item in iterate_until(events(), deadline_after(120)):
+            received.append(item)
+        exceeded = False
+    except DeadlineExceeded:
+        exceeded = True
+    pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    return {"received": len(received), "deadline_exceeded": exceeded, "closed": bool(closed),
+            "pending_tasks": len(pending), "ok": exceeded and bool(closed) and not pending}
+
+async def run_checks() -> dict:
+    return {
+        "cancelled_waiter_then_release": await cancelled_waiter_then_release(),
+        "cancelled_waiter_then_push_out": await cancelled_waiter_then_push_out(),
+        "stream_past_deadline": await stream_past_deadline(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Check admission control and deadline edge cases")
+    parser.parse_args()
+
+    checks = asyncio.run(run_checks())
+    failures = [name for name, check in checks.items() if not check["ok"]]
+    for name, check in checks.items():
+        details = " ".join(f"{key}={value}" for key, value in check.items() if key != "ok")
+        print(f"  {'✅' if check['ok'] else '❌'} {name:<32} {details}")
+    write_results("admission", {"checks": checks, "failed": failures})
+    if failures:
+        print(f"\n❌ {len(failures)} admission checks failed")
+        sys.exit(1)
+    print("\n✅ Cancelled waiters release their slot and cut-off streams leave nothing pending")
+
+if __name__ == "__main__":
+    main()
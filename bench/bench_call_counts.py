@@ -0,0 +1,150 @@
+"""
+Per-request call counts: one embedding call and one vector search per query.
+
+    python -m bench.bench_call_counts
+
+Builds a small pipeline with a deterministic hashing embedding model (no
+model download) over a temporary numpy index, points the LLM client at
+the fake LLM, and runs distinct queries through the graph, sync and
+async. After each query the `embed_query_calls` and `vector_searches`
+counters must both be exactly 1; the run exits non-zero otherwise.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+
+from bench.common import write_results
+from bench.fake_llm_server import FakeLLMServer
+
+# Not among the intent examples, whose embeddings the router has already cached
+QUERIES = [
+    "Write a function that returns the factorial of a positive integer",
+    "Explain how this binary search narrows the range",
+    "Create a function to tell whether a phrase is a palindrome",
+    "How does the recursive fibonacci function compute its result?",
+]
+DOCUMENTS = [
+    ("Stub/0", "factorial", "def factorial(n):\n    \"\"\"Return n!\"\"\"\n    return 1 if n < 2 else n * factorial(n - 1)\n"),
+    ("Stub/1", "binary_search", "def binary_search(items, target):\n    \"\"\"Index of target in sorted items\"\"\"\n"
+                                "    lo, hi = 0, len(items)\n    while lo < hi:\n        mid = (lo + hi) // 2\n"
+                                "        if items[mid] < target:\n            lo = mid + 1\n        else:\n"
+                                "            hi = mid\n    return lo\n"),
+    ("Stub/2", "is_palindrome", "def is_palindrome(text):\n    \"\"\"True if text reads the same backwards\"\"\"\n"
+                                "    return text == text[::-1]\n"),
+    ("Stub/3", "fibonacci", "def fibonacci(n):\n    \"\"\"The nth Fibonacci number\"\"\"\n"
+                            "    return n if n < 2 else fibonacci(n - 1) + fibonacci(n - 2)\n"),
+]
+
+class HashEmbeddings:
+    """Deterministic bag-of-words hashing vectors; stands in for the real model"""
+
+    dim = 64
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in text.lower().split():
+            vector[int(hashlib.md5(token.encode("utf-8")).hexdigest(), 16) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+def stub_pipeline_class():
+    from langchain_core.documents import Document
+
+    from embeddings import CachedEmbeddings, CountingEmbeddings
+    from rag_langchain import EMBEDDING_WORKERS, RAGPipeline
+
+    class StubPipeline(RAGPipeline):
+        def load_embedding_model(self):
+            self.embedding_model = CachedEmbeddings(CountingEmbeddings(HashEmbeddings()), namespace="hash-stub")
+            self.embedding_executor = ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS, thread_name_prefix="embedding")
+
+        def load_documents(self):
+            return [
+                Document(page_content=f"Task: {code}", metadata={"task_id": task_id, "entry_point": entry_point,
+                                                                 "source": "stub"})
+                for task_id, entry_point, code in DOCUMENTS
+            ]
+
+    return StubPipeline
+
+def _counts(metrics, query: str, mode: str) -> dict:
+    return {
+        "query": query,
+        "mode": mode,
+        "embed_query_calls": metrics.get("embed_query_calls"),
+        "vector_searches": metrics.get("vector_searches"),
+    }
+
+def sync_counts(graph, metrics, queries) -> list:
+    from bench.bench_graph import initial_state
+
+    results = []
+    for query in queries:
+        metrics.reset()
+        graph.invoke(initial_state(query))
+        results.append(_counts(metrics, query, "sync"))
+    return results
+
+async def async_counts(graph, metrics, queries) -> list:
+    from bench.bench_graph import initial_state
+
+    # One event loop for every query: the LLM client's async connection pool is bound to it
+    results = []
+    for query in queries:
+        metrics.reset()
+        await graph.ainvoke(initial_state(query))
+        results.append(_counts(metrics, query, "async"))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Check one embedding call and one vector search per query")
+    parser.parse_args()
+
+    server = FakeLLMServer(latency=0.0).start()
+    directory = tempfile.mkdtemp(prefix="bench_call_counts_")
+    os.environ["OPENROUTER_BASE_URL"] = server.url
+    os.environ.setdefault("OPENROUTER_API_KEY", "fake-key")
+    os.environ["SEMANTIC_CACHE"] = "off"
+    os.environ["VECTOR_STORE"] = "numpy"
+    os.environ["EMBEDDING_CACHE_DIR"] = ""
+
+    import metrics
+    from graph import build_blueprint_graph
+    from rag_langchain import set_pipeline
+
+    try:
+        set_pipeline(stub_pipeline_class()(os.path.join(directory, "index")).build())
+        graph = build_blueprint_graph()
+        # Distinct queries for each mode, so none is answered from the query embedding cache
+        results = (sync_counts(graph, metrics, QUERIES)
+                   + asyncio.run(async_counts(graph, metrics, [f"{query} (async)" for query in QUERIES])))
+    finally:
+        server.stop()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    failures = [r for r in results if r["embed_query_calls"] != 1 or r["vector_searches"] != 1]
+    for r in results:
+        print(f"  {r['mode']:<5} embed_query_calls={r['embed_query_calls']} "
+              f"vector_searches={r['vector_searches']}  {r['query']}")
+    write_results("call_counts", {"queries": results, "failed": len(failures)})
+    if failures:
+        print(f"\n❌ {len(failures)} queries did not make exactly one embedding call and one vector search")
+        sys.exit(1)
+    print("\n✅ One embedding call and one vector search per query")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Retrieval quality and index size of the chunkers on HumanEval.
+
+    python -m bench.bench_chunking --k 1 3 5
+
+Each task is queried with the first sentence of its entry point's
+docstring. A query counts as recalled at k when a chunk of the same
+task_id is in the top k (docstring hits are expanded to their parent code
+chunk). `complete@1` is the share of recalled top-1 hits whose chunk holds
+the whole entry-point function, i.e. was not cut mid-function.
+"""
+from datasets import load_dataset
+from langchain_huggingface import HuggingFaceEmbeddings
+import argparse
+import ast
+import time
+import numpy as np
+
+from bench.common import summarize, write_results
+from embeddings import EMBEDDING_MODEL_NAME
+from ingestion import get_splitter, iter_humaneval_documents
+
+CONFIGS = [
+    ("recursive", {"chunker": "recursive"}),
+    ("python_ast", {"chunker": "python_ast"}),
+    ("python_ast+docstrings", {"chunker": "python_ast", "index_docstrings": True}),
+]
+
+def task_queries(dataset):
+    """(task_id, query, entry_point, last solution line) per task"""
+    queries = []
+    for item in dataset:
+        tree = ast.parse(item["prompt"])
+        docstring = ""
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef) and node.name == item["entry_point"]:
+                docstring = ast.get_docstring(node) or ""
+        first_sentence = docstring.strip().split("\n\n")[0].split(". ")[0].replace("\n", " ")
+        solution_lines = [line.strip() for line in item["canonical_solution"].splitlines() if line.strip()]
+        queries.append((item["task_id"], first_sentence or item["entry_point"], item["entry_point"], solution_lines[-1]))
+    return queries
+
+def expand(chunks, indices):
+    """Map docstring chunks to their code chunks, preserving rank order"""
+    by_key = {}
+    for chunk in chunks:
+        if chunk.metadata.get("chunk_type") == "code":
+            by_key.setdefault(chunk.metadata["chunk_key"], []).append(chunk)
+    results = []
+    for i in indices:
+        chunk = chunks[i]
+        if chunk.metadata.get("chunk_type") == "docstring":
+            results.extend(by_key.get(chunk.metadata["parent_key"], [chunk]))
+        else:
+            results.append(chunk)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chunkers on HumanEval retrieval")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    args = parser.parse_args()
+
+    dataset = load_dataset("openai/openai_humaneval", split="test")
+    queries = task_queries(dataset)
+    documents = list(iter_humaneval_documents())
+    model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    query_vectors = np.asarray(model.embed_documents([q for _, q, _, _ in queries]), dtype=np.float32)
+    max_k = max(args.k)
+
+    results = {}
+    for name, options in CONFIGS:
+        splitter, _ = get_splitter(options["chunker"], options.get("index_docstrings", False))
+        chunks = splitter.split_documents(documents)
+
+        start = time.perf_counter()
+        matrix = np.asarray(model.embed_documents([c.page_content for c in chunks]), dtype=np.float32)
+        embed_seconds = time.perf_counter() - start
+
+        hits = {k: 0 for k in args.k}
+        complete = 0
+        context_chars = []
+        latencies = []
+        for (task_id, _, entry_point, last_line), vector in zip(queries, query_vectors):
+            start = time.perf_counter()
+            top = np.argsort(-(matrix @ vector))[:max_k]
+            latencies.append(time.perf_counter() - start)
+
+            ranked = expand(chunks, top)
+            for k in args.k:
+                if any(c.metadata.get("task_id") == task_id for c in ranked[:k]):
+                    hits[k] += 1
+            if ranked and ranked[0].metadata.get("task_id") == task_id:
+                text = ranked[0].page_content
+                complete += f"def {entry_point}" in text and last_line in text
+            context_chars.append(sum(len(c.page_content) for c in ranked[:3]))
+
+        results[name] = {
+            "chunks": len(chunks),
+            "total_chars": sum(len(c.page_content) for c in chunks),
+            "index_bytes": int(matrix.nbytes),
+            "embed_seconds": embed_seconds,
+            **{f"recall@{k}": hits[k] / len(queries) for k in args.k},
+            "complete@1": complete / max(1, hits[min(args.k)]),
+            "mean_context_chars@3": float(np.mean(context_chars)),
+            "search": summarize(latencies),
+        }
+        print(f"{name:<22} chunks={len(chunks):<5} " +
+              " ".join(f"recall@{k}={results[name][f'recall@{k}']:.3f}" for k in args.k) +
+              f" complete@1={results[name]['complete@1']:.3f}")
+
+    write_results("chunking", {"queries": len(queries), "results": results})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Request coalescing: N identical concurrent requests, one LLM call.
+
+    python -m bench.bench_coalescing --requests 100 --latency 0.5 --compare
+
+For each endpoint, fires `--requests` concurrent requests for the same
+query (with case and whitespace variations, which normalize to one key)
+at the app over ASGI, backed by the fake LLM. Checks that the fake LLM saw
+exactly one completion per endpoint and that every client got the same
+response, and exits non-zero otherwise. `--compare` repeats the run with
+coalescing disabled to show the calls it saves.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from bench.common import summarize, write_results
+from bench.fake_llm_server import FakeLLMServer
+
+QUERY = "Generate a function to calculate factorial"
+PATHS = ["/query", "/generate", "/explain", "/query/stream", "/generate/stream"]
+
+def variants(n: int):
+    """Same query, spelled differently"""
+    spellings = [QUERY, QUERY.lower(), f"  {QUERY}  ", QUERY.replace(" ", "  ")]
+    return [spellings[i % len(spellings)] for i in range(n)]
+
+async def _post(client, path: str, query: str):
+    start = time.perf_counter()
+    response = await client.post(path, json={"query": query})
+    response.raise_for_status()
+    body = response.text if path.endswith("/stream") else response.json()["response"]
+    return body, time.perf_counter() - start
+
+async def run(server, num_requests: int, paths):
+    import httpx
+    from app.main_app import app
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=600) as client:
+        for path in paths:
+            before = server.stats()["requests"]
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(_post(client, path, query) for query in variants(num_requests)))
+            wall = time.perf_counter() - start
+            bodies = [body for body, _ in responses]
+            results[path] = {
+                "requests": num_requests,
+                "llm_calls": server.stats()["requests"] - before,
+                "identical_responses": len(set(bodies)) == 1,
+                "wall_s": wall,
+                "latency": summarize([latency for _, latency in responses]),
+            }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that identical concurrent requests share one LLM call")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake LLM seconds per completion")
+    parser.add_argument("--paths", nargs="+", default=PATHS)
+    parser.add_argument("--compare", action="store_true", help="Also run with coalescing disabled")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=args.latency).start()
+    os.environ["OPENROUTER_BASE_URL"] = server.url
+    os.environ.setdefault("OPENROUTER_API_KEY", "fake-key")
+    # Every run must reach the LLM, not the response cache
+    os.environ["SEMANTIC_CACHE"] = "off"
+
+    from app.config import settings
+    from rag_langchain import init_pipeline
+
+    # ASGITransport does not run the lifespan, so build the pipeline up front
+    init_pipeline()
+
+    async def run_all():
+        # One event loop for both runs: the LLM client's async connection pool is bound to it
+        runs = {"coalesced": await run(server, args.requests, args.paths)}
+        if args.compare:
+            settings.COALESCE_REQUESTS = False
+            runs["uncoalesced"] = await run(server, args.requests, args.paths)
+        return runs
+
+    try:
+        runs = asyncio.run(run_all())
+    finally:
+        server.stop()
+
+    failures = []
+    for mode, results in runs.items():
+        for path, result in results.items():
+            print(f"{mode:<12} {path:<18} {result['requests']} requests -> {result['llm_calls']:>3} LLM calls, "
+                  f"p50={result['latency']['p50_ms']:.0f}ms wall={result['wall_s']:.2f}s")
+            if mode == "coalesced" and (result["llm_calls"] != 1 or not result["identical_responses"]):
+                failures.append(path)
+
+    write_results("coalescing", {"latency_s": args.latency, "runs": runs, "failed": failures})
+    if failures:
+        print(f"❌ Not coalesced into one LLM call: {', '.join(failures)}")
+        sys.exit(1)
+    print("✅ Every endpoint made exactly one LLM call")
+
+if __name__ == "__main__":
+    main()
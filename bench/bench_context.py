@@ -0,0 +1,54 @@
+"""
+Prompt context size before and after context assembly.
+
+    python -m bench.bench_context --k 3 5 10 --budget 1500
+
+For each HumanEval docstring query, compares the tokens of the old
+stringified Document list with the deduplicated, budgeted context, and
+times the assembly step.
+"""
+from datasets import load_dataset
+import argparse
+import statistics
+import time
+
+from bench.bench_chunking import task_queries
+from bench.common import summarize, write_results
+from context_builder import ContextBuilder
+from rag_langchain import init_pipeline
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prompt context assembly")
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--budget", type=int, default=1500)
+    args = parser.parse_args()
+
+    pipeline = init_pipeline()
+    builder = ContextBuilder(token_budget=args.budget)
+    queries = [query for _, query, _, _ in task_queries(load_dataset("openai/openai_humaneval", split="test"))]
+
+    results = {}
+    for k in args.k:
+        naive, packed, latencies = [], [], []
+        for query in queries:
+            docs = pipeline.search(query, k=k)["documents"]
+            start = time.perf_counter()
+            _, stats = builder.build(docs, measure_savings=True)
+            latencies.append(time.perf_counter() - start)
+            naive.append(stats["naive_tokens"])
+            packed.append(stats["context_tokens"])
+        results[f"k={k}"] = {
+            "mean_naive_tokens": statistics.fmean(naive),
+            "mean_context_tokens": statistics.fmean(packed),
+            "saved_fraction": 1.0 - sum(packed) / max(sum(naive), 1),
+            "assembly_latency": summarize(latencies),
+        }
+        print(f"k={k:<3} naive={results[f'k={k}']['mean_naive_tokens']:.0f} "
+              f"context={results[f'k={k}']['mean_context_tokens']:.0f} "
+              f"saved={results[f'k={k}']['saved_fraction']:.1%} "
+              f"p50={results[f'k={k}']['assembly_latency']['p50_ms']:.2f}ms")
+
+    write_results("context", {"queries": len(queries), "budget": args.budget, "results": results})
+
+if __name__ == "__main__":
+    main()
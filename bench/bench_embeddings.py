@@ -0,0 +1,162 @@
+"""
+Embedding backends: torch vs ONNX Runtime (fp32 and int8).
+
+    python -m onnx_embeddings --quantize           # export once
+    python -m bench.bench_embeddings --variants torch onnx onnx-int8 --queries 200
+
+Each variant runs in a fresh interpreter and reports:
+
+- import time of its runtime (torch + sentence-transformers, or
+  onnxruntime + tokenizers) and model load time
+- resident memory after loading and after the run
+- single-query latency (one uncached HumanEval prompt per call)
+- batch throughput over the HumanEval chunks the index embeds
+
+Parity: the chunk vectors of every ONNX variant are compared with the
+torch vectors by cosine similarity. The run fails if the mean cosine is
+below `--min-cosine`.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bench.common import ROOT, rss_mb, summarize, write_results
+
+VARIANTS = {
+    "torch": {"EMBEDDING_BACKEND": "torch", "EMBEDDING_ONNX_QUANTIZE": "false"},
+    "onnx": {"EMBEDDING_BACKEND": "onnx", "EMBEDDING_ONNX_QUANTIZE": "false"},
+    "onnx-int8": {"EMBEDDING_BACKEND": "onnx", "EMBEDDING_ONNX_QUANTIZE": "true"},
+}
+RUNTIME_MODULES = {"torch": ["torch", "sentence_transformers"], "onnx": ["onnxruntime", "tokenizers"]}
+
+def humaneval_texts(limit: int = None):
+    """(chunk texts, prompts): what the index embeds and what users ask"""
+    from datasets import load_dataset
+    from ingestion import get_splitter, iter_humaneval_documents, iter_splits
+
+    splitter, _ = get_splitter()
+    chunks = [chunk.page_content for chunk in iter_splits(iter_humaneval_documents(), splitter)]
+    prompts = [task["prompt"] for task in load_dataset("openai/openai_humaneval", split="test")]
+    return chunks[:limit], prompts
+
+def probe(variant: str, queries: int, batch_size: int, limit: int, vectors_out: str):
+    """Runs in a fresh interpreter with the variant's settings in the environment; prints one JSON line"""
+    import importlib
+
+    baseline = rss_mb()
+    start = time.perf_counter()
+    for module in RUNTIME_MODULES[VARIANTS[variant]["EMBEDDING_BACKEND"]]:
+        importlib.import_module(module)
+    import_s = time.perf_counter() - start
+
+    from embeddings import load_embeddings
+
+    start = time.perf_counter()
+    model = load_embeddings(batch_size=batch_size)
+    load_s = time.perf_counter() - start
+    rss_loaded = rss_mb() - baseline
+
+    chunks, prompts = humaneval_texts(limit)
+    model.embed_query("warm up")
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        model.embed_query(prompts[i % len(prompts)] + f"\n# {i}")
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    vectors = np.asarray(model.embed_documents(chunks), dtype=np.float32)
+    batch_s = time.perf_counter() - start
+    np.save(vectors_out, vectors)
+
+    print(json.dumps({
+        "import_s": import_s,
+        "load_s": load_s,
+        "rss_after_load_mb": rss_loaded,
+        "rss_after_run_mb": rss_mb() - baseline,
+        "query_latency": summarize(latencies),
+        "batch_texts": len(chunks),
+        "batch_texts_per_s": len(chunks) / batch_s if batch_s else 0.0,
+    }))
+
+def run_probe(variant: str, args, vectors_out: str) -> dict:
+    command = [sys.executable, "-m", "bench.bench_embeddings", "--probe", variant, "--vectors-out", vectors_out,
+               "--queries", str(args.queries), "--batch-size", str(args.batch_size)]
+    if args.limit:
+        command += ["--limit", str(args.limit)]
+    completed = subprocess.run(command, cwd=ROOT, capture_output=True, text=True,
+                               env={**os.environ, **VARIANTS[variant]})
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else f"exit code {completed.returncode}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def cosine_parity(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosines = np.sum(reference * candidate, axis=1)
+    return {
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        "p1_cosine": float(np.percentile(cosines, 1)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and parity-check the embedding backends")
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--queries", type=int, default=200, help="Single-query calls per variant")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--limit", type=int, default=None, help="Embed only the first N chunks")
+    parser.add_argument("--min-cosine", type=float, default=0.99, help="Fail when an ONNX variant's mean cosine is lower")
+    parser.add_argument("--probe", choices=list(VARIANTS), help=argparse.SUPPRESS)
+    parser.add_argument("--vectors-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        probe(args.probe, args.queries, args.batch_size, args.limit, args.vectors_out)
+        return
+
+    results, failures = {}, []
+    with tempfile.TemporaryDirectory() as tmp:
+        for variant in args.variants:
+            vectors_out = os.path.join(tmp, f"{variant}.npy")
+            result = results[variant] = run_probe(variant, args, vectors_out)
+            if "error" in result:
+                print(f"{variant:<10} failed: {result['error']}")
+                failures.append(variant)
+                continue
+            print(f"{variant:<10} import {result['import_s']:6.2f}s  load {result['load_s']:6.2f}s  "
+                  f"rss {result['rss_after_load_mb']:7.1f}MB  query p50 {result['query_latency']['p50_ms']:6.2f}ms  "
+                  f"p99 {result['query_latency']['p99_ms']:6.2f}ms  batch {result['batch_texts_per_s']:8.1f} texts/s")
+
+        reference = os.path.join(tmp, "torch.npy")
+        if os.path.exists(reference):
+            for variant in args.variants:
+                vectors_out = os.path.join(tmp, f"{variant}.npy")
+                if variant == "torch" or not os.path.exists(vectors_out):
+                    continue
+                parity = results[variant]["parity"] = cosine_parity(np.load(reference), np.load(vectors_out))
+                print(f"{variant:<10} vs torch: mean cosine {parity['mean_cosine']:.5f}, "
+                      f"min {parity['min_cosine']:.5f}, p1 {parity['p1_cosine']:.5f}")
+                if parity["mean_cosine"] < args.min_cosine:
+                    failures.append(variant)
+
+    write_results("embeddings", {
+        "queries": args.queries,
+        "batch_size": args.batch_size,
+        "min_cosine": args.min_cosine,
+        "variants": results,
+        "failed": failures,
+    })
+    if failures:
+        print(f"❌ Failed: {', '.join(failures)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Metadata-filtered vector search: filter pushdown vs post-filtering.
+
+    python -m bench.bench_filtered_search --size 100000 --backends numpy hnsw --repos 1000 --matching 1 10 100 500
+
+Every synthetic vector belongs to one of `--repos` repositories
+(metadata {"repo": "r<n>"}); a filter on `--matching` of them selects
+that fraction of the corpus. Two ways to answer "top-k among the
+matching documents" are compared:
+
+- pushdown:    `query(..., where=filter)`, the filter applied inside the search
+- post-filter: an unfiltered top `k * --overfetch`, then drop the non-matching hits
+
+Reported per selectivity: latency (p50/p99) and recall@k against the
+exact filtered top-k. Pushdown is measured cold (a new filter every
+query, so the filter's row set is resolved each time) and warm (the
+same filter repeated). Post-filtering returns fewer than k results, or
+none, once the filter is more selective than 1 / overfetch. HNSW recall
+is low for any method on uniform random vectors (see
+bench_vector_stores); compare the methods with each other there.
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from bench.bench_vector_stores import DIM, query_vectors, synthetic_vectors
+from bench.common import summarize, write_results
+from vector_stores import open_vector_store
+
+def repo_of(n: int, repos: int) -> str:
+    return f"r{n % repos}"
+
+def build(backend: str, directory: str, size: int, dim: int, repos: int) -> float:
+    start = time.perf_counter()
+    store = open_vector_store(backend, directory)
+    for offset, block in synthetic_vectors(size, dim, seed=0):
+        ids = [f"v{offset + i}" for i in range(len(block))]
+        metadatas = [{"repo": repo_of(offset + i, repos)} for i in range(len(block))]
+        store.upsert(ids, block, [f"document {doc_id}" for doc_id in ids], metadatas)
+    store.persist()
+    store.close()
+    return time.perf_counter() - start
+
+def exact_top_k(size: int, dim: int, repos: int, allowed: set, queries: np.ndarray, k: int) -> list:
+    """Brute-force filtered top-k ids, the ground truth"""
+    best = [[] for _ in queries]
+    for offset, block in synthetic_vectors(size, dim, seed=0):
+        keep = np.array([repo_of(offset + i, repos) in allowed for i in range(len(block))])
+        if not keep.any():
+            continue
+        rows = np.flatnonzero(keep)
+        scores = queries @ block[rows].T
+        for q, row_scores in enumerate(scores):
+            best[q].extend((float(score), f"v{offset + row}") for score, row in zip(row_scores, rows))
+            best[q] = sorted(best[q], reverse=True)[:k]
+    return [[doc_id for _, doc_id in ranked] for ranked in best]
+
+def filter_for(matching: int, repos: int, shift: int = 0) -> dict:
+    """Filter on `matching` consecutive repositories, starting at `shift`"""
+    return {"repo": [f"r{(shift + n) % repos}" for n in range(matching)]}
+
+def recall(results, exact, k: int) -> float:
+    hits = sum(len(set(found) & set(truth)) for found, truth in zip(results, exact))
+    return hits / max(1, sum(min(k, len(truth)) for truth in exact))
+
+def timed(search, queries) -> tuple:
+    latencies, results = [], []
+    for i, vector in enumerate(queries):
+        start = time.perf_counter()
+        results.append(search(i, vector))
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies), results
+
+def measure(store, args, matching: int, queries: np.ndarray) -> dict:
+    k = args.k
+    where = filter_for(matching, args.repos)
+    allowed = set(where["repo"])
+    exact = exact_top_k(args.size, args.dim, args.repos, allowed, queries, k)
+
+    def pushdown(i, vector):
+        return [doc_id for doc_id, _, _ in store.query([vector], k, where=where)[0]]
+
+    def pushdown_cold(i, vector):
+        # A filter not seen before (an extra repository that matches nothing), same selectivity
+        fresh = {"repo": filter_for(matching, args.repos, shift=(i + 1) * matching)["repo"] + [f"cold{i}"]}
+        return [doc_id for doc_id, _, _ in store.query([vector], k, where=fresh)[0]]
+
+    def post_filter(i, vector):
+        hits = store.query([vector], k * args.overfetch)[0]
+        return [doc_id for doc_id, doc, _ in hits if doc.metadata.get("repo") in allowed][:k]
+
+    pushdown(0, queries[0])  # resolve the filter once; the warm runs reuse it
+    cold_latency, _ = timed(pushdown_cold, queries)
+    warm_latency, warm_results = timed(pushdown, queries)
+    post_latency, post_results = timed(post_filter, queries)
+    result = {
+        "selectivity": matching / args.repos,
+        "pushdown_cold": {"latency": cold_latency},
+        "pushdown": {"latency": warm_latency, "recall": recall(warm_results, exact, k)},
+        "post_filter": {
+            "latency": post_latency,
+            "recall": recall(post_results, exact, k),
+            "short_results": sum(len(found) < k for found in post_results) / len(post_results),
+        },
+    }
+    print(f"  {result['selectivity']:7.2%}  pushdown p50 {warm_latency['p50_ms']:7.2f}ms "
+          f"(cold {cold_latency['p50_ms']:7.2f}ms) recall {result['pushdown']['recall']:.3f}  |  "
+          f"post-filter p50 {post_latency['p50_ms']:7.2f}ms recall {result['post_filter']['recall']:.3f} "
+          f"short {result['post_filter']['short_results']:.0%}")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Filtered vector search: pushdown vs post-filtering")
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--backends", nargs="+", default=["numpy", "hnsw"], choices=["numpy", "hnsw", "chroma"])
+    parser.add_argument("--repos", type=int, default=1000, help="Distinct values of the filtered metadata key")
+    parser.add_argument("--matching", type=int, nargs="+", default=[1, 10, 100, 500],
+                        help="Repositories each filter selects (selectivity = matching / repos)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--overfetch", type=int, default=10, help="Post-filter fetches k * overfetch candidates")
+    parser.add_argument("--dim", type=int, default=DIM)
+    args = parser.parse_args()
+
+    queries = query_vectors(args.queries, args.dim)
+    report = {"size": args.size, "repos": args.repos, "k": args.k, "overfetch": args.overfetch,
+              "queries": args.queries, "backends": {}}
+    for backend in args.backends:
+        directory = tempfile.mkdtemp(prefix=f"bench_filtered_{backend}_")
+        try:
+            build_s = build(backend, directory, args.size, args.dim, args.repos)
+            print(f"\n{backend}: {args.size} vectors built in {build_s:.1f}s")
+            store = open_vector_store(backend, directory)
+            report["backends"][backend] = {
+                "build_s": build_s,
+                "filters": [measure(store, args, matching, queries) for matching in args.matching],
+            }
+            store.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    write_results("filtered_search", report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+End-to-end graph throughput and latency percentiles against the fake LLM.
+
+    python -m bench.bench_graph --requests 200 --concurrency 1 8 32 --llm-latency 0.2
+
+The fake LLM answers every request with the same completion after a fixed
+delay, so runs are deterministic apart from the machine itself. Each
+concurrency level sends `--requests` distinct queries through
+`graph.ainvoke` and reports requests/s, latency percentiles and the p50
+of every node. The semantic cache is off so each request reaches the LLM.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from bench.common import summarize, write_results
+from bench.fake_llm_server import FakeLLMServer
+
+TEMPLATES = [
+    "Write a function number {i} that merges two sorted lists",
+    "Explain how example {i} of binary search works",
+    "Create a function {i} to check if a string is a palindrome",
+    "How does recursion work in example {i}?",
+]
+
+def initial_state(query: str) -> dict:
+    return {
+        "messages": [],
+        "user_input": query,
+        "intent": "",
+        "documents": None,
+        "query_embedding": [],
+        "retrieved_context": [],
+        "llm_response": ""
+    }
+
+async def run_level(graph, queries, concurrency: int):
+    import metrics
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, node_timings = [], []
+
+    async def one(query):
+        async with semaphore:
+            with metrics.collect_timings() as timings:
+                start = time.perf_counter()
+                await graph.ainvoke(initial_state(query))
+                latencies.append(time.perf_counter() - start)
+            node_timings.append(timings)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(query) for query in queries))
+    wall = time.perf_counter() - start
+
+    stages = sorted({stage for timings in node_timings for stage in timings} - {"total"})
+    return {
+        "concurrency": concurrency,
+        "requests": len(queries),
+        "wall_s": wall,
+        "throughput_rps": len(queries) / wall if wall else 0.0,
+        "latency": summarize(latencies),
+        "stage_p50_ms": {
+            stage: statistics.median(timings.get(stage, 0.0) for timings in node_timings) for stage in stages
+        },
+    }
+
+async def run_levels(graph, requests: int, concurrency_levels):
+    levels = []
+    for concurrency in concurrency_levels:
+        queries = [TEMPLATES[i % len(TEMPLATES)].format(i=f"{concurrency}-{i}") for i in range(requests)]
+        result = await run_level(graph, queries, concurrency)
+        levels.append(result)
+        latency = result["latency"]
+        print(f"concurrency {concurrency:>3}: {result['throughput_rps']:7.1f} req/s  "
+              f"p50={latency['p50_ms']:.1f}ms p95={latency['p95_ms']:.1f}ms p99={latency['p99_ms']:.1f}ms")
+    return levels
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end graph benchmark against a fake LLM")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake LLM seconds per completion")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=args.llm_latency).start()
+    os.environ["OPENROUTER_BASE_URL"] = server.url
+    os.environ.setdefault("OPENROUTER_API_KEY", "fake-key")
+    os.environ["SEMANTIC_CACHE"] = "off"
+
+    from graph import build_blueprint_graph
+    from rag_langchain import init_pipeline
+
+    init_pipeline()
+    try:
+        # One event loop for every level: the LLM client's async connection pool is bound to it
+        levels = asyncio.run(run_levels(build_blueprint_graph(), args.requests, args.concurrency))
+    finally:
+        stats = server.stats()
+        server.stop()
+
+    write_results("graph", {
+        "llm_latency_s": args.llm_latency,
+        "llm_requests": stats["requests"],
+        "levels": levels,
+    })
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+End-to-end latency with retrieval running sequentially after the router
+vs. in parallel with it (LangGraph fan-out).
+
+    python -m bench.bench_graph_fanout --queries 100 --llm-latency 0.05
+
+Both graphs run the same queries against the fake LLM, alternating per
+query so drift affects both equally. Every query is distinct, so the
+embedding and semantic caches do not hide any work. The saving is
+bounded by the shorter of the two branches (router vs. retrieval).
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from bench.common import summarize, write_results
+from bench.fake_llm_server import FakeLLMServer
+
+def initial_state(query: str, rerank: bool) -> dict:
+    return {
+        "messages": [],
+        "user_input": query,
+        "intent": "",
+        "documents": None,
+        "query_embedding": [],
+        "rerank": rerank,
+        "retrieved_context": [],
+        "llm_response": ""
+    }
+
+async def run(graphs: dict, queries, rerank: bool):
+    import metrics
+
+    latencies = {name: [] for name in graphs}
+    node_ms = {name: {"router": [], "retrieve": []} for name in graphs}
+    for query in queries:
+        for name, graph in graphs.items():
+            with metrics.collect_timings() as timings:
+                start = time.perf_counter()
+                await graph.ainvoke(initial_state(f"{query} ({name})", rerank))
+                latencies[name].append(time.perf_counter() - start)
+            for node in node_ms[name]:
+                node_ms[name][node].append(timings.get(node, 0.0))
+    return latencies, node_ms
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs parallel retrieval in the graph")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake LLM seconds per request")
+    parser.add_argument("--rerank", action="store_true", help="Include the cross-encoder in retrieval")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=args.llm_latency).start()
+    os.environ["OPENROUTER_BASE_URL"] = server.url
+    os.environ.setdefault("OPENROUTER_API_KEY", "fake-key")
+    os.environ["SEMANTIC_CACHE"] = "off"
+
+    from graph import build_blueprint_graph
+    from rag_langchain import init_pipeline
+
+    init_pipeline()
+    graphs = {
+        "sequential": build_blueprint_graph(parallel_retrieval=False),
+        "parallel": build_blueprint_graph(parallel_retrieval=True),
+    }
+    queries = [f"Write a function number {i} that checks whether a list is sorted" for i in range(args.queries)]
+    latencies, node_ms = asyncio.run(run(graphs, queries, args.rerank))
+    server.stop()
+
+    results = {}
+    for name in graphs:
+        results[name] = {
+            **summarize(latencies[name]),
+            "router_p50_ms": statistics.median(node_ms[name]["router"]),
+            "retrieve_p50_ms": statistics.median(node_ms[name]["retrieve"]),
+        }
+        print(f"{name:<10} p50={results[name]['p50_ms']:.1f}ms p95={results[name]['p95_ms']:.1f}ms "
+              f"(router p50 {results[name]['router_p50_ms']:.2f}ms, retrieve p50 {results[name]['retrieve_p50_ms']:.2f}ms)")
+    saved = results["sequential"]["p50_ms"] - results["parallel"]["p50_ms"]
+    print(f"p50 saved by the fan-out: {saved:.1f}ms")
+
+    write_results("graph_fanout", {
+        "queries": args.queries,
+        "llm_latency_s": args.llm_latency,
+        "rerank": args.rerank,
+        "results": results,
+        "p50_saved_ms": saved,
+    })
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Ingestion throughput (chunks/sec) across worker and batch-size settings.
+
+    python -m bench.bench_ingestion --workers 0 2 4 --batch-sizes 16 64 256 --repeat 10
+
+HumanEval is replicated `--repeat` times (each copy is made unique) so the
+corpus is large enough to measure. Every setting indexes into a fresh
+temporary store with a cold embedding cache.
+"""
+from langchain_core.documents import Document
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+import argparse
+import tempfile
+import time
+
+from bench.common import write_results
+from embeddings import EMBEDDING_MODEL_NAME, CachedEmbeddings
+from ingestion import SPLITTER_SETTINGS, iter_humaneval_documents, iter_splits, settings_fingerprint, sync_vectorstore
+
+def replicated_corpus(base, repeat: int):
+    for copy in range(repeat):
+        for doc in base:
+            yield Document(
+                page_content=f"# copy {copy}\n{doc.page_content}",
+                metadata={**doc.metadata, "copy": copy},
+            )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion pipeline")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2, 4])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    base = list(iter_humaneval_documents())
+    splitter = RecursiveCharacterTextSplitter(**SPLITTER_SETTINGS)
+    fingerprint = settings_fingerprint(SPLITTER_SETTINGS, EMBEDDING_MODEL_NAME)
+    model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+
+    runs = []
+    for workers in args.workers:
+        for batch_size in args.batch_sizes:
+            embedding_model = CachedEmbeddings(model, namespace=EMBEDDING_MODEL_NAME, cache_dir=None)
+            with tempfile.TemporaryDirectory() as persist_dir:
+                start = time.perf_counter()
+                vectorstore, _ = sync_vectorstore(
+                    iter_splits(replicated_corpus(base, args.repeat), splitter),
+                    embedding_model,
+                    persist_dir,
+                    fingerprint,
+                    workers=workers,
+                    batch_size=batch_size,
+                    model_name=EMBEDDING_MODEL_NAME,
+                )
+                elapsed = time.perf_counter() - start
+                chunks = vectorstore.count()
+            runs.append({
+                "workers": workers,
+                "batch_size": batch_size,
+                "chunks": chunks,
+                "seconds": elapsed,
+                "chunks_per_sec": chunks / elapsed if elapsed else 0.0,
+            })
+            print(f"workers={workers:<2} batch={batch_size:<4} {chunks} chunks in {elapsed:.1f}s "
+                  f"→ {runs[-1]['chunks_per_sec']:.0f} chunks/sec")
+
+    write_results("ingestion", {"repeat": args.repeat, "runs": runs})
+
+if __name__ == "__main__":
+    main()
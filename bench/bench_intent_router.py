@@ -0,0 +1,90 @@
+"""
+Intent routing accuracy and latency on a labeled eval set.
+
+    python -m bench.bench_intent_router --margins 0 0.01 0.02 0.05
+
+Compares the original substring-keyword router, the whole-word keyword
+router and the centroid router at several fallback margins. Query
+embeddings are computed up front; the router reuses the retrieval
+embedding in the graph, so only classification time is measured.
+"""
+import argparse
+import json
+import os
+import time
+
+from bench.common import summarize, write_results
+from embeddings import get_embedding_model
+from intent_router import CentroidIntentRouter, keyword_intent, load_intent_examples
+
+EVAL_FILE = os.path.join(os.path.dirname(__file__), "data", "intent_eval.jsonl")
+
+def substring_intent(text: str) -> str:
+    """The router_node logic before the centroid router (substring keyword counts)"""
+    user_input = text.lower()
+    generate_keywords = {"generate", "create", "write", "make", "build", "code", "function", "implement"}
+    explain_keywords = {"explain", "describe", "how", "what", "why", "works", "meaning", "understand"}
+    generate_matches = len([k for k in generate_keywords if k in user_input])
+    explain_matches = len([k for k in explain_keywords if k in user_input])
+    if generate_matches > explain_matches:
+        return "generate_code"
+    if explain_matches > generate_matches:
+        return "explain_code"
+    return "explain_code" if any(q in user_input for q in ["how", "what", "why", "?"]) else "generate_code"
+
+def evaluate(route, examples):
+    correct, fallbacks, latencies = 0, 0, []
+    for text, vector, label in examples:
+        start = time.perf_counter()
+        intent, method = route(text, vector)
+        latencies.append(time.perf_counter() - start)
+        correct += intent == label
+        fallbacks += method == "keyword"
+    return {
+        "accuracy": correct / len(examples),
+        "keyword_fallback_rate": fallbacks / len(examples),
+        "latency": summarize(latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark intent routers")
+    parser.add_argument("--margins", type=float, nargs="+", default=[0.0, 0.01, 0.02, 0.05])
+    parser.add_argument("--eval-file", default=EVAL_FILE)
+    args = parser.parse_args()
+
+    with open(args.eval_file, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    embedding_model = get_embedding_model()
+    vectors = embedding_model.embed_queries([record["text"] for record in records])
+    examples = [(record["text"], vector, record["intent"]) for record, vector in zip(records, vectors)]
+
+    start = time.perf_counter()
+    training = load_intent_examples()
+    router = CentroidIntentRouter.fit(embedding_model, training)
+    fit_s = time.perf_counter() - start
+
+    routers = {
+        "substring": lambda text, vector: (substring_intent(text), "keyword"),
+        "keyword": lambda text, vector: (keyword_intent(text), "keyword"),
+    }
+    for margin in args.margins:
+        routers[f"centroid@{margin}"] = CentroidIntentRouter(
+            dict(zip(router.intents, router.centroids)), margin=margin
+        ).route
+
+    results = {}
+    for name, route in routers.items():
+        results[name] = evaluate(route, examples)
+        print(f"{name:<15} accuracy={results[name]['accuracy']:.3f} "
+              f"fallback={results[name]['keyword_fallback_rate']:.2f} "
+              f"p50={results[name]['latency']['p50_ms'] * 1000:.1f}us")
+
+    write_results("intent_router", {
+        "eval_examples": len(examples),
+        "training_examples": len(training),
+        "fit_s": fit_s,
+        "results": results,
+    })
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+LLM client behaviour under injected rate limiting.
+
+    python -m bench.bench_llm_client --requests 100 --concurrency 32 --error-rate 0.3
+
+Fires concurrent completions at the fake server, which answers a share of
+them with 429 + Retry-After. The primary model can be made to fail every
+time (--fail-primary) to exercise fallback. Reports success rate, retries,
+fallbacks, latency and the peak number of in-flight requests the server saw.
+"""
+import argparse
+import asyncio
+import time
+
+import metrics
+from bench.common import summarize, write_results
+from bench.fake_llm_server import FakeLLMServer
+from llm_client import create_llm_client
+
+async def run(client, requests: int, concurrency: int):
+    gate = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(i):
+        nonlocal failures
+        async with gate:
+            start = time.perf_counter()
+            try:
+                await client.ainvoke(f"request {i}")
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies, failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM client against injected 429s")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent callers")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="Client in-flight cap")
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--fail-primary", action="store_true")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=args.latency, error_rate=args.error_rate, retry_after=args.retry_after,
+                           fail_models=["primary"] if args.fail_primary else ()).start()
+    client = create_llm_client(
+        server.url, "fake-key", ["primary", "fallback"],
+        max_concurrency=args.max_concurrency, rate_limit=args.rate_limit,
+        max_retries=5, backoff_base=0.05, backoff_max=2.0,
+    )
+    metrics.reset()
+    start = time.perf_counter()
+    latencies, failures = asyncio.run(run(client, args.requests, args.concurrency))
+    elapsed = time.perf_counter() - start
+    server.stop()
+
+    result = {
+        "config": vars(args),
+        "elapsed_s": elapsed,
+        "success_rate": len(latencies) / args.requests,
+        "failures": failures,
+        "retries": metrics.get("llm_retries"),
+        "fallbacks": metrics.get("llm_fallbacks"),
+        "server": server.stats(),
+        "latency": summarize(latencies),
+    }
+    print(f"success={result['success_rate']:.1%} retries={result['retries']} fallbacks={result['fallbacks']} "
+          f"max_in_flight={result['server']['max_in_flight']} p50={result['latency']['p50_ms']:.0f}ms "
+          f"p99={result['latency']['p99_ms']:.0f}ms")
+    write_results("llm_client", result)
+
+if __name__ == "__main__":
+    main()
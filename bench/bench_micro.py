@@ -0,0 +1,74 @@
+"""
+Microbenchmarks for the per-request building blocks.
+
+    python -m bench.bench_micro --iterations 200
+
+Each stage is timed in isolation on the real pipeline (no LLM calls):
+
+- embedding: a fresh query (model forward pass), a cached query, and a
+  batch of 32 queries
+- vector search, BM25 search and the full hybrid search (precomputed vector)
+- intent routing: centroid router and keyword router
+- prompt assembly: context building plus prompt formatting
+"""
+import argparse
+import time
+
+from bench.common import summarize, write_results
+
+QUERY = "Write a function that returns the longest palindromic substring"
+
+def time_calls(func, iterations: int) -> dict:
+    func(0)  # warm-up
+    latencies = []
+    for i in range(1, iterations + 1):
+        start = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for embedding, search, routing and prompts")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    from langchain_core.messages import HumanMessage
+    from langchain_core.prompts import ChatPromptTemplate
+    from intent_router import keyword_intent
+    from nodes_langchain import _chain_inputs
+    from rag_langchain import CODE_GENERATION_TEMPLATE, HYBRID_CANDIDATES, init_pipeline
+
+    pipeline = init_pipeline()
+    embeddings = pipeline.embedding_model
+    vector = embeddings.embed_query(QUERY)
+    docs = pipeline.search(QUERY, query_embedding=vector)["documents"]
+    prompt = ChatPromptTemplate.from_template(CODE_GENERATION_TEMPLATE)
+    state = {"messages": [HumanMessage(QUERY)], "summary": "", "user_input": QUERY, "documents": docs}
+    run_id = time.time_ns()  # fresh texts per run, so "uncached" really reaches the model
+
+    stages = {
+        "embed_query_uncached": lambda i: embeddings.embed_query(f"{QUERY} #{run_id}-{i}"),
+        "embed_query_cached": lambda i: embeddings.embed_query(QUERY),
+        f"embed_batch_{args.batch_size}": lambda i: embeddings.embed_queries(
+            [f"{QUERY} #{run_id}-{i}-{j}" for j in range(args.batch_size)]
+        ),
+        "vector_search": lambda i: pipeline.vector_search([vector], HYBRID_CANDIDATES),
+        "bm25_search": lambda i: pipeline.bm25_search(QUERY, HYBRID_CANDIDATES),
+        "hybrid_search": lambda i: pipeline.search(QUERY, query_embedding=vector),
+        "keyword_router": lambda i: keyword_intent(QUERY),
+        "prompt_assembly": lambda i: prompt.format_messages(**_chain_inputs(state)),
+    }
+    if pipeline.intent_router is not None:
+        stages["centroid_router"] = lambda i: pipeline.intent_router.route(QUERY, vector)
+
+    results = {}
+    for name, func in stages.items():
+        iterations = max(1, args.iterations // args.batch_size) if name.startswith("embed_batch") else args.iterations
+        results[name] = time_calls(func, iterations)
+        print(f"{name:<22} p50={results[name]['p50_ms']:8.3f}ms p99={results[name]['p99_ms']:8.3f}ms")
+
+    write_results("micro", {"iterations": args.iterations, "batch_size": args.batch_size, "stages": results})
+
+if __name__ == "__main__":
+    main()
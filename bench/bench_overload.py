@@ -0,0 +1,212 @@
+"""
+Overload soak test: admission control, deadlines and cancellation.
+
+    python -m bench.bench_overload --duration 60 --rate 20 --latency 2 --compare
+
+Serves the app with uvicorn against a slow fake LLM and offers more load
+than it can serve. Requests arrive open-loop (Poisson, `--rate` per
+second) as a mix of /generate, /explain and small /query/batch posts.
+Every interactive request carries `timeout_ms`, and `--abandon` of the
+clients give up early and hang up.
+
+Reported per traffic class: status counts (200 / 503 shed / 504 past the
+deadline) and the latency of all responses. The server's cancellation
+counters from /metrics show the work dropped for deadlines and
+disconnects; the fake LLM counts the calls that were cut off. The run
+fails if the p99 of an interactive class exceeds its deadline plus
+`--slack-ms`. `--compare` repeats the soak with admission control and
+deadlines off, where latency grows with the length of the run instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from typing import Optional
+
+from bench.common import ROOT, summarize, write_results
+from bench.fake_llm_server import FakeLLMServer
+
+QUERIES = {
+    "generate": "Write a function that returns the {}th prime number",
+    "explain": "Explain how a function computing the {}th Fibonacci number works",
+}
+PATHS = {"generate": "/generate", "explain": "/explain"}
+MIX = (("generate", 0.6), ("explain", 0.3), ("batch", 0.1))
+CANCELLED = re.compile(r'^rag_requests_cancelled_total\{reason="(\w+)"\} (\d+)', re.MULTILINE)
+REJECTED = re.compile(r'^rag_admission_rejected_total\{priority="(\w+)"\} (\d+)', re.MULTILINE)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_app(port: int, env: dict, timeout: float):
+    command = [sys.executable, "-m", "uvicorn", "app.main_app:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning"]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited during startup:\n{process.stderr.read()[-2000:]}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("App not ready in time")
+
+async def soak(base_url: str, duration: float, rate: float, timeout_ms: Optional[int], abandon: float,
+               abandon_after: float, batch_size: int, seed: int) -> list:
+    """(class, status, seconds) of every request; status 0 = abandoned by the client"""
+    import httpx
+
+    rng = random.Random(seed)
+    records = []
+
+    async def one(client, i: int, kind: str):
+        start = time.perf_counter()
+        client_timeout = abandon_after if rng.random() < abandon else None
+        try:
+            if kind == "batch":
+                items = [{"query": QUERIES["generate"].format(f"{i}-{n}")} for n in range(batch_size)]
+                response = await client.post("/query/batch", json=items, timeout=client_timeout)
+                status = response.status_code
+                if status == 200:
+                    failed = sum(not json.loads(line)["success"] for line in response.text.splitlines() if line)
+                    status = f"200 ({failed} items failed)" if failed else 200
+            else:
+                body = {"query": QUERIES[kind].format(i)}
+                if timeout_ms:
+                    body["timeout_ms"] = timeout_ms
+                response = await client.post(PATHS[kind], json=body, timeout=client_timeout)
+                status = response.status_code
+        except httpx.TimeoutException:
+            status = 0
+        records.append((kind, status, time.perf_counter() - start))
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=600) as client:
+        tasks, start, i = [], time.perf_counter(), 0
+        while time.perf_counter() - start < duration:
+            kind = rng.choices([kind for kind, _ in MIX], weights=[weight for _, weight in MIX])[0]
+            tasks.append(asyncio.create_task(one(client, i, kind)))
+            i += 1
+            await asyncio.sleep(rng.expovariate(rate))
+        await asyncio.gather(*tasks)
+    return records
+
+def summarize_records(records: list) -> dict:
+    classes = {}
+    for kind in sorted({kind for kind, _, _ in records}):
+        mine = [(status, seconds) for k, status, seconds in records if k == kind]
+        statuses = {}
+        for status, _ in mine:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        classes[kind] = {
+            "statuses": statuses,
+            "latency": summarize([seconds for status, seconds in mine if status != 0]),
+            "ok_latency": summarize([seconds for status, seconds in mine if status == 200]),
+        }
+    return classes
+
+def counters(metrics_text: str, pattern: re.Pattern) -> dict:
+    return {label: int(value) for label, value in pattern.findall(metrics_text)}
+
+def run(label: str, args, env: dict, server, deadlines: bool = True) -> dict:
+    import httpx
+
+    port = free_port()
+    before = server.stats()
+    process = start_app(port, env, args.startup_timeout)
+    try:
+        # Clients that give up hang up after a quarter of the deadline
+        records = asyncio.run(soak(f"http://127.0.0.1:{port}", args.duration, args.rate,
+                                   args.timeout_ms if deadlines else None, args.abandon, args.timeout_ms / 4000.0,
+                                   args.batch_size, args.seed))
+        metrics_text = httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=10).text
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    result = {
+        "classes": summarize_records(records),
+        "cancelled": counters(metrics_text, CANCELLED),
+        "rejected": counters(metrics_text, REJECTED),
+        "llm_calls": server.stats()["requests"] - before["requests"],
+        "llm_hangups": server.stats()["hangups"] - before["hangups"],
+        "offered": len(records),
+    }
+    print(f"\n{label}: {result['offered']} requests offered, {result['llm_calls']} LLM calls "
+          f"({result['llm_hangups']} cancelled mid-call), "
+          f"cancelled {result['cancelled'] or {}}, shed {result['rejected'] or {}}")
+    for kind, summary in result["classes"].items():
+        print(f"  {kind:<9} {summary['statuses']}  p50 {summary['latency']['p50_ms']:7.0f}ms  "
+              f"p99 {summary['latency']['p99_ms']:7.0f}ms  max {summary['latency']['max_ms']:7.0f}ms")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak the API with more load than it can serve")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of offered load")
+    parser.add_argument("--rate", type=float, default=20.0, help="Mean arrivals per second")
+    parser.add_argument("--latency", type=float, default=2.0, help="Fake LLM seconds per completion")
+    parser.add_argument("--timeout-ms", type=int, default=5000, help="Deadline of every interactive request")
+    parser.add_argument("--abandon", type=float, default=0.1, help="Fraction of clients that hang up early")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--max-concurrent", type=int, default=16, help="MAX_CONCURRENT_REQUESTS of the app")
+    parser.add_argument("--queue-size", type=int, default=32, help="ADMISSION_QUEUE_SIZE of the app")
+    parser.add_argument("--slack-ms", type=float, default=1000.0, help="Allowed p99 above the deadline")
+    parser.add_argument("--compare", action="store_true", help="Also soak with admission control and deadlines off")
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=args.latency).start()
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+        "OPENROUTER_BASE_URL": server.url,
+        "OPENROUTER_API_KEY": os.environ.get("OPENROUTER_API_KEY", "fake-key"),
+        # Every request must reach the LLM, not the response cache
+        "SEMANTIC_CACHE": "off",
+        "MAX_CONCURRENT_REQUESTS": str(args.max_concurrent),
+        "ADMISSION_QUEUE_SIZE": str(args.queue_size),
+    }
+    try:
+        runs = {"admission": run("admission control", args, env, server)}
+        if args.compare:
+            runs["unbounded"] = run("no admission control", args, {**env, "MAX_CONCURRENT_REQUESTS": "0"}, server,
+                                    deadlines=False)
+    finally:
+        server.stop()
+
+    bound_ms = args.timeout_ms + args.slack_ms
+    failures = [kind for kind in PATHS
+                if kind in runs["admission"]["classes"] and runs["admission"]["classes"][kind]["latency"]["p99_ms"] > bound_ms]
+    write_results("overload", {
+        "duration_s": args.duration,
+        "rate": args.rate,
+        "latency_s": args.latency,
+        "timeout_ms": args.timeout_ms,
+        "abandon": args.abandon,
+        "max_concurrent": args.max_concurrent,
+        "queue_size": args.queue_size,
+        "runs": runs,
+        "failed": failures,
+    })
+    if failures:
+        print(f"\n❌ p99 above {bound_ms:.0f}ms: {', '.join(failures)}")
+        sys.exit(1)
+    print(f"\n✅ Interactive p99 stayed under {bound_ms:.0f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Multi-worker serving: prefork launcher vs. `uvicorn --workers`.
+
+    python -m bench.bench_prefork --workers 1 4 8
+
+For each worker count, both launchers start the app against the fake LLM
+in a scratch directory. The index there is built once, before any timed
+run. Each run reports:
+
+- startup: seconds from launch until every worker serves, plus each
+  worker's own startup. For prefork that is after the fork; for uvicorn
+  it is from launch, because every worker loads everything itself.
+- memory per worker from /proc/<pid>/smaps_rollup: RSS, PSS, and the
+  shared and private parts. PSS divides shared pages among the processes
+  that map them, so the PSS total over master + workers is the real
+  footprint.
+
+One /query request is served per run as a smoke test.
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench.common import ROOT, write_results
+from bench.fake_llm_server import FakeLLMServer
+
+LAUNCHERS = ("prefork", "uvicorn")
+READY = re.compile(r"System ready")
+PREFORK_READY = re.compile(r"Worker (\d+) ready: pid (\d+), startup ([\d.]+)s")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def smaps_mb(pid: int) -> dict:
+    """RSS, PSS, shared and private memory of a process in MB"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024.0
+    return {
+        "rss_mb": fields.get("Rss", 0.0),
+        "pss_mb": fields.get("Pss", 0.0),
+        "shared_mb": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private_mb": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+def children(pid: int):
+    with open(f"/proc/{pid}/task/{pid}/children", encoding="utf-8") as f:
+        return [int(child) for child in f.read().split()]
+
+def cmdline(pid: int) -> str:
+    with open(f"/proc/{pid}/cmdline", "rb") as f:
+        return f.read().replace(b"\0", b" ").decode("utf-8", "replace")
+
+class Launch:
+    """A launcher subprocess whose output lines are timestamped as they arrive"""
+
+    def __init__(self, command, env, cwd):
+        self.started = time.perf_counter()
+        self.lines = []
+        self.process = subprocess.Popen(command, env=env, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        text=True, start_new_session=True)
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            self.lines.append((time.perf_counter() - self.started, line.rstrip()))
+
+    def wait_for(self, pattern: re.Pattern, count: int, timeout: float):
+        """(time, match) of the first `count` matches; workers share stdout, so one line can hold several"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            found = [(t, match) for t, line in list(self.lines) for match in pattern.finditer(line)]
+            if len(found) >= count:
+                return found[:count]
+            if self.process.poll() is not None:
+                break
+            time.sleep(0.05)
+        tail = "\n".join(line for _, line in self.lines[-20:])
+        raise RuntimeError(f"{count} x {pattern.pattern!r} not seen in time; last output:\n{tail}")
+
+    def stop(self):
+        if self.process.poll() is None:
+            os.killpg(self.process.pid, signal.SIGTERM)
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+                self.process.wait()
+
+def run(launcher: str, workers: int, env: dict, workdir: str, timeout: float) -> dict:
+    import httpx
+
+    port = free_port()
+    if launcher == "prefork":
+        command = [sys.executable, "-m", "app.serve", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "app.main_app:app", "--workers", str(workers),
+                   "--host", "127.0.0.1", "--port", str(port)]
+    launch = Launch(command, env, workdir)
+    try:
+        ready = launch.wait_for(READY, workers, timeout)
+        if launcher == "prefork":
+            reports = launch.wait_for(PREFORK_READY, workers, timeout)
+            workers_info = [{"pid": int(m.group(2)), "startup_s": float(m.group(3))} for _, m in reports]
+        else:
+            # With one worker uvicorn serves from the launched process itself
+            pids = [pid for pid in children(launch.process.pid) if "spawn_main" in cmdline(pid)] or [launch.process.pid]
+            workers_info = [{"pid": pid, "startup_s": t} for pid, (t, _) in zip(sorted(pids), ready)]
+        for info in workers_info:
+            info.update(smaps_mb(info["pid"]))
+        separate_master = launch.process.pid not in {info["pid"] for info in workers_info}
+        master = smaps_mb(launch.process.pid) if separate_master else None
+
+        response = httpx.post(f"http://127.0.0.1:{port}/query", json={"query": "Write a function to add two numbers"},
+                              timeout=60)
+        response.raise_for_status()
+    finally:
+        launch.stop()
+
+    return {
+        "launcher": launcher,
+        "workers": workers,
+        "ready_s": max(t for t, _ in ready),
+        "worker_startup_s": [info["startup_s"] for info in workers_info],
+        "master": master,
+        "per_worker": workers_info,
+        "mean_worker_rss_mb": sum(info["rss_mb"] for info in workers_info) / len(workers_info),
+        "mean_worker_pss_mb": sum(info["pss_mb"] for info in workers_info) / len(workers_info),
+        "total_pss_mb": (master["pss_mb"] if master else 0.0) + sum(info["pss_mb"] for info in workers_info),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare prefork and uvicorn multi-worker startup and memory")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--launchers", nargs="+", choices=LAUNCHERS, default=list(LAUNCHERS))
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds to wait for all workers")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=0.01).start()
+    workdir = tempfile.mkdtemp(prefix="bench_prefork_")
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+        "PYTHONUNBUFFERED": "1",
+        "OPENROUTER_BASE_URL": server.url,
+        "OPENROUTER_API_KEY": os.environ.get("OPENROUTER_API_KEY", "fake-key"),
+        "VECTOR_STORE": os.environ.get("VECTOR_STORE", "numpy"),
+    }
+    try:
+        # Build the index and the embedding cache once, outside the timed runs
+        subprocess.run([sys.executable, "-c", "from rag_langchain import init_pipeline; init_pipeline()"],
+                       env=env, cwd=workdir, check=True, capture_output=True)
+        results = []
+        for workers in args.workers:
+            for launcher in args.launchers:
+                result = run(launcher, workers, env, workdir, args.timeout)
+                results.append(result)
+                print(f"{launcher:<8} {workers} workers: ready in {result['ready_s']:6.2f}s  "
+                      f"worker RSS {result['mean_worker_rss_mb']:7.1f}MB  PSS {result['mean_worker_pss_mb']:7.1f}MB  "
+                      f"total PSS {result['total_pss_mb']:8.1f}MB")
+    finally:
+        server.stop()
+
+    write_results("prefork", {"vector_store": env["VECTOR_STORE"], "workdir": workdir, "results": results})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Per-turn latency as a session grows.
+
+    python -m bench.bench_sessions --turns 10 100 1000
+
+Runs one long conversation through the SQLite-checkpointed graph against
+the fake LLM and reports per-turn latency over the last 10 turns before
+each checkpoint turn. `--unbounded` also runs with history summarization
+disabled, for comparison.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from bench.common import summarize, write_results
+from bench.fake_llm_server import FakeLLMServer
+
+WINDOW = 10
+
+def run_session(graph, turns: int, checkpoints):
+    from sessions import session_config, turn_input
+
+    config = session_config(f"bench-{time.time_ns()}")
+    latencies, results = [], {}
+    for turn in range(1, turns + 1):
+        start = time.perf_counter()
+        state = graph.invoke(turn_input(f"Write a function number {turn} that reverses a list"), config)
+        latencies.append(time.perf_counter() - start)
+        if turn in checkpoints:
+            results[f"turn_{turn}"] = {
+                **summarize(latencies[-WINDOW:]),
+                "history_messages": len(state["messages"]),
+            }
+            print(f"  turn {turn:>5}: p50={results[f'turn_{turn}']['p50_ms']:.1f}ms "
+                  f"messages={len(state['messages'])}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-turn latency of long sessions")
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--unbounded", action="store_true", help="Also run without history summarization")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=0.0).start()
+    os.environ["OPENROUTER_BASE_URL"] = server.url
+    os.environ.setdefault("OPENROUTER_API_KEY", "fake-key")
+    os.environ["SEMANTIC_CACHE"] = "off"
+
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    from graph import build_blueprint_graph
+    from rag_langchain import init_pipeline
+    import nodes_langchain
+
+    init_pipeline()
+    checkpoints = set(args.turns)
+    modes = {"bounded": nodes_langchain.HISTORY_TOKEN_BUDGET}
+    if args.unbounded:
+        modes["unbounded"] = 10 ** 12
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, budget in modes.items():
+            print(f"{mode} (history budget {budget} tokens)")
+            nodes_langchain.HISTORY_TOKEN_BUDGET = budget
+            conn = sqlite3.connect(os.path.join(tmp, f"{mode}.sqlite3"), check_same_thread=False)
+            graph = build_blueprint_graph(checkpointer=SqliteSaver(conn))
+            results[mode] = run_session(graph, max(args.turns), checkpoints)
+            conn.close()
+    server.stop()
+
+    write_results("sessions", {"window": WINDOW, "results": results})
+
+if __name__ == "__main__":
+    main()
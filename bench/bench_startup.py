@@ -0,0 +1,57 @@
+"""
+Startup cost broken down into import, model load and index open.
+
+    python -m bench.bench_startup
+
+Imports are timed in fresh interpreters so module caches do not hide
+their cost; the pipeline stages are timed in-process by RAGPipeline.build().
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from bench.common import write_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["graph", "plot", "app.main_app"]
+
+def time_import(module: str) -> float:
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; "
+        "print(time.perf_counter() - start)"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark startup stages")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh-interpreter runs per import")
+    args = parser.parse_args()
+
+    imports = {}
+    for module in MODULES:
+        runs = [time_import(module) for _ in range(args.repeat)]
+        imports[module] = min(runs)
+        print(f"import {module:<14} {imports[module] * 1000:8.1f} ms")
+
+    from rag_langchain import RAGPipeline
+
+    start = time.perf_counter()
+    pipeline = RAGPipeline().build()
+    total = time.perf_counter() - start
+    for stage, seconds in pipeline.timings.items():
+        print(f"{stage:<21} {seconds * 1000:8.1f} ms")
+
+    write_results("startup", {
+        "import_s": imports,
+        "pipeline_s": pipeline.timings,
+        "pipeline_total_s": total,
+    })
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Vector store backends: build time, load time, memory and query latency.
+
+    python -m bench.bench_vector_stores --sizes 1000 100000 1000000 --backends numpy hnsw chroma
+
+Each backend is filled with the same synthetic L2-normalized vectors
+(written in blocks, the way ingestion does), then opened in a fresh
+interpreter so load time and resident memory are measured cold. RSS is
+read from /proc and includes the mmap'd pages a backend actually touched.
+Latency is for single-query top-k, the shape of an interactive request.
+For "hnsw", recall@k is measured against exact brute-force results.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bench.common import ROOT, rss_mb, summarize, write_results
+from vector_stores import open_vector_store
+
+DIM = 384  # all-MiniLM-L6-v2
+BLOCK = 5000
+
+def synthetic_vectors(count: int, dim: int, seed: int):
+    """Yield (start, block) of normalized vectors without holding them all"""
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, BLOCK):
+        block = rng.standard_normal((min(BLOCK, count - start), dim), dtype=np.float32)
+        yield start, block / np.linalg.norm(block, axis=1, keepdims=True)
+
+def query_vectors(count: int, dim: int) -> np.ndarray:
+    return next(synthetic_vectors(count, dim, seed=1))[1]
+
+def build(backend: str, directory: str, size: int, dim: int) -> float:
+    start = time.perf_counter()
+    store = open_vector_store(backend, directory)
+    for offset, block in synthetic_vectors(size, dim, seed=0):
+        ids = [f"v{offset + i}" for i in range(len(block))]
+        store.upsert(ids, block, [f"document {doc_id}" for doc_id in ids], [{"n": offset + i} for i in range(len(block))])
+    store.persist()
+    return time.perf_counter() - start
+
+def probe(backend: str, directory: str, queries: int, k: int, dim: int):
+    """Runs in a fresh interpreter; prints one JSON line"""
+    baseline = rss_mb()
+    start = time.perf_counter()
+    store = open_vector_store(backend, directory)
+    load_s = time.perf_counter() - start
+    rss_open = rss_mb() - baseline
+
+    latencies, results = [], []
+    for vector in query_vectors(queries, dim):
+        start = time.perf_counter()
+        hits = store.query([vector], k)[0]
+        latencies.append(time.perf_counter() - start)
+        results.append([doc_id for doc_id, _, _ in hits])
+    print(json.dumps({
+        "load_s": load_s,
+        "rss_after_open_mb": rss_open,
+        "rss_after_queries_mb": rss_mb() - baseline,
+        "latency": summarize(latencies),
+        "results": results,
+    }))
+
+def run_probe(backend: str, directory: str, queries: int, k: int, dim: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "bench.bench_vector_stores", "--probe", backend, directory,
+         "--queries", str(queries), "--k", str(k), "--dim", str(dim)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def recall(results, exact) -> float:
+    hits = sum(len(set(found) & set(truth)) for found, truth in zip(results, exact))
+    return hits / max(1, sum(len(truth) for truth in exact))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vector store backends")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--backends", nargs="+", default=["numpy", "hnsw", "chroma"])
+    parser.add_argument("--chroma-max", type=int, default=100000, help="Skip chroma above this size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=DIM)
+    parser.add_argument("--probe", nargs=2, metavar=("BACKEND", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        probe(*args.probe, args.queries, args.k, args.dim)
+        return
+
+    runs = []
+    for size in args.sizes:
+        exact = None
+        for backend in args.backends:
+            if backend == "chroma" and size > args.chroma_max:
+                print(f"skip chroma at {size} vectors (--chroma-max {args.chroma_max})")
+                continue
+            directory = tempfile.mkdtemp(prefix=f"vs_{backend}_")
+            try:
+                build_s = build(backend, directory, size, args.dim)
+                result = run_probe(backend, directory, args.queries, args.k, args.dim)
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+            results = result.pop("results")
+            if backend == "numpy":
+                exact = results
+            if exact is not None:
+                result["recall_at_k"] = recall(results, exact)
+            runs.append({"backend": backend, "vectors": size, "build_s": build_s, **result})
+            latency = result["latency"]
+            print(f"{backend:<7} {size:>8} vectors: build {build_s:7.1f}s  load {result['load_s'] * 1000:8.1f}ms  "
+                  f"rss {result['rss_after_queries_mb']:7.1f}MB  p50 {latency['p50_ms']:7.2f}ms  "
+                  f"p99 {latency['p99_ms']:7.2f}ms  recall {result.get('recall_at_k', float('nan')):.3f}")
+
+    write_results("vector_stores", {"dim": args.dim, "k": args.k, "queries": args.queries, "runs": runs})
+
+if __name__ == "__main__":
+    main()
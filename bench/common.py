@@ -0,0 +1,70 @@
+from datetime import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+# ----------------------------------------
+# Shared helpers for benchmark scripts
+# ----------------------------------------
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+def summarize(latencies) -> dict:
+    """Latency summary in milliseconds"""
+    ms = [v * 1000.0 for v in latencies]
+    return {
+        "count": len(ms),
+        "mean_ms": statistics.fmean(ms) if ms else 0.0,
+        "p50_ms": percentile(ms, 50),
+        "p95_ms": percentile(ms, 95),
+        "p99_ms": percentile(ms, 99),
+        "max_ms": max(ms) if ms else 0.0,
+    }
+
+def rss_mb() -> float:
+    """Resident memory of this process in MB (Linux)"""
+    with open("/proc/self/status", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+def environment() -> dict:
+    """Where a result came from, so runs can be compared across releases"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "git_commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+def write_results(name: str, payload: dict, results_dir: str = RESULTS_DIR) -> str:
+    """Write a benchmark result as JSON and return its path"""
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"{name}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "benchmark": name,
+            "timestamp": datetime.now().isoformat(),
+            "environment": environment(),
+            **payload,
+        }, f, indent=2)
+    print(f"✅ Results written to {path}")
+    return path
@@ -0,0 +1,117 @@
+"""
+HumanEval pass@1 for the code generation path.
+
+    python -m bench.eval_humaneval --limit 164 --concurrency 8 --workers 4
+    python -m bench.eval_humaneval --canonical      # check the harness itself
+
+Every task's prompt is sent through retrieval, context building and the
+code generation chain (one greedy sample per task, so pass@1 is the
+fraction of tasks whose sample passes). The completion is executed against
+the task's `check` function in a sandboxed subprocess (see bench/sandbox.py).
+
+The index holds the HumanEval solutions themselves, so chunks of the task
+being solved are removed from its context unless `--allow-self` is given.
+`--canonical` skips the LLM and runs the reference solutions, which should
+all pass.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+import argparse
+import re
+import time
+
+from bench.common import summarize, write_results
+from bench.sandbox import DEFAULT_TIMEOUT, SandboxPool
+
+CODE_BLOCK_RE = re.compile(r"```(?:python|py)?[ \t]*\n(.*?)```", re.DOTALL)
+QUESTION_TEMPLATE = "Complete the following Python function. Return the whole function in one code block.\n\n{prompt}"
+
+def extract_code(response: str) -> str:
+    """The first fenced code block that defines something, else the raw response"""
+    blocks = CODE_BLOCK_RE.findall(response)
+    for block in blocks:
+        if "def " in block:
+            return block
+    return blocks[0] if blocks else response
+
+def build_program(task: dict, completion: str) -> str:
+    """Prompt + completion + the task's tests; a full function definition replaces the prompt's stub"""
+    code = extract_code(completion)
+    if re.search(rf"^\s*def\s+{re.escape(task['entry_point'])}\s*\(", code, re.MULTILINE):
+        # The prompt (imports, helpers, a docstring-only stub) stays valid Python; the new def overrides it
+        program = task["prompt"] + "\n\n" + code
+    else:
+        program = task["prompt"] + code
+    return f"{program}\n\n{task['test']}\n\ncheck({task['entry_point']})\n"
+
+def generate(pipeline, task: dict, allow_self: bool) -> str:
+    from rag_langchain import RETRIEVAL_K
+
+    question = QUESTION_TEMPLATE.format(prompt=task["prompt"])
+    docs = pipeline.search(question, k=RETRIEVAL_K * 2)["documents"]
+    if not allow_self:
+        docs = [doc for doc in docs if doc.metadata.get("task_id") != task["task_id"]]
+    context, _ = pipeline.context_builder.build(docs[:RETRIEVAL_K])
+    return pipeline.code_rag_chain.invoke({"context": context, "history": "", "question": question})
+
+def main():
+    parser = argparse.ArgumentParser(description="HumanEval pass@1 with sandboxed execution")
+    parser.add_argument("--limit", type=int, default=None, help="First N tasks only")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent generations")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent sandboxed executions")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds per program")
+    parser.add_argument("--canonical", action="store_true", help="Run the reference solutions instead of the LLM")
+    parser.add_argument("--allow-self", action="store_true", help="Keep the task's own chunks in its context")
+    args = parser.parse_args()
+
+    from datasets import load_dataset
+
+    tasks = list(load_dataset("openai/openai_humaneval", split="test"))[:args.limit]
+
+    latencies = []
+    if args.canonical:
+        completions = [task["canonical_solution"] for task in tasks]
+    else:
+        from rag_langchain import init_pipeline
+
+        pipeline = init_pipeline()
+
+        def timed_generate(task):
+            start = time.perf_counter()
+            try:
+                return generate(pipeline, task, args.allow_self)
+            except Exception as e:
+                print(f"⚠️ {task['task_id']}: generation failed: {e}")
+                return ""
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            completions = list(pool.map(timed_generate, tasks))
+
+    start = time.perf_counter()
+    outcomes = SandboxPool(workers=args.workers, timeout=args.timeout).map(
+        build_program(task, completion) for task, completion in zip(tasks, completions)
+    )
+    execution_s = time.perf_counter() - start
+
+    statuses = Counter(status for status, _ in outcomes)
+    pass_at_1 = statuses["passed"] / len(tasks) if tasks else 0.0
+    print(f"pass@1 = {pass_at_1:.3f} ({statuses['passed']}/{len(tasks)}), "
+          f"{statuses['failed']} failed, {statuses['timeout']} timed out, execution {execution_s:.1f}s")
+
+    write_results("humaneval_canonical" if args.canonical else "humaneval", {
+        "tasks": len(tasks),
+        "pass@1": pass_at_1,
+        "statuses": dict(statuses),
+        "allow_self": args.allow_self,
+        "generation_latency": summarize(latencies),
+        "execution_s": execution_s,
+        "results": [
+            {"task_id": task["task_id"], "status": status, "detail": detail}
+            for task, (status, detail) in zip(tasks, outcomes)
+        ],
+    })
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Retrieval evaluation over HumanEval task_ids for each retrieval mode.
+
+    python -m bench.eval_retrieval --modes vector bm25 hybrid --k 1 3 5
+    python -m bench.eval_retrieval --modes hybrid --rerank off adaptive always
+
+Two query sets are used: the first sentence of each entry point's
+docstring (natural language), and "implement <entry_point>" (exact
+identifier). A query is recalled at k when a chunk of its task_id is in
+the top k.
+
+`--rerank` adds the cross-encoder stage: "always" reranks every
+candidate list, "adaptive" only the ones whose first-stage margin is
+small (RERANK_MARGIN). Latency is reported next to recall so the cost of
+each recall point is visible.
+"""
+from datasets import load_dataset
+import argparse
+import time
+
+import metrics
+from bench.bench_chunking import task_queries
+from bench.common import summarize, write_results
+from rag_langchain import init_pipeline
+
+RERANK_SETTINGS = {"off": (False, None), "adaptive": (True, None), "always": (True, float("inf"))}
+
+def evaluate(pipeline, queries, mode: str, ks, rerank: bool = False):
+    max_k = max(ks)
+    hits = {k: 0 for k in ks}
+    latencies = []
+    for task_id, query in queries:
+        start = time.perf_counter()
+        docs = pipeline.search(query, k=max_k, mode=mode, rerank=rerank)["documents"]
+        latencies.append(time.perf_counter() - start)
+        for k in ks:
+            if any(doc.metadata.get("task_id") == task_id for doc in docs[:k]):
+                hits[k] += 1
+    return {
+        **{f"recall@{k}": hits[k] / len(queries) for k in ks},
+        "latency": summarize(latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval modes on HumanEval")
+    parser.add_argument("--modes", nargs="+", default=["vector", "bm25", "hybrid"])
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--rerank", nargs="+", choices=list(RERANK_SETTINGS), default=["off"])
+    args = parser.parse_args()
+
+    pipeline = init_pipeline()
+    tasks = task_queries(load_dataset("openai/openai_humaneval", split="test"))
+    query_sets = {
+        "docstring": [(task_id, query) for task_id, query, _, _ in tasks],
+        "identifier": [(task_id, f"implement {entry_point}") for task_id, _, entry_point, _ in tasks],
+    }
+
+    # Warm the embedding cache so every mode pays the same (cached) query embedding
+    for queries in query_sets.values():
+        for _, query in queries:
+            pipeline.embedding_model.embed_query(query)
+
+    if any(RERANK_SETTINGS[setting][0] for setting in args.rerank):
+        pipeline.reranker.load()
+    default_margin = pipeline.reranker.margin
+
+    results = {}
+    for set_name, queries in query_sets.items():
+        for mode in args.modes:
+            for setting in args.rerank:
+                rerank, margin = RERANK_SETTINGS[setting]
+                pipeline.reranker.margin = default_margin if margin is None else margin
+                metrics.reset()
+                result = evaluate(pipeline, queries, mode, args.k, rerank=rerank)
+                result["reranked"] = metrics.get("rerank_queries") / len(queries)
+                key = f"{set_name}/{mode}" if args.rerank == ["off"] else f"{set_name}/{mode}/{setting}"
+                results[key] = result
+                print(f"{set_name:<10} {mode:<7} {setting:<8} " +
+                      " ".join(f"recall@{k}={result[f'recall@{k}']:.3f}" for k in args.k) +
+                      f" p50={result['latency']['p50_ms']:.1f}ms p99={result['latency']['p99_ms']:.1f}ms"
+                      f" reranked={result['reranked']:.0%}")
+
+    write_results("retrieval", {"queries": len(tasks), "results": results})
+
+if __name__ == "__main__":
+    main()
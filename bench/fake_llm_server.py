@@ -0,0 +1,238 @@
+"""
+Local OpenAI-compatible chat completions server for tests and benchmarks.
+
+    python -m bench.fake_llm_server --port 9999 --latency 0.5
+
+Point the assistant at it with OPENROUTER_BASE_URL=http://127.0.0.1:9999/v1.
+
+Failures can be injected to exercise the client's retry and fallback
+paths: `--error-rate 0.3` answers 30% of requests with 429 (plus a
+Retry-After header), `fail_next(n)` fails the next n requests, and
+`fail_models` always fails the listed models. Completions the client
+hung up on (cancelled calls) are counted as `hangups` in `stats()`.
+"""
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import random
+import threading
+import time
+
+DEFAULT_RESPONSE = "def solution(*args):\n    \"\"\"Fake completion.\"\"\"\n    return None\n"
+
+class FakeLLMServer:
+    """Threaded fake LLM; every request sleeps `latency` seconds (spread over tokens when streaming)"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.2,
+                 response: str = DEFAULT_RESPONSE, error_rate: float = 0.0, error_status: int = 429,
+                 retry_after: float = None, fail_models=()):
+        self.latency = latency
+        self.response = response
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.fail_models = set(fail_models)
+        self.request_count = 0
+        self.error_count = 0
+        self.hangup_count = 0
+        self.model_counts = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._fail_next = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def fail_next(self, n: int):
+        """Answer the next `n` requests with `error_status`"""
+        with self._lock:
+            self._fail_next += n
+
+    def _begin(self, model: str) -> bool:
+        """Count a request; returns True when it should fail"""
+        with self._lock:
+            self.request_count += 1
+            self.model_counts[model] += 1
+            fail = model in self.fail_models or random.random() < self.error_rate
+            if not fail and self._fail_next:
+                self._fail_next -= 1
+                fail = True
+            if fail:
+                self.error_count += 1
+            else:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return fail
+
+    def _end(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.request_count,
+                "errors": self.error_count,
+                "hangups": self.hangup_count,
+                "models": dict(self.model_counts),
+                "max_in_flight": self.max_in_flight,
+            }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict, headers: dict = None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/stats"):
+                    self._send_json(200, server.stats())
+                else:
+                    self._send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                model = request.get("model", "fake-model")
+                if server._begin(model):
+                    headers = {} if server.retry_after is None else {"Retry-After": str(server.retry_after)}
+                    self._send_json(server.error_status, {
+                        "error": {"message": "Injected failure", "type": "rate_limit_exceeded", "code": server.error_status}
+                    }, headers)
+                    return
+                try:
+                    self._complete(request, model)
+                except ConnectionError:
+                    # The client hung up, e.g. the request was cancelled
+                    with server._lock:
+                        server.hangup_count += 1
+                    self.close_connection = True
+                finally:
+                    server._end()
+
+            def _complete(self, request: dict, model: str):
+                prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in request.get("messages", []))
+                tokens = server.response.split(" ")
+                completion_id = f"chatcmpl-fake-{time.time_ns()}"
+
+                if not request.get("stream"):
+                    time.sleep(server.latency)
+                    self._send_json(200, {
+                        "id": completion_id,
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": server.response},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": {
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": len(tokens),
+                            "total_tokens": prompt_tokens + len(tokens),
+                        },
+                    })
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                delay = server.latency / max(len(tokens), 1)
+                for i, token in enumerate(tokens):
+                    time.sleep(delay)
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"content": token if i == 0 else " " + token},
+                            "finish_reason": None,
+                        }],
+                    }
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                final = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+                self._write_chunk(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+                if (request.get("stream_options") or {}).get("include_usage"):
+                    usage = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [],
+                        "usage": {
+                            "prompt_tokens": prompt_tokens,
+                            "completion_tokens": len(tokens),
+                            "total_tokens": prompt_tokens + len(tokens),
+                        },
+                    }
+                    self._write_chunk(f"data: {json.dumps(usage)}\n\n".encode("utf-8"))
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per completion")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds sent with errors")
+    parser.add_argument("--fail-models", nargs="*", default=[], help="Models that always fail")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.latency, error_rate=args.error_rate,
+                           error_status=args.error_status, retry_after=args.retry_after,
+                           fail_models=args.fail_models)
+    print(f"🤖 Fake LLM listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Load-test the FastAPI app against a local fake LLM.
+
+    python -m bench.load_test --requests 20 --latency 0.5
+
+Fires the same number of requests sequentially and concurrently. With the
+async serving path the concurrent wall time is close to a single LLM
+latency instead of `requests * latency`.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from bench.common import summarize, write_results
+from bench.fake_llm_server import FakeLLMServer
+
+QUERIES = [
+    "Generate a function to calculate factorial",
+    "Explain how binary search works",
+    "Write a function to reverse a string",
+    "Create a function to check if a number is prime",
+]
+
+async def _timed_post(client, path: str, query: str) -> float:
+    start = time.perf_counter()
+    response = await client.post(path, json={"query": query})
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+async def run(num_requests: int, path: str):
+    import httpx
+    from app.main_app import app
+    from rag_langchain import init_pipeline
+
+    # ASGITransport does not run the lifespan, so build the pipeline up front
+    init_pipeline()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=600) as client:
+        queries = [QUERIES[i % len(QUERIES)] for i in range(num_requests)]
+
+        start = time.perf_counter()
+        sequential = [await _timed_post(client, path, q) for q in queries]
+        sequential_wall = time.perf_counter() - start
+
+        start = time.perf_counter()
+        concurrent = await asyncio.gather(*(_timed_post(client, path, q) for q in queries))
+        concurrent_wall = time.perf_counter() - start
+
+    return sequential, sequential_wall, list(concurrent), concurrent_wall
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test against a fake LLM")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake LLM seconds per completion")
+    parser.add_argument("--path", default="/query")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=args.latency).start()
+    os.environ["OPENROUTER_BASE_URL"] = server.url
+    os.environ.setdefault("OPENROUTER_API_KEY", "fake-key")
+
+    try:
+        sequential, sequential_wall, concurrent, concurrent_wall = asyncio.run(run(args.requests, args.path))
+    finally:
+        server.stop()
+
+    # > 1 means requests overlapped; ~requests means fully parallel
+    overlap = sum(concurrent) / concurrent_wall if concurrent_wall else 0.0
+    print(f"Sequential: {sequential_wall:.2f}s for {args.requests} requests")
+    print(f"Concurrent: {concurrent_wall:.2f}s for {args.requests} requests (overlap x{overlap:.1f})")
+
+    write_results("load_test", {
+        "requests": args.requests,
+        "llm_latency_s": args.latency,
+        "path": args.path,
+        "sequential_wall_s": sequential_wall,
+        "concurrent_wall_s": concurrent_wall,
+        "overlap_factor": overlap,
+        "sequential": summarize(sequential),
+        "concurrent": summarize(concurrent),
+    })
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Offline evaluation and benchmark suite: one command, one JSON per release.
+
+    python -m bench.run_suite                      # micro + graph + harness check
+    python -m bench.run_suite --humaneval llm      # real pass@1 (needs an LLM)
+
+Runs, each in its own interpreter so models and caches do not leak between
+them:
+
+- bench_call_counts: one embedding call and one vector search per query
+  (stub embedding model, fails the suite otherwise)
+- bench_admission: cancelled waiters and deadline cut-offs leak no slots
+  or tasks (fails the suite otherwise)
+- bench_micro: embedding, search, routing and prompt assembly
+- bench_graph: end-to-end percentiles against the deterministic fake LLM
+- eval_humaneval: `canonical` checks the sandboxed harness, `llm` measures
+  pass@1 against the configured model, `skip` leaves it out
+
+and merges their results into bench/results/suite.json.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from bench.common import RESULTS_DIR, ROOT, write_results
+
+def run_step(module: str, args, result_name: str) -> dict:
+    """Run one benchmark module and return its JSON result (or the failure)"""
+    command = [sys.executable, "-m", f"bench.{module}", *args]
+    print(f"▶ {' '.join(command[2:])}")
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=ROOT)
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        print(f"❌ {module} exited with code {completed.returncode}")
+        return {"ok": False, "exit_code": completed.returncode, "duration_s": elapsed}
+    with open(os.path.join(RESULTS_DIR, f"{result_name}.json"), encoding="utf-8") as f:
+        return {"ok": True, "duration_s": elapsed, "result": json.load(f)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite and write one combined JSON")
+    parser.add_argument("--iterations", type=int, default=200, help="bench_micro iterations per stage")
+    parser.add_argument("--requests", type=int, default=200, help="bench_graph requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake LLM seconds per completion")
+    parser.add_argument("--humaneval", choices=["canonical", "llm", "skip"], default="canonical")
+    parser.add_argument("--humaneval-limit", type=int, default=None)
+    args = parser.parse_args()
+
+    steps = {
+        "call_counts": run_step("bench_call_counts", [], "call_counts"),
+        "admission": run_step("bench_admission", [], "admission"),
+        "micro": run_step("bench_micro", ["--iterations", str(args.iterations)], "micro"),
+        "graph": run_step("bench_graph", [
+            "--requests", str(args.requests),
+            "--concurrency", *map(str, args.concurrency),
+            "--llm-latency", str(args.llm_latency),
+        ], "graph"),
+    }
+    if args.humaneval != "skip":
+        humaneval_args = ["--limit", str(args.humaneval_limit)] if args.humaneval_limit else []
+        if args.humaneval == "canonical":
+            steps["humaneval"] = run_step("eval_humaneval", humaneval_args + ["--canonical"], "humaneval_canonical")
+        else:
+            steps["humaneval"] = run_step("eval_humaneval", humaneval_args, "humaneval")
+
+    failed = [name for name, step in steps.items() if not step["ok"]]
+    write_results("suite", {"humaneval_mode": args.humaneval, "failed": failed, "steps": steps})
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
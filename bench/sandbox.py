@@ -0,0 +1,74 @@
+"""
+Run untrusted generated code in throwaway subprocesses.
+
+Each program runs in its own `python -I` interpreter, in an empty
+temporary directory, with an empty environment, its own process group
+and resource limits (address space, CPU time, file size, open files).
+A wall-clock timeout kills the whole group. `SandboxPool` runs many
+programs at once, one subprocess per program.
+
+This is isolation for benchmark hygiene, not a security boundary; run
+model-generated code on a machine you can afford to lose.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Tuple
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_MEMORY_MB = 1024
+
+def _limits(timeout: float, memory_mb: int):
+    def apply():
+        import resource
+
+        memory = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        resource.setrlimit(resource.RLIMIT_CPU, (int(timeout) + 1, int(timeout) + 1))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (10 * 1024 * 1024, 10 * 1024 * 1024))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    return apply
+
+def run_program(source: str, timeout: float = DEFAULT_TIMEOUT, memory_mb: int = DEFAULT_MEMORY_MB) -> Tuple[str, str]:
+    """Run `source`; returns (status, detail) with status "passed", "failed" or "timeout" """
+    with tempfile.TemporaryDirectory(prefix="sandbox_") as workdir:
+        path = os.path.join(workdir, "program.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
+        process = subprocess.Popen(
+            [sys.executable, "-I", path],
+            cwd=workdir,
+            env={"PATH": "/usr/bin:/bin", "PYTHONHASHSEED": "0"},
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+            preexec_fn=_limits(timeout, memory_mb),
+        )
+        try:
+            _, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.communicate()
+            return "timeout", f"exceeded {timeout}s"
+    if process.returncode == 0:
+        return "passed", ""
+    lines = stderr.decode("utf-8", "replace").strip().splitlines()
+    return "failed", lines[-1] if lines else f"exit code {process.returncode}"
+
+class SandboxPool:
+    """Runs programs concurrently, each in its own sandboxed subprocess"""
+
+    def __init__(self, workers: int = None, timeout: float = DEFAULT_TIMEOUT, memory_mb: int = DEFAULT_MEMORY_MB):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+
+    def map(self, sources: Iterable[str]) -> List[Tuple[str, str]]:
+        """(status, detail) per program, in input order"""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(lambda source: run_program(source, self.timeout, self.memory_mb), sources))
@@ -0,0 +1,132 @@
+from collections import Counter
+from typing import AbstractSet, Dict, List, Optional, Sequence, Tuple
+import heapq
+import json
+import logging
+import math
+import os
+import re
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+logger = logging.getLogger(__name__)
+
+def tokenize_code(text: str) -> List[str]:
+    """
+    Lower-cased code tokens. Identifiers are kept whole *and* split on
+    snake_case / camelCase, so `has_close_elements` matches both the exact
+    name and the words "close elements".
+    """
+    tokens = []
+    for identifier in IDENTIFIER_RE.findall(text):
+        lowered = identifier.lower()
+        tokens.append(lowered)
+        parts = [p.lower() for piece in identifier.split("_") for p in CAMEL_RE.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+class BM25Index:
+    """
+    In-process inverted index with Okapi BM25 scoring.
+
+    Documents are keyed by the same chunk ids as the vector store, and the
+    index is persisted as JSON next to it.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._docs: Dict[str, Dict[str, int]] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._docs
+
+    def add(self, doc_id: str, text: str):
+        if doc_id in self._docs:
+            self.remove(doc_id)
+        term_counts = dict(Counter(tokenize_code(text)))
+        self._docs[doc_id] = term_counts
+        self._lengths[doc_id] = sum(term_counts.values())
+        self._total_length += self._lengths[doc_id]
+        for term, tf in term_counts.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self.dirty = True
+
+    def remove(self, doc_id: str):
+        term_counts = self._docs.pop(doc_id, None)
+        if term_counts is None:
+            return
+        self._total_length -= self._lengths.pop(doc_id)
+        for term in term_counts:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[term]
+        self.dirty = True
+
+    def search(self, query: str, k: int, allowed: Optional[AbstractSet[str]] = None) -> List[Tuple[str, float]]:
+        """Top-k (doc_id, score) pairs; `allowed` restricts the results to those ids"""
+        if not self._docs:
+            return []
+        n = len(self._docs)
+        avgdl = self._total_length / n or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize_code(query)):
+            posting = self._postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1.0 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                denom = tf + self.k1 * (1.0 - self.b + self.b * self._lengths[doc_id] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1.0) / denom
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "docs": self._docs}, f)
+        os.replace(tmp_path, path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Load a saved index; a missing or unreadable file gives an empty one"""
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️ Unreadable BM25 index, rebuilding: %s", e)
+            return index
+        index.k1, index.b = data["k1"], data["b"]
+        for doc_id, term_counts in data["docs"].items():
+            index._docs[doc_id] = term_counts
+            index._lengths[doc_id] = sum(term_counts.values())
+            index._total_length += index._lengths[doc_id]
+            for term, tf in term_counts.items():
+                index._postings.setdefault(term, {})[doc_id] = tf
+        return index
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], weights: Sequence[float], k: int = 60,
+                           with_scores: bool = False) -> List:
+    """Fuse ranked id lists: score(d) = sum_i w_i / (k + rank_i(d)); (id, score) pairs with `with_scores`"""
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+    fused = sorted(scores, key=scores.get, reverse=True)
+    return [(doc_id, scores[doc_id]) for doc_id in fused] if with_scores else fused
@@ -0,0 +1,128 @@
+from langchain_core.documents import Document
+from langchain_text_splitters import Language, RecursiveCharacterTextSplitter
+from typing import Iterable, List
+import ast
+import hashlib
+
+TASK_PREFIX = "Task: "
+SOLUTION_MARKER = "\nSolution: "
+MODULE_SYMBOL = "<module>"  # symbol of the chunk holding a module's other top-level statements
+
+def document_source(document: Document) -> str:
+    """Python source of a document; HumanEval "Task/Solution" text is joined back into code"""
+    content = document.page_content
+    if content.startswith(TASK_PREFIX) and SOLUTION_MARKER in content:
+        prompt, solution = content[len(TASK_PREFIX):].split(SOLUTION_MARKER, 1)
+        return prompt + solution
+    return content
+
+def chunk_key(metadata: dict, symbol: str) -> str:
+    """Stable key shared by every code chunk of one definition and its docstring chunk"""
+    origin = metadata.get("task_id") or metadata.get("source", "")
+    return hashlib.sha1(f"{origin}\0{symbol}".encode("utf-8")).hexdigest()
+
+class PythonCodeSplitter:
+    """
+    Split Python source at top-level function and class boundaries.
+
+    Each definition becomes one chunk, prefixed with the module's imports, so
+    a HumanEval prompt and its canonical solution stay together. Definitions
+    longer than `max_chunk_chars` are split further with a Python-aware
+    character splitter. With `index_docstrings`, every documented definition
+    also gets a small docstring chunk whose `parent_key` matches the
+    `chunk_key` of its code chunks, for parent-document lookup at retrieval
+    time. The remaining top-level statements (constants, assignments,
+    `if __name__ == "__main__":` blocks) form one more chunk with the
+    symbol "<module>". Unparseable documents fall back to the character splitter.
+    """
+
+    def __init__(self, max_chunk_chars: int = 2000, index_docstrings: bool = False):
+        self.max_chunk_chars = max_chunk_chars
+        self.index_docstrings = index_docstrings
+        self._fallback = RecursiveCharacterTextSplitter.from_language(
+            Language.PYTHON, chunk_size=max_chunk_chars, chunk_overlap=0
+        )
+
+    @property
+    def settings(self) -> dict:
+        """Everything that changes chunk boundaries (used for the index fingerprint)"""
+        return {
+            "splitter": "python_ast",
+            "module_chunk": True,
+            "max_chunk_chars": self.max_chunk_chars,
+            "index_docstrings": self.index_docstrings,
+        }
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        chunks = []
+        for document in documents:
+            chunks.extend(self._split(document))
+        return chunks
+
+    def _split(self, document: Document) -> List[Document]:
+        source = document_source(document)
+        try:
+            tree = ast.parse(source)
+        except SyntaxError:
+            return self._fallback.split_documents([document])
+
+        lines = source.splitlines(keepends=True)
+        imports = "".join(
+            ast.get_source_segment(source, node) + "\n"
+            for node in tree.body
+            if isinstance(node, (ast.Import, ast.ImportFrom))
+        )
+        definitions = [
+            node for node in tree.body
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        ]
+        if not definitions:
+            return self._fallback.split_documents([document])
+
+        def segment(node) -> str:
+            first_line = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+            return "".join(lines[first_line - 1:node.end_lineno])
+
+        chunks = []
+        for node in definitions:
+            chunks.extend(self._code_chunks(document, node.name, imports, segment(node)))
+
+            docstring = ast.get_docstring(node) if self.index_docstrings else None
+            if docstring:
+                chunks.append(Document(
+                    page_content=f"{node.name}: {docstring}",
+                    metadata={
+                        **document.metadata,
+                        "symbol": node.name,
+                        "chunk_type": "docstring",
+                        "parent_key": chunk_key(document.metadata, node.name),
+                    },
+                ))
+
+        rest = [
+            node for node in tree.body
+            if not isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        ]
+        if rest:
+            chunks.extend(self._code_chunks(document, MODULE_SYMBOL, imports, "".join(map(segment, rest))))
+        return chunks
+
+    def _code_chunks(self, document: Document, symbol: str, imports: str, segment: str) -> List[Document]:
+        """Code chunks of one symbol: its source behind the module's imports, split further when too long"""
+        body = (imports + "\n" + segment) if imports else segment
+        key = chunk_key(document.metadata, symbol)
+        parts = [body] if len(body) <= self.max_chunk_chars else self._fallback.split_text(body)
+        return [
+            Document(
+                page_content=text,
+                metadata={
+                    **document.metadata,
+                    "symbol": symbol,
+                    "chunk_type": "code",
+                    "chunk_key": key,
+                    "part": part,
+                },
+            )
+            for part, text in enumerate(parts)
+        ]
+
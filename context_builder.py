@@ -0,0 +1,124 @@
+"""
+Prompt context assembly.
+
+Retrieved documents are deduplicated, formatted compactly and packed, in
+rank order, under a token budget before they reach the prompt. Tokens are
+counted locally: with tiktoken when its encoding is available, otherwise
+with a word/punctuation approximation that runs close to BPE counts on code.
+"""
+from typing import Callable, List, Optional, Tuple
+import logging
+import re
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TIKTOKEN_ENCODING = "o200k_base"
+APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def get_token_counter(encoding: str = TIKTOKEN_ENCODING) -> Callable[[str], int]:
+    """tiktoken counter if the encoding can be loaded, else a regex approximation"""
+    try:
+        import tiktoken
+        encoder = tiktoken.get_encoding(encoding)
+        return lambda text: len(encoder.encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.info("tiktoken encoding unavailable (%s), approximating token counts", type(e).__name__)
+        return lambda text: len(APPROX_TOKEN_RE.findall(text))
+
+def _line_set(text: str) -> set:
+    return {line.strip() for line in text.splitlines() if line.strip()}
+
+class ContextBuilder:
+    """
+    Turns ranked Documents into the `{context}` string of the RAG prompts.
+
+    - at most `max_per_task` chunks per HumanEval task_id (or source file)
+    - a chunk is dropped when `overlap_threshold` of its lines already
+      appear in a chunk that was kept
+    - each chunk is a one-line header plus its code, not a Document repr
+    - chunks are added in rank order until `token_budget`; the chunk that
+      crosses the budget is cut at a line boundary if enough room is left
+    """
+
+    def __init__(self, token_budget: int = 1500, max_per_task: int = 2, overlap_threshold: float = 0.8,
+                 min_partial_tokens: int = 64, count_tokens: Callable[[str], int] = None):
+        self.token_budget = token_budget
+        self.max_per_task = max_per_task
+        self.overlap_threshold = overlap_threshold
+        self.min_partial_tokens = min_partial_tokens
+        self.count_tokens = count_tokens or get_token_counter()
+
+    def dedupe(self, docs) -> list:
+        kept, kept_lines, per_task = [], [], {}
+        for doc in docs:
+            origin = doc.metadata.get("task_id") or doc.metadata.get("source", "")
+            if per_task.get(origin, 0) >= self.max_per_task:
+                continue
+            lines = _line_set(doc.page_content)
+            if lines and any(len(lines & other) / len(lines) >= self.overlap_threshold for other in kept_lines):
+                continue
+            per_task[origin] = per_task.get(origin, 0) + 1
+            kept.append(doc)
+            kept_lines.append(lines)
+        return kept
+
+    @staticmethod
+    def format_document(doc) -> str:
+        metadata = doc.metadata
+        label = " ".join(str(part) for part in (
+            metadata.get("task_id") or metadata.get("source"), metadata.get("symbol")
+        ) if part)
+        header = f"# {label}\n" if label else ""
+        return header + doc.page_content.strip()
+
+    def _truncate(self, text: str, budget: int) -> str:
+        """Longest line prefix of `text` within `budget` tokens"""
+        lines, total = [], 0
+        for line in text.splitlines():
+            cost = self.count_tokens(line + "\n")
+            if total + cost > budget:
+                break
+            lines.append(line)
+            total += cost
+        return "\n".join(lines)
+
+    def build(self, docs, measure_savings: Optional[bool] = None) -> Tuple[str, dict]:
+        """
+        (context string, stats) for ranked documents. The savings against
+        the stringified Document list cost a second, larger token count, so
+        they are measured only when asked for or when DEBUG logging is on.
+        """
+        separator = "\n\n"
+        separator_tokens = self.count_tokens(separator)
+        blocks: List[str] = []
+        used = 0
+        for doc in self.dedupe(docs):
+            block = self.format_document(doc)
+            cost = self.count_tokens(block) + (separator_tokens if blocks else 0)
+            if used + cost <= self.token_budget:
+                blocks.append(block)
+                used += cost
+                continue
+            remaining = self.token_budget - used - (separator_tokens if blocks else 0)
+            if remaining >= self.min_partial_tokens:
+                partial = self._truncate(block, remaining)
+                if partial:
+                    blocks.append(partial)
+            break
+
+        context = separator.join(blocks)
+        context_tokens = self.count_tokens(context)
+        stats = {"documents": len(docs), "chunks": len(blocks), "context_tokens": context_tokens}
+        metrics.incr("context_tokens", context_tokens)
+        if measure_savings is None:
+            measure_savings = logger.isEnabledFor(logging.DEBUG)
+        if measure_savings:
+            # What the prompt used to receive: the stringified Document list
+            stats["naive_tokens"] = self.count_tokens(str(list(docs)))
+            stats["tokens_saved"] = max(0, stats["naive_tokens"] - context_tokens)
+            metrics.incr("context_tokens_saved", stats["tokens_saved"])
+            logger.debug("📦 [context] %d/%d chunks, %d tokens (saved %d)",
+                         stats["chunks"], stats["documents"], context_tokens, stats["tokens_saved"])
+        return context, stats
@@ -0,0 +1,198 @@
+"""
+Named corpora: one index per team or repository, served from one process.
+
+Each corpus is an index directory under CORPORA_DIR, built with
+
+    python -m ingestion --source path/to/repo --corpus payments-api --metadata team=payments
+
+The default corpus (HumanEval) is the pipeline's own index and stays
+open. Other corpora are opened on first use and kept in an LRU; once the
+open corpora exceed the memory budget, the least recently used idle ones
+are closed.
+"""
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import List, Optional
+import logging
+import os
+import re
+import threading
+
+from bm25_index import BM25Index
+from ingestion import BM25_FILE, MANIFEST_FILE, index_lock, load_manifest
+from vector_stores import ChromaVectorStore, open_vector_store
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CORPUS = "humaneval"
+CORPORA_DIR = os.getenv("CORPORA_DIR", "./corpora")
+CORPUS_CACHE_MB = float(os.getenv("CORPUS_CACHE_MB", "1024"))  # open corpora, estimated from their index files
+# 3-63 characters, usable as a directory and as a Chroma collection name
+CORPUS_NAME_PATTERN = r"^[A-Za-z0-9][A-Za-z0-9_.-]{1,61}[A-Za-z0-9]$"
+CORPUS_NAME_RE = re.compile(CORPUS_NAME_PATTERN)
+
+class UnknownCorpus(KeyError):
+    """No index has been built for this corpus name"""
+
+    def __str__(self):
+        return f"Unknown corpus: {self.args[0]}"
+
+def corpus_directory(name: str, root: str = CORPORA_DIR) -> str:
+    """Index directory of corpus `name`"""
+    if not CORPUS_NAME_RE.match(name):
+        raise ValueError(f"Invalid corpus name: {name!r}")
+    return os.path.join(root, name)
+
+def index_size_bytes(directory: str) -> int:
+    """Size of the index files; the memory estimate used by the budget"""
+    total = 0
+    for path, _, filenames in os.walk(directory):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(path, filename))
+            except OSError:
+                pass
+    return total
+
+class Corpus:
+    """An opened index: vector store, BM25 index, and how many searches use it right now"""
+
+    def __init__(self, name: str, directory: str, vectorstore, bm25: BM25Index, size_bytes: int = 0):
+        self.name = name
+        self.directory = directory
+        self.vectorstore = vectorstore
+        self.bm25 = bm25
+        self.size_bytes = size_bytes
+        self.users = 0
+
+    def close(self):
+        self.vectorstore.close()
+        self.vectorstore = self.bm25 = None
+
+class CorpusRegistry:
+    """
+    Opens corpora by name and keeps them in an LRU bounded by
+    `budget_mb`. `use(name)` holds a corpus open for the duration of a
+    search; corpora in use and the default corpus are never evicted.
+    The lock only guards the bookkeeping: a corpus is opened outside it,
+    so a slow open (e.g. waiting for an ingestion run) stalls only the
+    callers of that corpus, which share the one load.
+    """
+
+    def __init__(self, default: Corpus, embedding_model, root: str = CORPORA_DIR, budget_mb: float = CORPUS_CACHE_MB):
+        self.default = default
+        self.embedding_model = embedding_model
+        self.root = root
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self._open = OrderedDict()  # name -> Corpus, least recently used first
+        self._loading = {}  # name -> Future of the Corpus being opened
+        self._lock = threading.Lock()
+
+    def _built(self, name: str) -> bool:
+        # The manifest is written last, so its presence means a complete index
+        return CORPUS_NAME_RE.match(name) is not None and os.path.isfile(os.path.join(self.root, name, MANIFEST_FILE))
+
+    def names(self) -> List[str]:
+        """The default corpus and every built corpus under the root"""
+        built = sorted(filter(self._built, os.listdir(self.root))) if os.path.isdir(self.root) else []
+        return [self.default.name] + [name for name in built if name != self.default.name]
+
+    def exists(self, name: Optional[str]) -> bool:
+        """Cheap check for request validation; does not open the corpus"""
+        return not name or name == self.default.name or name in self._open or self._built(name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open": list(self._open),
+                "open_mb": sum(corpus.size_bytes for corpus in self._open.values()) / (1024 * 1024),
+                "budget_mb": self.budget_bytes / (1024 * 1024),
+            }
+
+    def _load(self, name: str) -> Corpus:
+        directory = corpus_directory(name, self.root)
+        # Wait for an ingestion run that is writing this index
+        with index_lock(directory):
+            manifest = load_manifest(directory)
+            if manifest is None:
+                raise UnknownCorpus(name)
+            vectorstore = open_vector_store(
+                manifest.get("backend", "chroma"), directory, self.embedding_model,
+                collection_name=manifest.get("collection", ChromaVectorStore.DEFAULT_COLLECTION),
+                read_only=True,  # serving never writes a corpus; ingestion does
+            )
+            bm25 = BM25Index.load(os.path.join(directory, BM25_FILE))
+        metrics.incr("corpus_opens")
+        logger.info("✓ Opened corpus %s (%d chunks)", name, len(bm25))
+        return Corpus(name, directory, vectorstore, bm25, index_size_bytes(directory))
+
+    def _evict(self):
+        """Close least recently used idle corpora until the open ones fit the budget"""
+        total = sum(corpus.size_bytes for corpus in self._open.values())
+        for name in list(self._open):
+            if total <= self.budget_bytes:
+                return
+            corpus = self._open[name]
+            if corpus.users:
+                continue
+            del self._open[name]
+            total -= corpus.size_bytes
+            corpus.close()
+            metrics.incr("corpus_evictions")
+            logger.info("✓ Closed idle corpus %s", name)
+
+    def _hold(self, corpus: Corpus):
+        """Mark `corpus` most recently used and in use; called with the lock held"""
+        self._open.move_to_end(corpus.name)
+        corpus.users += 1
+        self._evict()
+
+    def _acquire(self, name: str) -> Corpus:
+        while True:
+            with self._lock:
+                corpus = self._open.get(name)
+                if corpus is not None:
+                    self._hold(corpus)
+                    return corpus
+                loading = self._loading.get(name)
+                if loading is None:
+                    loading = self._loading[name] = Future()
+                    break
+            # Another caller is opening it; once it is done, take it from the LRU (it may be gone again)
+            loading.result()
+
+        try:
+            corpus = self._load(name)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[name]
+            loading.set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[name]
+            self._open[name] = corpus
+            self._hold(corpus)
+        loading.set_result(corpus)
+        return corpus
+
+    @contextmanager
+    def use(self, name: Optional[str] = None):
+        """The opened corpus `name` (default: the pipeline's own), held open for the block"""
+        if not name or name == self.default.name:
+            yield self.default
+            return
+        corpus = self._acquire(name)
+        try:
+            yield corpus
+        finally:
+            with self._lock:
+                corpus.users -= 1
+                self._evict()
+
+    def after_fork(self):
+        """A forked worker opens its own corpora; the parent's handles are left alone"""
+        self._open = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
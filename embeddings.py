@@ -0,0 +1,381 @@
+from langchain_core.embeddings import Embeddings
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
+import hashlib
+import json
+import os
+import sys
+import threading
+import numpy as np
+import metrics
+
+# ----------------------------------------
+# Configuration
+# ----------------------------------------
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache")  # "" keeps the cache in memory only
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+
+def _inner_after_fork(inner: Embeddings, threads: Optional[int]):
+    hook = getattr(inner, "after_fork", None)
+    if hook is not None:
+        hook(threads)
+    elif threads and "torch" in sys.modules:
+        # sentence-transformers: each worker gets its share of the cores
+        import torch
+
+        torch.set_num_threads(threads)
+
+def before_fork():
+    """
+    Keep torch single-threaded in a prefork master, before its first forward
+    pass. An OpenMP pool started before fork() can hang libgomp in the
+    children; they size their own pools in after_fork instead.
+    """
+    from app.config import settings
+
+    if settings.EMBEDDING_BACKEND != "torch":
+        return  # onnxruntime sessions are re-created in each child
+    try:
+        import torch
+    except ImportError:
+        return  # loading the model will report it
+    torch.set_num_threads(1)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already set in this process
+
+class CountingEmbeddings(Embeddings):
+    """Embeddings wrapper that counts every call into the underlying model"""
+
+    def __init__(self, inner: Embeddings):
+        self.inner = inner
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        metrics.incr("embed_documents_calls")
+        with metrics.timer("embedding_duration_seconds", key="embedding", kind="documents"):
+            return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        metrics.incr("embed_query_calls")
+        with metrics.timer("embedding_duration_seconds", key="embedding", kind="query"):
+            return self.inner.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Many queries in one forward pass (sentence-transformers embed queries and documents alike)"""
+        metrics.incr("embed_query_calls")
+        with metrics.timer("embedding_duration_seconds", key="embedding", kind="query"):
+            return self.inner.embed_documents(texts)
+
+    def after_fork(self, threads: Optional[int] = None):
+        _inner_after_fork(self.inner, threads)
+
+class DiskVectorStore:
+    """
+    Append-only float32 vector file plus a key list, read through a memory map.
+
+    Row i of `vectors.f32` belongs to line i of `keys.txt`. The vector is
+    written before its key, so a complete key line always has its vector.
+    Several processes can share one directory: appends are serialized with
+    an fcntl lock, and each process picks up the keys the others appended
+    before it reads or writes.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._keys_path = os.path.join(directory, "keys.txt")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._lock_path = os.path.join(directory, "append.lock")
+        self.dim = None
+        self.read_only = False
+        self._rows = {}
+        self._lines = 0        # complete lines of keys.txt read so far (= next row number)
+        self._keys_offset = 0  # byte offset just past them
+        self._mmap = None
+        self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @contextmanager
+    def _append_lock(self):
+        """Exclusive, cross-process lock held while appending (POSIX only; elsewhere a no-op)"""
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Read key lines appended since the last call, by this or another process"""
+        if self.dim is None:
+            if not os.path.exists(self._meta_path):
+                return
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        try:
+            with open(self._keys_path, "rb") as f:
+                f.seek(self._keys_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # A line without its newline is still being written
+        data = data[:data.rfind(b"\n") + 1]
+        for line in data.splitlines():
+            # A key appended twice keeps its first row
+            self._rows.setdefault(line.decode("utf-8"), self._lines)
+            self._lines += 1
+        self._keys_offset += len(data)
+
+    def get(self, key: str):
+        row = self._rows.get(key)
+        if row is None:
+            self._refresh()
+            row = self._rows.get(key)
+            if row is None:
+                return None
+        if self._mmap is None or row >= self._mmap.shape[0]:
+            # Sized from the file: other processes may have appended rows
+            file_rows = os.path.getsize(self._vectors_path) // (4 * self.dim)
+            if row >= file_rows:
+                return None
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(file_rows, self.dim))
+        return np.array(self._mmap[row])
+
+    def put_many(self, items):
+        """Append (key, vector) pairs not on disk yet (dropped when read-only)"""
+        if self.read_only:
+            return
+        items = list(dict((key, np.asarray(vector, dtype=np.float32)) for key, vector in items).items())
+        if not items or all(key in self._rows for key, _ in items):
+            return
+        with self._append_lock():
+            self._refresh()
+            items = [(key, vector) for key, vector in items if key not in self._rows]
+            if not items:
+                return
+            if self.dim is None:
+                self.dim = int(items[0][1].shape[0])
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            with open(self._vectors_path, "ab") as f:
+                # Drop vectors left without a key by a writer that died, so row i stays line i
+                f.truncate(self._lines * 4 * self.dim)
+                f.write(np.stack([vector for _, vector in items]).tobytes())
+            data = "".join(f"{key}\n" for key, _ in items).encode("utf-8")
+            with open(self._keys_path, "ab") as f:
+                f.write(data)
+            for row, (key, _) in enumerate(items, start=self._lines):
+                self._rows[key] = row
+            self._lines += len(items)
+            self._keys_offset += len(data)
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-hash keyed embedding cache: an in-memory LRU in front of an
+    optional memory-mapped on-disk store. Only cache misses reach `inner`.
+    """
+
+    def __init__(self, inner: Embeddings, namespace: str, cache_dir: Optional[str] = None, max_memory_items: int = 10000):
+        self.inner = inner
+        self.namespace = namespace
+        self.max_memory_items = max_memory_items
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        if cache_dir:
+            # One sub-directory per model so vectors of different models never mix
+            subdir = hashlib.sha256(namespace.encode("utf-8")).hexdigest()[:16]
+            self._disk = DiskVectorStore(os.path.join(cache_dir, subdir))
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str):
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            return vector
+        if self._disk is not None:
+            vector = self._disk.get(key)
+            if vector is not None:
+                self._remember(key, vector)
+        return vector
+
+    def _remember(self, key: str, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _record(self, hits: int, misses: int):
+        self.hits += hits
+        self.misses += misses
+        if hits:
+            metrics.incr("embedding_cache_hits", hits)
+        if misses:
+            metrics.incr("embedding_cache_misses", misses)
+
+    def lookup_documents(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached document vectors, None where the text has not been embedded yet"""
+        keys = [self._key("doc", text) for text in texts]
+        with self._lock:
+            vectors = [self._lookup(key) for key in keys]
+            misses = sum(vector is None for vector in vectors)
+            self._record(hits=len(keys) - misses, misses=misses)
+        return vectors
+
+    def store_documents(self, texts: List[str], vectors):
+        """Add document vectors computed elsewhere (e.g. by ingestion workers)"""
+        items = [(self._key("doc", text), np.asarray(vector, dtype=np.float32)) for text, vector in zip(texts, vectors)]
+        with self._lock:
+            for key, vector in items:
+                self._remember(key, vector)
+            if self._disk is not None:
+                self._disk.put_many(items)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("doc", text) for text in texts]
+        with self._lock:
+            found = {key: self._lookup(key) for key in set(keys)}
+        missing = [key for key, vector in found.items() if vector is None]
+
+        if missing:
+            text_by_key = dict(zip(keys, texts))
+            computed = self.inner.embed_documents([text_by_key[key] for key in missing])
+            new_items = [(key, np.asarray(vector, dtype=np.float32)) for key, vector in zip(missing, computed)]
+            with self._lock:
+                for key, vector in new_items:
+                    self._remember(key, vector)
+                    found[key] = vector
+                if self._disk is not None:
+                    self._disk.put_many(new_items)
+
+        with self._lock:
+            self._record(hits=len(keys) - len(missing), misses=len(missing))
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        with self._lock:
+            vector = self._lookup(key)
+            self._record(hits=int(vector is not None), misses=int(vector is None))
+        if vector is None:
+            vector = np.asarray(self.inner.embed_query(text), dtype=np.float32)
+            with self._lock:
+                self._remember(key, vector)
+                if self._disk is not None:
+                    self._disk.put_many([(key, vector)])
+        return vector.tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Batched embed_query: all cache misses go to the model in one call"""
+        keys = [self._key("query", text) for text in texts]
+        with self._lock:
+            found = {key: self._lookup(key) for key in set(keys)}
+        missing = [key for key, vector in found.items() if vector is None]
+
+        if missing:
+            text_by_key = dict(zip(keys, texts))
+            batch_embed = getattr(self.inner, "embed_queries", self.inner.embed_documents)
+            computed = batch_embed([text_by_key[key] for key in missing])
+            new_items = [(key, np.asarray(vector, dtype=np.float32)) for key, vector in zip(missing, computed)]
+            with self._lock:
+                for key, vector in new_items:
+                    self._remember(key, vector)
+                    found[key] = vector
+                if self._disk is not None:
+                    self._disk.put_many(new_items)
+
+        with self._lock:
+            self._record(hits=len(keys) - len(missing), misses=len(missing))
+        return [found[key].tolist() for key in keys]
+
+    def after_fork(self, threads: Optional[int] = None):
+        """
+        In a forked worker, keep reading the shared on-disk cache but stop
+        appending to it (new vectors stay in this worker's memory), so
+        concurrent workers never interleave writes to the same files.
+        """
+        self._lock = threading.Lock()
+        if self._disk is not None:
+            self._disk.read_only = True
+        _inner_after_fork(self.inner, threads)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "memory_items": len(self._memory),
+                "disk_items": len(self._disk) if self._disk is not None else 0,
+            }
+
+# ----------------------------------------
+# Embedding model
+# ----------------------------------------
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+def embedding_namespace(model_name: str = EMBEDDING_MODEL_NAME) -> str:
+    """
+    Identity of the vectors the configured backend produces, used as the
+    cache namespace and in the index fingerprint. fp32 ONNX matches torch
+    (see bench/bench_embeddings.py --parity); int8 vectors differ slightly,
+    so they get their own cache and index.
+    """
+    from app.config import settings
+
+    if settings.EMBEDDING_BACKEND == "onnx" and settings.EMBEDDING_ONNX_QUANTIZE:
+        return f"{model_name}:onnx-int8"
+    return model_name
+
+def load_embeddings(model_name: str = EMBEDDING_MODEL_NAME, threads: Optional[int] = None,
+                    batch_size: Optional[int] = None) -> Embeddings:
+    """The uncached model for the configured backend (EMBEDDING_BACKEND)"""
+    from app.config import settings
+
+    if settings.EMBEDDING_BACKEND not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {settings.EMBEDDING_BACKEND!r}, expected one of {EMBEDDING_BACKENDS}")
+    if settings.EMBEDDING_BACKEND == "onnx":
+        from onnx_embeddings import OnnxEmbeddings, onnx_model_dir
+
+        return OnnxEmbeddings(
+            onnx_model_dir(settings.EMBEDDING_ONNX_DIR, model_name),
+            quantized=settings.EMBEDDING_ONNX_QUANTIZE,
+            threads=threads,
+            batch_size=batch_size or 32,
+        )
+
+    # Imported here: loading sentence-transformers pulls in torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    if threads:
+        import torch
+
+        torch.set_num_threads(threads)
+    encode_kwargs = {"batch_size": batch_size} if batch_size else {}
+    return HuggingFaceEmbeddings(model_name=model_name, encode_kwargs=encode_kwargs)
+
+def get_embedding_model():
+    """Embeddings of the configured backend behind a persistent content-hash cache"""
+    model = CountingEmbeddings(load_embeddings())
+    return CachedEmbeddings(
+        model,
+        namespace=embedding_namespace(),
+        cache_dir=EMBEDDING_CACHE_DIR or None,
+        max_memory_items=EMBEDDING_CACHE_SIZE,
+    )
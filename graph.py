@@ -1,26 +1,52 @@
 # graph.py
 from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableLambda
 from state import AssistantState
-from nodes_langchain import chat_node, router_node, generate_code_node, explain_code_node, route_by_intent
+from nodes_langchain import (
+    chat_node, router_node, route_by_intent,
+    embed_node, aembed_node,
+    retrieve_node, aretrieve_node, context_node,
+    generate_code_node, agenerate_code_node,
+    explain_code_node, aexplain_code_node,
+    memory_node, amemory_node,
+)
 
-def build_blueprint_graph():
-    """Build the exact state machine from blueprint"""
+def build_blueprint_graph(checkpointer=None, parallel_retrieval: bool = True):
+    """
+    Build the exact state machine from blueprint (pass a checkpointer for session memory).
+    With `parallel_retrieval=False`, router and retrieve run one after the other (for benchmarks).
+    """
     workflow = StateGraph(AssistantState)
-    # Add nodes
+    # Add nodes (I/O-bound nodes get an async variant used by graph.ainvoke)
     workflow.add_node("chat", chat_node)
+    workflow.add_node("embed", RunnableLambda(embed_node, afunc=aembed_node))
     workflow.add_node("router", router_node)
-    workflow.add_node("generate_code", generate_code_node)
-    workflow.add_node("explain_code", explain_code_node)
+    workflow.add_node("retrieve", RunnableLambda(retrieve_node, afunc=aretrieve_node))
+    workflow.add_node("context", context_node)
+    workflow.add_node("generate_code", RunnableLambda(generate_code_node, afunc=agenerate_code_node))
+    workflow.add_node("explain_code", RunnableLambda(explain_code_node, afunc=aexplain_code_node))
+    workflow.add_node("memory", RunnableLambda(memory_node, afunc=amemory_node))
     
     # Set entry point
     workflow.set_entry_point("chat")
     
     # Define edges
-    workflow.add_edge("chat", "router")
+    # The query is embedded once; routing and retrieval both start from that vector
+    workflow.add_edge("chat", "embed")
+    if parallel_retrieval:
+        # Fan out: retrieval does not depend on the intent, so it runs alongside
+        # the router, and "context" waits for both
+        workflow.add_edge("embed", "router")
+        workflow.add_edge("embed", "retrieve")
+        workflow.add_edge(["router", "retrieve"], "context")
+    else:
+        workflow.add_edge("embed", "retrieve")
+        workflow.add_edge("retrieve", "router")
+        workflow.add_edge("router", "context")
     
-    # Conditional routing
+    # Conditional routing (retrieval is shared by both branches)
     workflow.add_conditional_edges(
-        "router",
+        "context",
         route_by_intent,
         {
             "generate_code": "generate_code",
@@ -28,11 +54,12 @@ def build_blueprint_graph():
         }
     )
     
-    # After generation/explanation, END the flow 
-    workflow.add_edge("generate_code", END)
-    workflow.add_edge("explain_code", END)
+    # After generation/explanation, bound the history, then END the flow
+    workflow.add_edge("generate_code", "memory")
+    workflow.add_edge("explain_code", "memory")
+    workflow.add_edge("memory", END)
     
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
 # Create the graph instance
 graph = build_blueprint_graph()
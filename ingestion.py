@@ -0,0 +1,410 @@
+"""
+Index building: loaders, incremental manifest sync and the batched,
+multi-process embedding pipeline.
+
+    python -m ingestion --source humaneval --workers 4 --batch-size 64
+    python -m ingestion --source path/to/repo --persist-dir ./chroma_myrepo
+    python -m ingestion --backend numpy --persist-dir ./index_numpy
+    python -m ingestion --source path/to/repo --corpus payments-api --metadata team=payments
+"""
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+import numpy as np
+from bm25_index import BM25Index
+from vector_stores import BACKENDS, METADATA_KEY_RE, ChromaVectorStore, CorruptVectorStore, open_vector_store
+
+# ----------------------------------------
+# Configuration
+# ----------------------------------------
+MANIFEST_FILE = "index_manifest.json"
+BM25_FILE = "bm25_index.json"
+INGEST_BATCH_SIZE = 64
+SPLITTER_SETTINGS = {
+    "chunk_size": 500,
+    "chunk_overlap": 50,
+    "separators": ["\n\n", "\n", " "],
+}
+CHUNKER = os.getenv("CHUNKER", "python_ast")  # "python_ast" or "recursive"
+INDEX_DOCSTRINGS = os.getenv("INDEX_DOCSTRINGS", "false").lower() == "true"
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma")  # "chroma", "numpy" or "hnsw"
+
+# ----------------------------------------
+# Loaders (streaming)
+# ----------------------------------------
+def iter_humaneval_documents():
+    """Yield HumanEval tasks as LangChain documents"""
+    from datasets import load_dataset
+
+    dataset = load_dataset("openai/openai_humaneval", split="test")
+    for item in dataset:
+        content = f"Task: {item['prompt']}\nSolution: {item['canonical_solution']}"
+        metadata = {
+            "task_id": item['task_id'],
+            "entry_point": item['entry_point'],
+            "source": "HumanEval"
+        }
+        yield Document(page_content=content, metadata=metadata)
+
+def iter_python_files(root: str, metadata: dict = None):
+    """Yield one document per .py file below `root`, with `metadata` added to each"""
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith(".") and d != "__pycache__")
+        for filename in sorted(filenames):
+            if not filename.endswith(".py"):
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    content = f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"⚠️ Skipping {path}: {e}")
+                continue
+            if content.strip():
+                yield Document(page_content=content, metadata={**(metadata or {}), "source": os.path.relpath(path, root)})
+
+def get_splitter(chunker: str = CHUNKER, index_docstrings: bool = INDEX_DOCSTRINGS):
+    """Return (splitter, settings); the settings feed the index fingerprint"""
+    if chunker == "python_ast":
+        from code_splitter import PythonCodeSplitter
+
+        splitter = PythonCodeSplitter(index_docstrings=index_docstrings)
+        return splitter, splitter.settings
+    if chunker == "recursive":
+        return RecursiveCharacterTextSplitter(**SPLITTER_SETTINGS), SPLITTER_SETTINGS
+    raise ValueError(f"Unknown chunker: {chunker}")
+
+def iter_splits(documents, splitter):
+    """Split documents one at a time so the corpus is never fully in memory"""
+    for document in documents:
+        yield from splitter.split_documents([document])
+
+def iter_batches(iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+# ----------------------------------------
+# Fingerprints
+# ----------------------------------------
+def settings_fingerprint(splitter_settings: dict, embedding_model_name: str) -> str:
+    """Hash the settings that change chunk boundaries or vectors"""
+    payload = json.dumps(
+        {"splitter": splitter_settings, "embedding_model": embedding_model_name},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def chunk_id(chunk, fingerprint: str) -> str:
+    """Stable id for a chunk: its content, metadata and the index settings"""
+    digest = hashlib.sha256()
+    digest.update(fingerprint.encode("utf-8"))
+    digest.update(chunk.page_content.encode("utf-8"))
+    digest.update(json.dumps(chunk.metadata, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+# ----------------------------------------
+# Manifest
+# ----------------------------------------
+def load_manifest(persist_directory: str):
+    """Return the manifest of an existing index, or None"""
+    path = os.path.join(persist_directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Unreadable index manifest: {e}")
+        return None
+
+def save_manifest(persist_directory: str, manifest: dict):
+    """Atomically write the manifest next to the vector store"""
+    os.makedirs(persist_directory, exist_ok=True)
+    path = os.path.join(persist_directory, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+# ----------------------------------------
+# Embedding pipeline
+# ----------------------------------------
+_worker_model = None
+
+def _init_worker(model_name: str, threads: int, batch_size: int):
+    """Load one model per worker process, pinned to its share of the cores"""
+    global _worker_model
+    from embeddings import load_embeddings
+
+    _worker_model = load_embeddings(model_name, threads=threads, batch_size=batch_size)
+
+def _embed_in_worker(texts):
+    return np.asarray(_worker_model.embed_documents(texts), dtype=np.float32)
+
+class EmbeddingPipeline:
+    """
+    Embeds batches of (id, chunk) pairs, in-process or across a process pool.
+
+    At most `max_in_flight` batches are queued on the pool at once, so
+    memory stays bounded however large the input stream is. Vectors already
+    in the embedding cache are never sent to a worker.
+    """
+
+    def __init__(self, embedding_model, model_name: str, workers: int = 0,
+                 batch_size: int = INGEST_BATCH_SIZE, max_in_flight: int = None):
+        self.embedding_model = embedding_model
+        self.workers = workers
+        self.max_in_flight = max_in_flight or max(2, workers * 2)
+        self._pool = None
+        if workers > 0:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_name, threads, batch_size),
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def map_batches(self, batches):
+        """Yield (batch, vectors) in input order"""
+        if self._pool is None:
+            for batch in batches:
+                yield batch, self.embedding_model.embed_documents([chunk.page_content for _, chunk in batch])
+            return
+
+        pending = deque()
+        for batch in batches:
+            pending.append(self._submit(batch))
+            if len(pending) >= self.max_in_flight:
+                yield self._collect(*pending.popleft())
+        while pending:
+            yield self._collect(*pending.popleft())
+
+    def _submit(self, batch):
+        texts = [chunk.page_content for _, chunk in batch]
+        lookup = getattr(self.embedding_model, "lookup_documents", None)
+        vectors = lookup(texts) if lookup else [None] * len(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        future = self._pool.submit(_embed_in_worker, [texts[i] for i in missing]) if missing else None
+        return batch, texts, vectors, missing, future
+
+    def _collect(self, batch, texts, vectors, missing, future):
+        if future is not None:
+            computed = future.result()
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+            store = getattr(self.embedding_model, "store_documents", None)
+            if store:
+                store([texts[i] for i in missing], computed)
+        return batch, [np.asarray(vector, dtype=np.float32).tolist() for vector in vectors]
+
+def upsert_batch(vectorstore, batch, vectors):
+    """Bulk-write precomputed vectors into the vector store"""
+    vectorstore.upsert(
+        [cid for cid, _ in batch],
+        vectors,
+        [chunk.page_content for _, chunk in batch],
+        [chunk.metadata for _, chunk in batch],
+    )
+
+# ----------------------------------------
+# Incremental sync
+# ----------------------------------------
+@contextmanager
+def index_lock(persist_directory: str):
+    """
+    Exclusive, cross-process lock on an index, held while it is synced.
+    The lock file sits next to the directory, so a rebuild that removes
+    the directory does not remove the lock. POSIX only; elsewhere a no-op.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    path = os.path.abspath(persist_directory).rstrip(os.sep) + ".lock"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def sync_vectorstore(chunks, embedding_model, persist_directory: str, fingerprint: str,
+                     workers: int = 0, batch_size: int = INGEST_BATCH_SIZE, model_name: str = None,
+                     backend: str = VECTOR_STORE, collection_name: str = ChromaVectorStore.DEFAULT_COLLECTION):
+    """
+    Bring the persisted vector store and its BM25 index in line with the
+    `chunks` stream. Returns (vectorstore, bm25_index).
+
+    Only chunks whose id is missing from the manifest are embedded, chunks
+    that disappeared are deleted, and an unchanged corpus just opens the store.
+    Runs under `index_lock`: processes starting together (e.g. server
+    workers) write the index one at a time, and the later ones find it
+    up to date.
+    """
+    with index_lock(persist_directory):
+        return _sync_vectorstore(chunks, embedding_model, persist_directory, fingerprint,
+                                 workers, batch_size, model_name, backend, collection_name)
+
+def _sync_vectorstore(chunks, embedding_model, persist_directory, fingerprint, workers, batch_size,
+                      model_name, backend, collection_name):
+    manifest = load_manifest(persist_directory)
+
+    # A store without a manifest has unknown (possibly duplicated) contents;
+    # one written by another backend is unreadable by this one
+    if manifest is None and os.path.exists(persist_directory):
+        print("⚠️ Vector store has no manifest. Rebuilding...")
+        shutil.rmtree(persist_directory)
+    elif manifest is not None and manifest.get("backend", "chroma") != backend:
+        print(f"⚠️ Vector store was built with {manifest.get('backend', 'chroma')}, not {backend}. Rebuilding...")
+        shutil.rmtree(persist_directory)
+        manifest = None
+    elif manifest is not None and manifest.get("collection", ChromaVectorStore.DEFAULT_COLLECTION) != collection_name:
+        print(f"⚠️ Vector store holds collection {manifest.get('collection', ChromaVectorStore.DEFAULT_COLLECTION)}, "
+              f"not {collection_name}. Rebuilding...")
+        shutil.rmtree(persist_directory)
+        manifest = None
+
+    # Only real corruption is rebuilt; a missing backend package or a locked file must not wipe the index
+    try:
+        vectorstore = open_vector_store(backend, persist_directory, embedding_model, collection_name)
+    except CorruptVectorStore as e:
+        print(f"⚠️ Corrupt vector store detected: {e}. Rebuilding...")
+        shutil.rmtree(persist_directory)
+        manifest = None
+        vectorstore = open_vector_store(backend, persist_directory, embedding_model, collection_name)
+
+    bm25_path = os.path.join(persist_directory, BM25_FILE)
+    bm25 = BM25Index.load(bm25_path)
+    indexed = set(manifest["ids"]) if manifest else set()
+    current = set()
+
+    def new_chunks():
+        for chunk in chunks:
+            cid = chunk_id(chunk, fingerprint)
+            # Identical chunks collapse onto the same id
+            if cid in current:
+                continue
+            current.add(cid)
+            # Lexical indexing is cheap, so a missing BM25 file is rebuilt in place
+            if cid not in bm25:
+                bm25.add(cid, chunk.page_content)
+            if cid not in indexed:
+                yield cid, chunk
+
+    added = 0
+    start = time.perf_counter()
+    model_name = model_name or getattr(embedding_model, "namespace", "")
+    with EmbeddingPipeline(embedding_model, model_name, workers=workers, batch_size=batch_size) as pipeline:
+        for batch, vectors in pipeline.map_batches(iter_batches(new_chunks(), batch_size)):
+            upsert_batch(vectorstore, batch, vectors)
+            added += len(batch)
+
+    removed_ids = sorted(indexed - current)
+    for batch in iter_batches(removed_ids, 1000):
+        vectorstore.delete(batch)
+    for cid in removed_ids:
+        bm25.remove(cid)
+    if bm25.dirty:
+        bm25.save(bm25_path)
+
+    if not added and not removed_ids:
+        print(f"✓ Vector store up to date ({len(current)} chunks)")
+        return vectorstore, bm25
+
+    vectorstore.persist()
+    save_manifest(persist_directory, {
+        "fingerprint": fingerprint,
+        "backend": backend,
+        "collection": collection_name,
+        "ids": sorted(current),
+    })
+    elapsed = time.perf_counter() - start
+    print(f"✓ Vector store synced: {added} embedded, {len(removed_ids)} removed, "
+          f"{len(current)} total ({elapsed:.1f}s)")
+    return vectorstore, bm25
+
+# ----------------------------------------
+# CLI
+# ----------------------------------------
+def main():
+    from embeddings import EMBEDDING_MODEL_NAME, embedding_namespace, get_embedding_model
+
+    parser = argparse.ArgumentParser(description="Build or update a vector index")
+    parser.add_argument("--source", default="humaneval", help='"humaneval" or a directory of .py files')
+    parser.add_argument("--persist-dir", default="./chroma_langchain")
+    parser.add_argument("--corpus", help="Build the named corpus under CORPORA_DIR instead of --persist-dir")
+    parser.add_argument("--metadata", action="append", default=[], metavar="KEY=VALUE",
+                        help="Metadata added to every document of a directory source (repeatable)")
+    parser.add_argument("--workers", type=int, default=0, help="Embedding processes (0 = in-process)")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--chunker", choices=["python_ast", "recursive"], default=CHUNKER)
+    parser.add_argument("--index-docstrings", action="store_true", default=INDEX_DOCSTRINGS)
+    parser.add_argument("--backend", choices=BACKENDS, default=VECTOR_STORE)
+    args = parser.parse_args()
+
+    metadata = {}
+    for item in args.metadata:
+        key, sep, value = item.partition("=")
+        if not sep or not METADATA_KEY_RE.match(key):
+            parser.error(f"--metadata expects KEY=VALUE, got {item!r}")
+        metadata[key] = value
+    persist_dir, collection_name = args.persist_dir, ChromaVectorStore.DEFAULT_COLLECTION
+    if args.corpus:
+        from corpora import corpus_directory
+
+        try:
+            persist_dir = corpus_directory(args.corpus)
+        except ValueError as e:
+            parser.error(str(e))
+        collection_name = args.corpus
+
+    if args.source == "humaneval":
+        if metadata:
+            parser.error("--metadata applies to directory sources")
+        documents = iter_humaneval_documents()
+    else:
+        documents = iter_python_files(args.source, metadata)
+
+    splitter, splitter_settings = get_splitter(args.chunker, args.index_docstrings)
+    sync_vectorstore(
+        iter_splits(documents, splitter),
+        get_embedding_model(),
+        persist_dir,
+        settings_fingerprint(splitter_settings, embedding_namespace()),
+        workers=args.workers,
+        batch_size=args.batch_size,
+        model_name=EMBEDDING_MODEL_NAME,
+        backend=args.backend,
+        collection_name=collection_name,
+    )
+
+if __name__ == "__main__":
+    main()
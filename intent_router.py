@@ -0,0 +1,90 @@
+"""
+Intent routing for the graph's router node.
+
+The primary router compares the query embedding (already computed for
+retrieval) against one centroid per intent, built from the labeled
+examples in `intent_examples.jsonl`. When the top two intents are closer
+than `margin`, the keyword router decides instead.
+"""
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import re
+import numpy as np
+
+INTENTS = ("generate_code", "explain_code")
+INTENT_EXAMPLES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_examples.jsonl")
+
+GENERATE_KEYWORDS = {"generate", "create", "write", "make", "build", "code", "function", "implement"}
+EXPLAIN_KEYWORDS = {"explain", "describe", "how", "what", "why", "works", "meaning", "understand"}
+QUESTION_WORDS = {"how", "what", "why"}
+WORD_RE = re.compile(r"[a-z]+")
+
+def keyword_intent(text: str) -> str:
+    """
+    Keyword vote on whole words, so "decode" does not count as "code" and
+    "show" does not count as "how". Ties go to explain_code for questions.
+    """
+    words = set(WORD_RE.findall(text.lower()))
+    generate_matches = len(words & GENERATE_KEYWORDS)
+    explain_matches = len(words & EXPLAIN_KEYWORDS)
+    if generate_matches != explain_matches:
+        return "generate_code" if generate_matches > explain_matches else "explain_code"
+    if words & QUESTION_WORDS or "?" in text:
+        return "explain_code"
+    return "generate_code"
+
+def load_intent_examples(path: str = INTENT_EXAMPLES_FILE) -> List[Tuple[str, str]]:
+    """(text, intent) pairs from a JSON Lines file"""
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [(record["text"], record["intent"]) for record in records]
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+class CentroidIntentRouter:
+    """
+    Nearest-centroid classifier over query embeddings.
+
+    `classify` is a single small matrix-vector product and makes no model
+    calls; the centroids are embedded once, when the pipeline is built.
+    """
+
+    def __init__(self, centroids: Dict[str, np.ndarray], margin: float = 0.02):
+        self.intents = list(centroids)
+        self.centroids = _normalize(np.stack([centroids[intent] for intent in self.intents]).astype(np.float32))
+        self.margin = margin
+
+    @classmethod
+    def fit(cls, embedding_model, examples: List[Tuple[str, str]], margin: float = 0.02) -> "CentroidIntentRouter":
+        """Average the normalized embeddings of the labeled examples per intent"""
+        texts = [text for text, _ in examples]
+        if hasattr(embedding_model, "embed_queries"):
+            vectors = embedding_model.embed_queries(texts)
+        else:
+            vectors = [embedding_model.embed_query(text) for text in texts]
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        labels = np.array([intent for _, intent in examples])
+        centroids = {intent: vectors[labels == intent].mean(axis=0) for intent in INTENTS if (labels == intent).any()}
+        return cls(centroids, margin=margin)
+
+    def scores(self, vector) -> Dict[str, float]:
+        """Cosine similarity of the query to each intent centroid"""
+        similarities = self.centroids @ _normalize(np.asarray(vector, dtype=np.float32))
+        return dict(zip(self.intents, similarities.tolist()))
+
+    def classify(self, vector) -> Tuple[Optional[str], float]:
+        """(intent, margin over the runner-up); intent is None when the margin is below threshold"""
+        ranked = sorted(self.scores(vector).items(), key=lambda item: item[1], reverse=True)
+        confidence = ranked[0][1] - ranked[1][1] if len(ranked) > 1 else 1.0
+        return (ranked[0][0] if confidence >= self.margin else None), confidence
+
+    def route(self, text: str, vector) -> Tuple[str, str]:
+        """(intent, method) where method is "centroid" or "keyword" (fallback)"""
+        if vector is not None and len(vector):
+            intent, _ = self.classify(vector)
+            if intent is not None:
+                return intent, "centroid"
+        return keyword_intent(text), "keyword"
@@ -0,0 +1,273 @@
+"""
+Shared LLM client layer.
+
+Every chat completion goes through one `LLMClient`:
+
+- HTTP keep-alive connection pools (one sync, one async) shared by all models
+- a token-bucket rate limiter applied to every HTTP attempt
+- a concurrency cap on in-flight completions
+- retries with jittered exponential backoff that honour Retry-After
+- ordered fallback to the next model once a model's retries are exhausted
+
+A streamed completion that fails after its first token is not retried
+and does not fall back: the tokens already went out to the client.
+"""
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import List, Optional
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableLambda
+from langchain_core.runnables.config import merge_configs
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------
+# Rate limiting
+# ----------------------------------------
+class TokenBucket:
+    """
+    Allows `rate` requests per second with bursts of up to `capacity`.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token, returning how long the caller must wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        if self.rate > 0:
+            wait = self._reserve()
+            if wait:
+                time.sleep(wait)
+
+    async def aacquire(self):
+        if self.rate > 0:
+            wait = self._reserve()
+            if wait:
+                await asyncio.sleep(wait)
+
+# ----------------------------------------
+# Backoff
+# ----------------------------------------
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-requested delay from Retry-After / retry-after-ms, if any"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff; a Retry-After value is a lower bound"""
+    delay = random.uniform(0.0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+# ----------------------------------------
+# Instrumentation
+# ----------------------------------------
+def _model_name(model) -> str:
+    return getattr(model, "model_name", type(model).__name__)
+
+@contextmanager
+def _observe_request(model):
+    """Count one HTTP attempt and time it (successful or not)"""
+    name = _model_name(model)
+    with metrics.timer("llm_duration_seconds", key="llm", model=name):
+        try:
+            yield
+        except Exception:
+            metrics.incr("llm_requests", model=name, outcome="error")
+            raise
+    metrics.incr("llm_requests", model=name, outcome="ok")
+
+class _TokenWatch(BaseCallbackHandler):
+    """Notes whether an attempt has streamed any token to the caller's callbacks"""
+
+    run_inline = True
+
+    def __init__(self):
+        self.streamed = False
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        if token:
+            self.streamed = True
+
+def _record_usage(model, message):
+    """Add the completion's token usage to the token counters"""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        name = _model_name(model)
+        metrics.incr("llm_prompt_tokens", usage.get("input_tokens", 0), model=name)
+        metrics.incr("llm_completion_tokens", usage.get("output_tokens", 0), model=name)
+    return message
+
+# ----------------------------------------
+# Client
+# ----------------------------------------
+class LLMClient:
+    """
+    Rate-limited, retrying chat model with ordered fallbacks.
+
+    `models` are LangChain chat models built with `max_retries=0`, so this
+    class owns the retry policy. `as_runnable()` returns a Runnable that
+    drops into `prompt | llm | parser` chains; the callbacks config is
+    passed through, so token streaming keeps working.
+    """
+
+    def __init__(self, models: List, max_concurrency: int = 8, rate_limit: float = 0.0, burst: Optional[float] = None,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 20.0):
+        import openai
+
+        self.retryable_errors = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError,
+                                 openai.InternalServerError)
+        self.models = models
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = TokenBucket(rate_limit, burst)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._async_semaphores = weakref.WeakKeyDictionary()
+
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        # asyncio primitives belong to one event loop
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    def _next_delay(self, model, attempt: int, error: Exception) -> Optional[float]:
+        """Backoff before the next attempt, or None when this model is exhausted"""
+        if not isinstance(error, self.retryable_errors) or attempt >= self.max_retries:
+            return None
+        metrics.incr("llm_retries")
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_max, retry_after_seconds(error))
+        logger.warning("⚠️ [llm] %s: %s, retrying in %.2fs", _model_name(model), type(error).__name__, delay)
+        return delay
+
+    def _fallback(self, index: int, error: Exception):
+        if index + 1 >= len(self.models):
+            raise error
+        metrics.incr("llm_fallbacks")
+        logger.warning("⚠️ [llm] Falling back to %s", _model_name(self.models[index + 1]))
+
+    def _partial_stream(self, model, watch: _TokenWatch, error: Exception) -> bool:
+        """True when the failed attempt already streamed tokens, so a retry would send them twice"""
+        if not watch.streamed:
+            return False
+        metrics.incr("llm_stream_failures", model=_model_name(model))
+        logger.error("❌ [llm] %s failed mid-stream (%s), not retrying", _model_name(model), type(error).__name__)
+        return True
+
+    def invoke(self, messages, config=None):
+        with self._semaphore:
+            for index, model in enumerate(self.models):
+                attempt = 0
+                while True:
+                    self.rate_limiter.acquire()
+                    watch = _TokenWatch()
+                    try:
+                        with _observe_request(model):
+                            return _record_usage(
+                                model, model.invoke(messages, merge_configs(config, {"callbacks": [watch]}))
+                            )
+                    except Exception as e:
+                        if self._partial_stream(model, watch, e):
+                            raise
+                        delay = self._next_delay(model, attempt, e)
+                        if delay is None:
+                            self._fallback(index, e)
+                            break
+                        time.sleep(delay)
+                        attempt += 1
+
+    async def ainvoke(self, messages, config=None):
+        async with self._async_semaphore():
+            for index, model in enumerate(self.models):
+                attempt = 0
+                while True:
+                    await self.rate_limiter.aacquire()
+                    watch = _TokenWatch()
+                    try:
+                        with _observe_request(model):
+                            return _record_usage(
+                                model, await model.ainvoke(messages, merge_configs(config, {"callbacks": [watch]}))
+                            )
+                    except Exception as e:
+                        if self._partial_stream(model, watch, e):
+                            raise
+                        delay = self._next_delay(model, attempt, e)
+                        if delay is None:
+                            self._fallback(index, e)
+                            break
+                        await asyncio.sleep(delay)
+                        attempt += 1
+
+    def as_runnable(self) -> RunnableLambda:
+        return RunnableLambda(self.invoke, afunc=self.ainvoke, name="LLMClient")
+
+def create_llm_client(base_url: str, api_key: Optional[str], models: List[str], temperature: float = 0.2,
+                      max_tokens: int = 1000, timeout: float = 60.0, pool_connections: int = 20,
+                      **client_options) -> LLMClient:
+    """Build one ChatOpenAI per model, all sharing the same keep-alive pools"""
+    from langchain_openai import ChatOpenAI
+
+    limits = httpx.Limits(max_connections=pool_connections, max_keepalive_connections=pool_connections,
+                          keepalive_expiry=60.0)
+    http_client = httpx.Client(limits=limits, timeout=timeout)
+    http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+    chat_models = [
+        ChatOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            max_retries=0,
+            stream_usage=True,
+            timeout=timeout,
+            http_client=http_client,
+            http_async_client=http_async_client,
+        )
+        for model in models
+    ]
+    return LLMClient(chat_models, **client_options)
@@ -1,33 +1,46 @@
 # main.py
-from rag_langchain import setup_rag_pipeline
+from rag_langchain import init_pipeline
 from graph import graph
 from state import AssistantState
+from langchain_core.messages import AIMessageChunk
 from plot import save_langgraph_png
+from sessions import SESSION_BACKEND, get_session_graph, session_config, turn_input
+import argparse
+import batch
+import json
+import metrics
+import os
+import uuid
 
 
 def initialize_system():
     """Initialize the RAG system with LangChain"""
+    metrics.configure_logging(os.getenv("LOG_LEVEL", "INFO"))
     print("🚀 Initializing RAG LangGraph System with LangChain...")
     
-    # Setup LangChain RAG pipeline
-    global code_rag_chain, explain_rag_chain, retriever, vectorstore
-    code_rag_chain, explain_rag_chain, retriever, vectorstore = setup_rag_pipeline()
+    # Build the shared RAG pipeline once; the graph nodes use it from here on
+    init_pipeline()
     
     print("✅ System ready!")
 
-def process_query(user_input: str) -> str:
-    """Process a user query through the state machine"""
+def process_query(user_input: str, session_id: str = None) -> str:
+    """Process a user query through the state machine (as a turn of `session_id` when given)"""
     initial_state = {
         "messages": [],
         "user_input": user_input,
         "intent": "",
+        "documents": None,
+        "query_embedding": [],
         "retrieved_context": [],
         "llm_response": ""
     }
     
     try:
         # Execute the graph
-        final_state = graph.invoke(initial_state)
+        if session_id:
+            final_state = get_session_graph().invoke(turn_input(user_input), session_config(session_id))
+        else:
+            final_state = graph.invoke(initial_state)
         
         # Return the latest AI response
         for message in reversed(final_state["messages"]):
@@ -39,8 +52,52 @@ def process_query(user_input: str) -> str:
     except Exception as e:
         return f"Error processing query: {str(e)}"
 
-def chat_loop():
-    """Main chat loop"""
+def process_batch(items, concurrency: int = batch.DEFAULT_CONCURRENCY):
+    """Process many queries (dicts with a `query`, or title/body records); yields results as they finish"""
+    return batch.process_batch(items, concurrency=concurrency)
+
+def run_batch_file(path: str, output_path: str = "batch_results.jsonl"):
+    """Run a JSON Lines file of queries and write one JSON result per line"""
+    initialize_system()
+    with open(path, "r", encoding="utf-8") as f:
+        items = batch.parse_batch_lines(f.read())
+    with open(output_path, "w", encoding="utf-8") as output:
+        for result in process_batch(items):
+            output.write(json.dumps(result, default=str) + "\n")
+            output.flush()
+    print(f"✅ {len(items)} results written to {output_path}")
+
+def stream_query(user_input: str, session_id: str = None, session_backend: str = SESSION_BACKEND):
+    """Yield response tokens as the generation node produces them"""
+    initial_state = {
+        "messages": [],
+        "user_input": user_input,
+        "intent": "",
+        "documents": None,
+        "query_embedding": [],
+        "retrieved_context": [],
+        "llm_response": ""
+    }
+    
+    streamed = False
+    if session_id:
+        runs = get_session_graph(session_backend).stream(turn_input(user_input), session_config(session_id), stream_mode=["updates", "messages"])
+    else:
+        runs = graph.stream(initial_state, stream_mode=["updates", "messages"])
+    for mode, chunk in runs:
+        if mode == "messages":
+            message, metadata = chunk
+            if metadata.get("langgraph_node") in ("generate_code", "explain_code") and isinstance(message, AIMessageChunk) and message.content:
+                streamed = True
+                yield message.content
+        elif not streamed:
+            # Nothing was streamed (e.g. the LLM call failed): emit the final text
+            for node, update in chunk.items():
+                if node in ("generate_code", "explain_code"):
+                    yield update.get("llm_response", "")
+
+def chat_loop(session_id: str = None):
+    """Main chat loop; a named `session_id` is resumed from, and saved to, the session store"""
     initialize_system()
     
     # Show graph structure
@@ -57,6 +114,14 @@ def chat_loop():
     print("Type 'quit' to exit")
     print("="*50)
     
+    # Earlier turns are remembered. An unnamed session lives in memory for this run only,
+    # so the session store is not filled with threads nothing will ever resume
+    session_backend = SESSION_BACKEND if session_id else "memory"
+    if session_id:
+        print(f"💾 Session {session_id} (resume it with --session {session_id})")
+    else:
+        session_id = f"cli-{uuid.uuid4()}"
+    
     while True:
         try:
             user_input = input("\n👤 You: ").strip()
@@ -68,9 +133,11 @@ def chat_loop():
             if not user_input:
                 continue
             
-            # Process through state machine
-            response = process_query(user_input)
-            print(f"\n🤖 Assistant: {response}")
+            # Process through state machine, printing tokens as they arrive
+            print("\n🤖 Assistant: ", end="", flush=True)
+            for token in stream_query(user_input, session_id=session_id, session_backend=session_backend):
+                print(token, end="", flush=True)
+            print()
             
         except KeyboardInterrupt:
             print("\n👋 Goodbye!")
@@ -78,11 +145,15 @@ def chat_loop():
         except Exception as e:
             print(f"\n❌ Error: {e}")
 
-# Global variables for the RAG pipeline
-code_rag_chain = None
-explain_rag_chain = None
-retriever = None
-vectorstore = None
-
 if __name__ == "__main__":
-    chat_loop()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="RAG Code Assistant")
+    parser.add_argument("--batch", nargs="+", metavar=("INPUT", "OUTPUT"),
+                        help="Run a JSON Lines file of queries and write the results (default batch_results.jsonl)")
+    parser.add_argument("--session", help="Name of a conversation to resume (and keep) in the session store")
+    args = parser.parse_args()
+    if args.batch and len(args.batch) > 2:
+        parser.error("--batch takes an input file and an optional output file")
+    if args.batch:
+        run_batch_file(*args.batch[:2])
+    else:
+        chat_loop(args.session)
\ No newline at end of file
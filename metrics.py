@@ -0,0 +1,151 @@
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+import functools
+import inspect
+import logging
+import threading
+import time
+
+# ----------------------------------------
+# Process-wide counters and histograms
+# ----------------------------------------
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_counters = Counter()  # (name, labels) -> value
+_histograms = {}       # (name, labels) -> [bucket counts..., +Inf count], sum
+_lock = threading.Lock()
+
+# Per-request timings (ms), active inside `collect_timings()`
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+def _key(name: str, labels: dict):
+    return name, tuple(sorted(labels.items()))
+
+def incr(name: str, amount: int = 1, **labels):
+    """Increment a named counter"""
+    with _lock:
+        _counters[_key(name, labels)] += amount
+
+def get(name: str, **labels) -> int:
+    """Current value of a named counter"""
+    with _lock:
+        return _counters[_key(name, labels)]
+
+def observe(name: str, value: float, **labels):
+    """Record one value in a named histogram (seconds for latencies)"""
+    with _lock:
+        key = _key(name, labels)
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0]
+        histogram[0][bisect_left(LATENCY_BUCKETS, value)] += 1
+        histogram[1] += value
+
+def snapshot() -> dict:
+    """Copy of all counters"""
+    with _lock:
+        return {_format_name(name, labels): value for (name, labels), value in _counters.items()}
+
+def reset():
+    """Zero all counters and histograms (used by tests and benchmarks)"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+# ----------------------------------------
+# Timing
+# ----------------------------------------
+@contextmanager
+def collect_timings():
+    """Collect the timings recorded in this context (and tasks/threads it starts) into a dict of ms"""
+    timings = {}
+    token = _request_timings.set(timings)
+    start = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings["total"] = (time.perf_counter() - start) * 1000.0
+        _request_timings.reset(token)
+
+@contextmanager
+def timer(name: str, key: Optional[str] = None, **labels):
+    """Observe the block's duration in histogram `name`, and as `key` in the request timings"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(name, elapsed, **labels)
+        timings = _request_timings.get()
+        if timings is not None and key:
+            timings[key] = timings.get(key, 0.0) + elapsed * 1000.0
+
+def timed_node(node: str):
+    """Decorator recording a graph node's duration (sync or async)"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timer("node_duration_seconds", key=node, node=node):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer("node_duration_seconds", key=node, node=node):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# ----------------------------------------
+# Logging
+# ----------------------------------------
+def configure_logging(level: str = "INFO"):
+    """Leveled logging for the CLI and API; per-node progress is logged at DEBUG"""
+    logging.basicConfig(level=level.upper(), format="%(message)s")
+    # Client libraries log every HTTP request at INFO
+    logging.getLogger("httpx").setLevel(max(logging.WARNING, logging.getLogger().level))
+
+# ----------------------------------------
+# Prometheus exposition
+# ----------------------------------------
+PREFIX = "rag_"
+
+def _format_labels(labels, extra=()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+def _format_name(name: str, labels) -> str:
+    return name + _format_labels(labels)
+
+def render_prometheus() -> str:
+    """All counters and histograms in the Prometheus text format"""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, (list(h[0]), h[1])) for key, h in _histograms.items())
+
+    lines, typed = [], set()
+    for (name, labels), value in counters:
+        metric = f"{PREFIX}{name}_total"
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+    for (name, labels), (buckets, total) in histograms:
+        metric = f"{PREFIX}{name}"
+        if metric not in typed:
+            typed.add(metric)
+            lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+            cumulative += count
+            lines.append(f"{metric}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{metric}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{metric}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
@@ -1,101 +1,326 @@
 from state import AssistantState
-from rag_langchain import code_rag_chain, explain_rag_chain, retriever
-from langchain_core.messages import HumanMessage, AIMessage
+from rag_langchain import HISTORY_KEEP_MESSAGES, HISTORY_TOKEN_BUDGET, RERANK, get_pipeline
+from intent_router import INTENTS, keyword_intent
+from langchain_core.messages import HumanMessage, AIMessage, RemoveMessage
+import asyncio
+import json
+import logging
+import metrics
 
+logger = logging.getLogger(__name__)
+
+@metrics.timed_node("chat")
 def chat_node(state: AssistantState) -> AssistantState:
     """Process user input"""
-    print("🔄 [chat] Processing input...")
+    logger.debug("🔄 [chat] Processing input...")
     
-    if not state["messages"] or not any(isinstance(msg, HumanMessage) and msg.content == state["user_input"] for msg in state["messages"]):
-        state["messages"].append(HumanMessage(content=state["user_input"]))
+    # Only the newest message can be this turn's input (O(1), independent of history length)
+    messages = state["messages"]
+    if not messages or not (isinstance(messages[-1], HumanMessage) and messages[-1].content == state["user_input"]):
+        messages.append(HumanMessage(content=state["user_input"]))
     
     return state
 
+@metrics.timed_node("embed")
+def embed_node(state: AssistantState) -> AssistantState:
+    """Embed the query once; routing and retrieval both reuse the vector"""
+    # Batch callers prefetch the embedding with the documents
+    if state.get("query_embedding"):
+        return {"query_embedding": state["query_embedding"]}
+    try:
+        return {"query_embedding": get_pipeline().embed_query(state["user_input"])}
+    except Exception as e:
+        # Retrieval embeds again itself, and the router falls back to keywords
+        logger.error("❌ [embed] Error embedding query: %s", e)
+        return {"query_embedding": []}
+
+@metrics.timed_node("embed")
+async def aembed_node(state: AssistantState) -> AssistantState:
+    """Async embed: runs on the bounded embedding executor"""
+    if state.get("query_embedding"):
+        return {"query_embedding": state["query_embedding"]}
+    try:
+        return {"query_embedding": await get_pipeline().aembed_query(state["user_input"])}
+    except Exception as e:
+        logger.error("❌ [embed] Error embedding query: %s", e)
+        return {"query_embedding": []}
+
+@metrics.timed_node("router")
 def router_node(state: AssistantState) -> AssistantState:
-    """Classify user intent"""
-    print("🔄 [router] Classifying intent...")
+    """Classify user intent (runs in parallel with retrieve, so it returns only the intent)"""
+    logger.debug("🔄 [router] Classifying intent...")
+    
+    # Callers such as /generate/stream force the intent up front
+    if state.get("intent") in INTENTS:
+        logger.debug("✅ [router] Intent (forced): %s", state["intent"])
+        return {"intent": state["intent"]}
     
-    user_input = state["user_input"].lower()
+    # Reuse the query embedding computed by embed; no extra model call
+    intent_router = get_pipeline().intent_router
+    if intent_router is not None:
+        intent, method = intent_router.route(state["user_input"], state.get("query_embedding"))
+    else:
+        intent, method = keyword_intent(state["user_input"]), "keyword"
+    
+    logger.debug("✅ [router] Intent: %s (%s)", intent, method)
+    return {"intent": intent}
+
+def _context_snippets(docs) -> list:
+    """Truncated, API-friendly view of the retrieved documents"""
+    return [
+        {
+            "content": doc.page_content[:400] + "..." if len(doc.page_content) > 400 else doc.page_content,
+            "metadata": doc.metadata,
+        }
+        for doc in docs
+    ]
+
+def _format_messages(messages) -> str:
+    return "\n".join(
+        f"{'User' if isinstance(message, HumanMessage) else 'Assistant'}: {message.content}"
+        for message in messages
+    )
+
+def _history(state: AssistantState) -> str:
+    """Earlier turns of the session (summary + recent messages) for the prompt; empty for a first turn"""
+    earlier = state["messages"][:-1]
+    summary = state.get("summary", "")
+    if not earlier and not summary:
+        return ""
+    parts = [f"Summary of earlier conversation: {summary}"] if summary else []
+    if earlier:
+        parts.append(_format_messages(earlier))
+    return "\nConversation so far:\n" + "\n".join(parts) + "\n"
+
+def _chain_inputs(state: AssistantState) -> dict:
+    """Prompt variables shared by both RAG chains (deduplicated, budgeted context)"""
+    context, _ = get_pipeline().context_builder.build(state["documents"])
+    return {"context": context, "history": _history(state), "question": state["user_input"]}
+
+def _cache_scope(state: AssistantState, intent: str) -> str:
+    """Cache key part besides the query: answers from another corpus, filter or rerank setting are not interchangeable"""
+    scope = intent
+    if RERANK if state.get("rerank") is None else state["rerank"]:
+        scope += "|rerank"
+    if state.get("corpus"):
+        scope += f"|corpus={state['corpus']}"
+    if state.get("filter"):
+        scope += f"|filter={json.dumps(state['filter'], sort_keys=True)}"
+    return scope
+
+def _cached_response(state: AssistantState, intent: str):
+    """Look up a response for a near-identical earlier query"""
+    response_cache = get_pipeline().response_cache
+    if response_cache is None or not state.get("query_embedding"):
+        return None
+    # A follow-up in a session depends on the conversation, not just the query
+    if len(state["messages"]) > 1 or state.get("summary"):
+        return None
+    try:
+        return response_cache.lookup(state["query_embedding"], _cache_scope(state, intent))
+    except Exception as e:
+        # e.g. "database is locked" with workers sharing the SQLite backend: answer without the cache
+        metrics.incr("semantic_cache_errors", operation="lookup")
+        logger.warning("⚠️ [cache] Lookup failed, continuing without the cache: %s", e)
+        return None
+
+def _cache_response(state: AssistantState, intent: str, response: str):
+    response_cache = get_pipeline().response_cache
+    if response_cache is None or not state.get("query_embedding"):
+        return
+    try:
+        response_cache.store(state["query_embedding"], _cache_scope(state, intent), response)
+    except Exception as e:
+        # The answer is already there; losing the cache entry must not turn it into an error
+        metrics.incr("semantic_cache_errors", operation="store")
+        logger.warning("⚠️ [cache] Store failed: %s", e)
+
+@metrics.timed_node("retrieve")
+def retrieve_node(state: AssistantState) -> AssistantState:
+    """Retrieve context documents once for the whole request (in parallel with the router)"""
+    logger.debug("🔄 [retrieve] Searching vector store...")
     
-    generate_keywords = {"generate", "create", "write", "make", "build", "code", "function", "implement"}
-    explain_keywords = {"explain", "describe", "how", "what", "why", "works", "meaning", "understand"}
+    # Batch callers prefetch retrieval for many queries at once
+    if state.get("documents") is not None:
+        logger.debug("✅ [retrieve] %d prefetched documents", len(state["documents"]))
+        return {"documents": state["documents"]}
     
-    generate_matches = len([k for k in generate_keywords if k in user_input])
-    explain_matches = len([k for k in explain_keywords if k in user_input])
+    try:
+        result = get_pipeline().search(
+            state["user_input"], rerank=state.get("rerank"), query_embedding=state.get("query_embedding"),
+            corpus=state.get("corpus"), where=state.get("filter"),
+        )
+        logger.debug("✅ [retrieve] %d documents", len(result["documents"]))
+        return {"documents": result["documents"], "query_embedding": result["query_embedding"]}
+    except Exception as e:
+        logger.error("❌ [retrieve] Error retrieving context: %s", e)
+        return {"documents": []}
+
+@metrics.timed_node("retrieve")
+async def aretrieve_node(state: AssistantState) -> AssistantState:
+    """Async retrieve: embedding and search run on the bounded embedding executor"""
+    logger.debug("🔄 [retrieve] Searching vector store...")
     
-    if generate_matches > explain_matches:
-        state["intent"] = "generate_code"
-    elif explain_matches > generate_matches:
-        state["intent"] = "explain_code"
-    else:
-        if any(q in user_input for q in ["how", "what", "why", "?"]):
-            state["intent"] = "explain_code"
-        else:
-            state["intent"] = "generate_code"
+    # Batch callers prefetch retrieval for many queries at once
+    if state.get("documents") is not None:
+        logger.debug("✅ [retrieve] %d prefetched documents", len(state["documents"]))
+        return {"documents": state["documents"]}
     
-    print(f"✅ [router] Intent: {state['intent']}")
-    return state
+    try:
+        result = await get_pipeline().asearch(
+            state["user_input"], rerank=state.get("rerank"), query_embedding=state.get("query_embedding"),
+            corpus=state.get("corpus"), where=state.get("filter"),
+        )
+        logger.debug("✅ [retrieve] %d documents", len(result["documents"]))
+        return {"documents": result["documents"], "query_embedding": result["query_embedding"]}
+    except Exception as e:
+        logger.error("❌ [retrieve] Error retrieving context: %s", e)
+        return {"documents": []}
+
+@metrics.timed_node("context")
+def context_node(state: AssistantState) -> AssistantState:
+    """Join point of the router and retrieve branches: expose the retrieved context"""
+    return {"retrieved_context": _context_snippets(state["documents"])}
 
+@metrics.timed_node("generate_code")
 def generate_code_node(state: AssistantState) -> AssistantState:
     """Generate code with LangChain RAG"""
-    print("🔄 [generate_code] Generating code with RAG...")
+    logger.debug("🔄 [generate_code] Generating code with RAG...")
     
     try:
         # Use code-specific RAG chain
-        response = code_rag_chain.invoke(state["user_input"])
+        response = _cached_response(state, "generate_code")
+        if response is None:
+            response = get_pipeline().code_rag_chain.invoke(_chain_inputs(state))
+            _cache_response(state, "generate_code", response)
         
-        # Store retrieved context info
-        docs = retriever.invoke(state["user_input"])
-        state["retrieved_context"] = [
-            {
-                "content": doc.page_content[:400] + "..." if len(doc.page_content) > 400 else doc.page_content,
-                "metadata": doc.metadata,
-            }
-            for doc in docs
-        ]
+        state["llm_response"] = response
+        state["messages"].append(AIMessage(content=response))
+        logger.debug("✅ [generate_code] Code generated with LangChain RAG")
+        
+    except Exception as e:
+        error_msg = f"Error generating code: {str(e)}"
+        state["llm_response"] = error_msg
+        state["messages"].append(AIMessage(content=error_msg))
+        logger.error("❌ [generate_code] %s", error_msg)
+    
+    return state
+
+@metrics.timed_node("generate_code")
+async def agenerate_code_node(state: AssistantState) -> AssistantState:
+    """Generate code with LangChain RAG without blocking the event loop"""
+    logger.debug("🔄 [generate_code] Generating code with RAG...")
+    
+    try:
+        # The cache scans its entries (and may hit SQLite): keep that off the event loop
+        response = await asyncio.to_thread(_cached_response, state, "generate_code")
+        if response is None:
+            response = await get_pipeline().code_rag_chain.ainvoke(_chain_inputs(state))
+            await asyncio.to_thread(_cache_response, state, "generate_code", response)
         
         state["llm_response"] = response
         state["messages"].append(AIMessage(content=response))
-        print("✅ [generate_code] Code generated with LangChain RAG")
+        logger.debug("✅ [generate_code] Code generated with LangChain RAG")
         
     except Exception as e:
         error_msg = f"Error generating code: {str(e)}"
         state["llm_response"] = error_msg
         state["messages"].append(AIMessage(content=error_msg))
-        print(f"❌ [generate_code] {error_msg}")
+        logger.error("❌ [generate_code] %s", error_msg)
     
     return state
 
+@metrics.timed_node("explain_code")
 def explain_code_node(state: AssistantState) -> AssistantState:
     """Explain code with LangChain RAG"""
-    print("🔄 [explain_code] Generating explanation with RAG...")
+    logger.debug("🔄 [explain_code] Generating explanation with RAG...")
     
     try:
         # Use explanation-specific RAG chain
-        response = explain_rag_chain.invoke(state["user_input"])
+        response = _cached_response(state, "explain_code")
+        if response is None:
+            response = get_pipeline().explain_rag_chain.invoke(_chain_inputs(state))
+            _cache_response(state, "explain_code", response)
         
-        # Store retrieved context info
-        docs = retriever.invoke(state["user_input"])
-        state["retrieved_context"] = [
-            {
-                "content": doc.page_content[:400] + "..." if len(doc.page_content) > 400 else doc.page_content,
-                "metadata": doc.metadata,
-            }
-            for doc in docs
-        ]
+        state["llm_response"] = response
+        state["messages"].append(AIMessage(content=response))
+        logger.debug("✅ [explain_code] Explanation generated with LangChain RAG")
+        
+    except Exception as e:
+        error_msg = f"Error generating explanation: {str(e)}"
+        state["llm_response"] = error_msg
+        state["messages"].append(AIMessage(content=error_msg))
+        logger.error("❌ [explain_code] %s", error_msg)
+    
+    return state
+
+@metrics.timed_node("explain_code")
+async def aexplain_code_node(state: AssistantState) -> AssistantState:
+    """Explain code with LangChain RAG without blocking the event loop"""
+    logger.debug("🔄 [explain_code] Generating explanation with RAG...")
+    
+    try:
+        response = await asyncio.to_thread(_cached_response, state, "explain_code")
+        if response is None:
+            response = await get_pipeline().explain_rag_chain.ainvoke(_chain_inputs(state))
+            await asyncio.to_thread(_cache_response, state, "explain_code", response)
         
         state["llm_response"] = response
         state["messages"].append(AIMessage(content=response))
-        print("✅ [explain_code] Explanation generated with LangChain RAG")
+        logger.debug("✅ [explain_code] Explanation generated with LangChain RAG")
         
     except Exception as e:
         error_msg = f"Error generating explanation: {str(e)}"
         state["llm_response"] = error_msg
         state["messages"].append(AIMessage(content=error_msg))
-        print(f"❌ [explain_code] {error_msg}")
+        logger.error("❌ [explain_code] %s", error_msg)
     
     return state
 
+def _messages_to_summarize(state: AssistantState) -> list:
+    """Oldest messages to fold into the summary once the history exceeds its token budget"""
+    messages = state["messages"]
+    if len(messages) <= HISTORY_KEEP_MESSAGES:
+        return []
+    count_tokens = get_pipeline().context_builder.count_tokens
+    if sum(count_tokens(message.content) for message in messages) <= HISTORY_TOKEN_BUDGET:
+        return []
+    return messages[:-HISTORY_KEEP_MESSAGES]
+
+def _trimmed(state: AssistantState, old: list, summary: str) -> dict:
+    logger.debug("✅ [memory] Summarized %d messages", len(old))
+    return {"summary": summary, "messages": [RemoveMessage(id=message.id) for message in old]}
+
+def _summary_inputs(state: AssistantState, old: list) -> dict:
+    return {"summary": state.get("summary") or "(none)", "messages": _format_messages(old)}
+
+@metrics.timed_node("memory")
+def memory_node(state: AssistantState) -> AssistantState:
+    """Keep session history bounded: summarize and drop the oldest messages"""
+    old = _messages_to_summarize(state)
+    if not old:
+        return state
+    try:
+        summary = get_pipeline().summary_chain.invoke(_summary_inputs(state, old))
+    except Exception as e:
+        # Still trim, so a failing summarizer cannot let the history grow without bound
+        logger.error("❌ [memory] Error summarizing history: %s", e)
+        summary = state.get("summary", "")
+    return _trimmed(state, old, summary)
+
+@metrics.timed_node("memory")
+async def amemory_node(state: AssistantState) -> AssistantState:
+    """Async memory node"""
+    old = _messages_to_summarize(state)
+    if not old:
+        return state
+    try:
+        summary = await get_pipeline().summary_chain.ainvoke(_summary_inputs(state, old))
+    except Exception as e:
+        logger.error("❌ [memory] Error summarizing history: %s", e)
+        summary = state.get("summary", "")
+    return _trimmed(state, old, summary)
+
 def route_by_intent(state: AssistantState) -> str:
     """Route to appropriate node based on intent"""
     return state["intent"]
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+ONNX Runtime backend for the sentence-transformer embedding model.
+
+`export_onnx_model` converts the Hugging Face checkpoint once, optionally
+adding an int8 dynamically quantized copy. Exporting needs torch and
+sentence-transformers; serving with `OnnxEmbeddings` only needs
+onnxruntime, tokenizers and numpy, so torch is never imported.
+
+    python -m onnx_embeddings --quantize
+"""
+from langchain_core.embeddings import Embeddings
+from typing import List, Optional
+import argparse
+import json
+import os
+import numpy as np
+
+ONNX_CONFIG_FILE = "onnx_config.json"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+def onnx_model_dir(base_dir: str, model_name: str) -> str:
+    """Where the exported files of `model_name` live under `base_dir`"""
+    return os.path.join(base_dir, model_name.replace("/", "__"))
+
+# ----------------------------------------
+# Export (torch needed here only)
+# ----------------------------------------
+def export_onnx_model(model_name: str, output_dir: str, quantize: bool = False, opset: int = 14) -> str:
+    """Export the transformer to ONNX (+ int8 copy), with its tokenizer and pooling settings"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    pooling = next(module for module in st_model if isinstance(module, Pooling)).get_pooling_mode_str()
+    if pooling not in ("mean", "cls"):
+        raise ValueError(f"Unsupported pooling mode for ONNX export: {pooling}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer.save_pretrained(output_dir)  # tokenizer.json, read by the `tokenizers` library
+
+    sample = tokenizer(["def add(a, b):\n    return a + b"], return_tensors="pt")
+    names = [name for name in INPUT_NAMES if name in sample]
+
+    class Encoder(torch.nn.Module):
+        """Positional inputs in, last hidden state out"""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(names, inputs)))[0]
+
+    axes = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder(transformer),
+            tuple(sample[name] for name in names),
+            os.path.join(output_dir, FP32_FILE),
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: axes for name in [*names, "last_hidden_state"]},
+            opset_version=opset,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(os.path.join(output_dir, FP32_FILE), os.path.join(output_dir, INT8_FILE),
+                         weight_type=QuantType.QInt8)
+
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "max_length": st_model.max_seq_length,
+            "pooling": pooling,
+            "normalize": any(isinstance(module, Normalize) for module in st_model),
+            "pad_token": tokenizer.pad_token,
+        }, f, indent=2)
+    return output_dir
+
+# ----------------------------------------
+# Serving
+# ----------------------------------------
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings from an exported model on the onnxruntime CPU provider.
+
+    Texts are tokenized by the Rust `tokenizers` library, sorted by length
+    and run in padded batches; pooling and normalization follow the
+    sentence-transformers configuration saved at export time.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, threads: Optional[int] = None, batch_size: int = 32):
+        from tokenizers import Tokenizer
+
+        self.model_path = os.path.join(model_dir, INT8_FILE if quantized else FP32_FILE)
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(
+                f"{self.model_path} not found; export it with `python -m onnx_embeddings{' --quantize' if quantized else ''}`"
+            )
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.batch_size = batch_size
+        self._open_session(threads)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.config["max_length"])
+        pad_token = self.config.get("pad_token") or "[PAD]"
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+
+    def _open_session(self, threads: Optional[int]):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def after_fork(self, threads: Optional[int] = None):
+        """The session's thread pool does not survive fork(); a forked worker opens its own session"""
+        self._open_session(threads)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        arrays = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: array for name, array in arrays.items() if name in self.input_names})[0]
+
+        if self.config["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = arrays["attention_mask"][:, :, None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.config["normalize"]:
+            pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled.astype(np.float32)
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), dim) float32; similar lengths share a batch to keep padding small"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._encode([texts[i] for i in batch])):
+                vectors[i] = vector
+        return np.stack(vectors)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+def main():
+    from app.config import settings
+    from embeddings import EMBEDDING_MODEL_NAME
+
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX")
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--output-dir", default=settings.EMBEDDING_ONNX_DIR)
+    parser.add_argument("--quantize", action="store_true", help="Also write an int8 dynamically quantized copy")
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+
+    output_dir = export_onnx_model(args.model, onnx_model_dir(args.output_dir, args.model), args.quantize, args.opset)
+    print(f"✓ Exported {args.model} to {output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -1,117 +1,89 @@
-from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_openai import ChatOpenAI
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.prompts import ChatPromptTemplate  
-from langchain_core.output_parsers.string import StrOutputParser 
-from langchain_core.runnables.passthrough import RunnablePassthrough  
-from langchain_core.documents import Document
-from datasets import load_dataset
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers.string import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+from embeddings import EMBEDDING_MODEL_NAME, embedding_namespace, get_embedding_model
+from ingestion import get_splitter, iter_humaneval_documents, iter_splits, settings_fingerprint, sync_vectorstore
+from semantic_cache import create_semantic_cache
+from bm25_index import reciprocal_rank_fusion
+from corpora import DEFAULT_CORPUS, Corpus, CorpusRegistry
+from intent_router import CentroidIntentRouter, load_intent_examples
+from llm_client import create_llm_client
+from context_builder import ContextBuilder
+from reranker import RERANK_MODEL_NAME, CrossEncoderReranker
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+import metrics
 import os
-import shutil
+
+logger = logging.getLogger(__name__)
 
 # ----------------------------------------
 # Configuration
 # ----------------------------------------
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+DEFAULT_LLM_MODEL = "openai/gpt-oss-20b:free"
 PERSIST_DIR = "./chroma_langchain"
+RETRIEVAL_K = 3
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")  # "vector", "bm25" or "hybrid"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # per retriever, before fusion
+HYBRID_VECTOR_WEIGHT = float(os.getenv("HYBRID_VECTOR_WEIGHT", "1.0"))
+HYBRID_BM25_WEIGHT = float(os.getenv("HYBRID_BM25_WEIGHT", "1.0"))
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "2"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0"))  # 0 embeds in-process
 
-# ----------------------------------------
-# Embedding model
-# ----------------------------------------
-def get_embedding_model():
-    model_name = "sentence-transformers/all-MiniLM-L6-v2"
-    return HuggingFaceEmbeddings(model_name=model_name)
+# Cross-encoder reranking: default for requests that do not set `rerank`
+RERANK = os.getenv("RERANK", "false").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", RERANK_MODEL_NAME)
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))  # deepest candidate list sent to the model
+RERANK_MARGIN = float(os.getenv("RERANK_MARGIN", "0.2"))  # relative first-stage score margin, see reranker.py
+INTENT_ROUTER = os.getenv("INTENT_ROUTER", "centroid")  # "centroid" or "keyword"
+INTENT_ROUTER_MARGIN = float(os.getenv("INTENT_ROUTER_MARGIN", "0.02"))  # below this, fall back to keywords
 
-embedding_model = get_embedding_model()
+# Prompt context: token budget, chunks per task_id, line-overlap dedupe threshold
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_MAX_PER_TASK = int(os.getenv("CONTEXT_MAX_PER_TASK", "2"))
+CONTEXT_OVERLAP_THRESHOLD = float(os.getenv("CONTEXT_OVERLAP_THRESHOLD", "0.8"))
 
-# ----------------------------------------
-# Load HumanEval dataset
-# ----------------------------------------
-def load_humaneval_documents():
-    """Load HumanEval dataset as LangChain documents"""
-    print("Loading HumanEval dataset...")
-    dataset = load_dataset("openai/openai_humaneval", split="test")
-    
-    documents = []
-    for item in dataset:
-        content = f"Task: {item['prompt']}\nSolution: {item['canonical_solution']}"
-        metadata = {
-            "task_id": item['task_id'],
-            "entry_point": item['entry_point'],
-            "source": "HumanEval"
-        }
-        documents.append(Document(page_content=content, metadata=metadata))
-    
-    print(f"✓ Loaded {len(documents)} examples as LangChain documents")
-    return documents
+# Session history: summarize older turns once the window exceeds the budget
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1000"))
+HISTORY_KEEP_MESSAGES = int(os.getenv("HISTORY_KEEP_MESSAGES", "4"))  # newest messages kept verbatim
+
+# Semantic response cache: "memory", "sqlite" or "off"
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "memory")
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "./semantic_cache.sqlite3")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
 
 # ----------------------------------------
-# Setup RAG pipeline
+# Prompts
 # ----------------------------------------
-def setup_rag_pipeline(persist_directory=PERSIST_DIR):
-    """Setup the complete RAG pipeline with LangChain"""
-
-    # Clean previous vectorstore if corrupted
-    if os.path.exists(persist_directory):
-        try:
-            # Attempt to load existing store
-            Chroma(persist_directory=persist_directory, embedding_function=embedding_model)
-        except Exception as e:
-            print(f"⚠️ Corrupt Chroma store detected: {e}. Rebuilding...")
-            shutil.rmtree(persist_directory)
-
-    docs = load_humaneval_documents()
-
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=50,
-        separators=["\n\n", "\n", " "],
-    )
-    splits = splitter.split_documents(docs)
-    print(f"✓ Split into {len(splits)} chunks")
-
-    # Create or reload Chroma vector store
-    vectorstore = Chroma.from_documents(
-        documents=splits,
-        embedding=embedding_model,
-        persist_directory=persist_directory,
-    )
-
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
-
-    # Initialize LLM
-    llm = ChatOpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=OPENROUTER_API_KEY,
-        model="openai/gpt-oss-20b:free",
-        temperature=0.2,
-        max_tokens=1000,
-    )
-
-    # ----------------------------------------
-    # Prompts
-    # ----------------------------------------
-    code_generation_prompt = ChatPromptTemplate.from_template("""
+CODE_GENERATION_TEMPLATE = """
 You are an expert Python programmer. Use the provided context of code examples to generate high-quality code.
 
 Context Examples:
 {context}
-
+{history}
 User Request: {question}
 
 Generate clean, efficient, and well-documented Python code.
 Include proper function definitions, type hints, and docstrings.
 
 Code:
-""")
+"""
 
-    explanation_prompt = ChatPromptTemplate.from_template("""
+EXPLANATION_TEMPLATE = """
 You are an expert programming educator. Use the provided context to explain code concepts clearly.
 
 Context Examples:
 {context}
-
+{history}
 User Question: {question}
 
 Provide a clear, structured explanation covering:
@@ -122,30 +94,351 @@ Provide a clear, structured explanation covering:
 - Performance or safety considerations
 
 Explanation:
-""")
+"""
 
-    # ----------------------------------------
-    # RAG Chains
-    # ----------------------------------------
-    code_rag_chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
-        | code_generation_prompt
-        | llm
-        | StrOutputParser()
-    )
+SUMMARY_TEMPLATE = """
+Summarize this conversation between a user and a Python coding assistant in at most 120 words.
+Keep requirements, decisions, names of functions written so far and open questions; drop pleasantries.
 
-    explain_rag_chain = (
-        {"context": retriever, "question": RunnablePassthrough()}
-        | explanation_prompt
-        | llm
-        | StrOutputParser()
-    )
+Previous summary:
+{summary}
 
-    print("✓ RAG pipeline initialized successfully")
-    return code_rag_chain, explain_rag_chain, retriever, vectorstore
+New messages:
+{messages}
 
+Summary:
+"""
 
 # ----------------------------------------
-# Initialize globally
+# Load HumanEval dataset
 # ----------------------------------------
-code_rag_chain, explain_rag_chain, retriever, vectorstore = setup_rag_pipeline()
\ No newline at end of file
+def load_humaneval_documents():
+    """Load HumanEval dataset as LangChain documents"""
+    logger.info("Loading HumanEval dataset...")
+    documents = list(iter_humaneval_documents())
+    logger.info("✓ Loaded %d examples as LangChain documents", len(documents))
+    return documents
+
+# ----------------------------------------
+# RAG pipeline container
+# ----------------------------------------
+class RAGPipeline:
+    """
+    Holds every heavy RAG component (embedding model, vector store, LLM
+    chains, caches). Nothing is loaded until `build()` runs, and the stage
+    durations are kept in `timings` for the startup benchmark.
+    """
+
+    def __init__(self, persist_directory=PERSIST_DIR):
+        self.persist_directory = persist_directory
+        self.timings = {}
+        self.embedding_model = None
+        self.embedding_executor = None
+        self.vectorstore = None
+        self.bm25 = None
+        self.corpora = None
+        self.retriever = None
+        self.llm = None
+        self.llm_client = None
+        self.context_builder = None
+        self.code_rag_chain = None
+        self.explain_rag_chain = None
+        self.summary_chain = None
+        self.response_cache = None
+        self.intent_router = None
+        self.reranker = None
+
+    def build(self):
+        """Load the model, sync/open the index and create the chains"""
+        start = time.perf_counter()
+        self.load_embedding_model()
+        self.timings["embedding_model_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.load_intent_router()
+        self.timings["intent_router_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.open_index()
+        self.timings["index_open_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.load_reranker()
+        self.timings["reranker_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.build_chains()
+        self.timings["chains_s"] = time.perf_counter() - start
+
+        logger.info("✓ Embedding cache: %s", self.embedding_model.stats())
+        logger.info("✓ RAG pipeline initialized successfully")
+        return self
+
+    def load_embedding_model(self):
+        self.embedding_model = get_embedding_model()
+        # CPU-bound embedding + search never runs on the event loop; the pool
+        # size bounds how many transformer forward passes compete for cores.
+        self.embedding_executor = ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS, thread_name_prefix="embedding")
+
+    def load_intent_router(self):
+        """Embed the labeled intent examples once (they hit the embedding cache after the first run)"""
+        if INTENT_ROUTER == "centroid":
+            self.intent_router = CentroidIntentRouter.fit(
+                self.embedding_model, load_intent_examples(), margin=INTENT_ROUTER_MARGIN
+            )
+
+    def load_reranker(self):
+        """Always available for per-request use; the model is loaded up front only when reranking is the default"""
+        self.reranker = CrossEncoderReranker(RERANK_MODEL, margin=RERANK_MARGIN)
+        if RERANK:
+            self.reranker.load()
+
+    def load_documents(self):
+        """Documents of the default corpus"""
+        return load_humaneval_documents()
+
+    def open_index(self):
+        docs = self.load_documents()
+        splitter, splitter_settings = get_splitter()
+
+        # Embed only new or changed chunks; reopen the store when nothing changed
+        fingerprint = settings_fingerprint(splitter_settings, embedding_namespace())
+        self.vectorstore, self.bm25 = sync_vectorstore(
+            iter_splits(docs, splitter),
+            self.embedding_model,
+            self.persist_directory,
+            fingerprint,
+            workers=INGEST_WORKERS,
+            model_name=EMBEDDING_MODEL_NAME,
+        )
+        # Named corpora built with `ingestion --corpus` open on demand next to this one
+        self.corpora = CorpusRegistry(
+            Corpus(DEFAULT_CORPUS, self.persist_directory, self.vectorstore, self.bm25), self.embedding_model
+        )
+        # Same contract as the original `vectorstore.as_retriever()`: a query in, Documents out
+        self.retriever = RunnableLambda(self.retrieve, afunc=self.aretrieve)
+
+    def after_fork(self, threads: int = None):
+        """
+        Make a pipeline inherited through fork() usable in the child. Threads,
+        SQLite connections, HTTP pools and ONNX sessions do not survive a
+        fork and are re-created; the model weights, the memory-mapped index
+        and the embedding cache stay shared with the parent copy-on-write,
+        and are only read from here on.
+        """
+        self.embedding_model.after_fork(threads)
+        self.embedding_executor = ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS, thread_name_prefix="embedding")
+        self.vectorstore.after_fork()
+        self.corpora.after_fork()
+        self.build_chains()
+
+    def embed_query(self, query: str):
+        return self.embedding_model.embed_query(query)
+
+    def search(self, query: str, k: int = RETRIEVAL_K, mode: str = RETRIEVAL_MODE, rerank: bool = None,
+               query_embedding=None, corpus: str = None, where: dict = None):
+        """
+        One embedding (skipped when `query_embedding` is given) and at most
+        one vector search per call; the vector is returned for reuse.
+        "hybrid" fuses vector and BM25 rankings with weighted reciprocal rank
+        fusion. `rerank` (default RERANK) sends a deeper candidate list
+        through the cross-encoder. `corpus` selects a named corpus (default:
+        HumanEval) and `where` a metadata filter, applied inside both searches.
+        """
+        query_embeddings = [query_embedding] if query_embedding is not None and len(query_embedding) else None
+        return self.search_batch([query], k=k, mode=mode, rerank=rerank, query_embeddings=query_embeddings,
+                                 corpus=corpus, where=where)[0]
+
+    def search_batch(self, queries, k: int = RETRIEVAL_K, mode: str = RETRIEVAL_MODE, rerank: bool = None,
+                     query_embeddings=None, corpus: str = None, where: dict = None):
+        """search() for many queries: one batched embedding call, one multi-query vector lookup, one rerank pass"""
+        with self.corpora.use(corpus) as index:
+            return self._search_batch(index, queries, k, mode, rerank, query_embeddings, where)
+
+    def _search_batch(self, index, queries, k, mode, rerank, query_embeddings, where):
+        rerank = RERANK if rerank is None else rerank
+        depth = max(k, RERANK_CANDIDATES) if rerank else k
+
+        if query_embeddings is None:
+            if len(queries) == 1:
+                query_embeddings = [self.embedding_model.embed_query(queries[0])]
+            else:
+                query_embeddings = self.embedding_model.embed_queries(list(queries))
+
+        # BM25 has no metadata; it is restricted to the ids the filter matches
+        allowed = index.vectorstore.ids_where(where) if where and mode != "vector" else None
+        if mode == "vector":
+            rankings = self.vector_search(query_embeddings, depth, where, index)
+        elif mode == "bm25":
+            rankings = self._resolve([self.bm25_search(query, depth, allowed, index) for query in queries], {}, index)
+        elif mode == "hybrid":
+            candidates = max(depth, HYBRID_CANDIDATES)
+            vector_hits = self.vector_search(query_embeddings, candidates, where, index)
+            fused = [
+                reciprocal_rank_fusion(
+                    [[doc_id for doc_id, _, _ in hits],
+                     [doc_id for doc_id, _ in self.bm25_search(query, candidates, allowed, index)]],
+                    [HYBRID_VECTOR_WEIGHT, HYBRID_BM25_WEIGHT],
+                    with_scores=True,
+                )[:depth]
+                for query, hits in zip(queries, vector_hits)
+            ]
+            known = {doc_id: doc for hits in vector_hits for doc_id, doc, _ in hits}
+            rankings = self._resolve(fused, known, index)
+        else:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+
+        if rerank:
+            ranked_docs = self.reranker.rerank(
+                queries, [[(doc, score) for _, doc, score in ranked] for ranked in rankings], k
+            )
+        else:
+            ranked_docs = [[doc for _, doc, _ in ranked[:k]] for ranked in rankings]
+
+        return [
+            {"documents": self.expand_parents(docs, index), "query_embedding": query_embedding}
+            for docs, query_embedding in zip(ranked_docs, query_embeddings)
+        ]
+
+    def vector_search(self, query_embeddings, n: int, where: dict = None, index: Corpus = None):
+        """Top-n (chunk id, Document, similarity) per query vector among documents matching `where`, in a single lookup"""
+        metrics.incr("vector_searches")
+        with metrics.timer("search_duration_seconds", key="vector_search", backend="vector"):
+            return (index or self.corpora.default).vectorstore.query(query_embeddings, n, where=where)
+
+    def bm25_search(self, query: str, n: int, allowed=None, index: Corpus = None):
+        with metrics.timer("search_duration_seconds", key="bm25_search", backend="bm25"):
+            return (index or self.corpora.default).bm25.search(query, n, allowed)
+
+    def _resolve(self, scored_lists, known: dict, index: Corpus = None):
+        """Turn ranked (id, score) lists into (id, Document, score) lists, fetching unknown ids in one call"""
+        missing = list(dict.fromkeys(doc_id for scored in scored_lists for doc_id, _ in scored if doc_id not in known))
+        known = {**known, **dict(self.fetch(missing, index))}
+        return [[(doc_id, known[doc_id], score) for doc_id, score in scored if doc_id in known] for scored in scored_lists]
+
+    def fetch(self, ids, index: Corpus = None):
+        """(chunk id, Document) pairs for ids, in the given order"""
+        if not ids:
+            return []
+        return (index or self.corpora.default).vectorstore.get(list(ids))
+
+    def expand_parents(self, docs, index: Corpus = None):
+        """Replace docstring hits with the code chunks they describe (one batched lookup)"""
+        parent_keys = list(dict.fromkeys(
+            doc.metadata["parent_key"] for doc in docs if doc.metadata.get("chunk_type") == "docstring"
+        ))
+        if not parent_keys:
+            return docs
+
+        metrics.incr("parent_lookups")
+        parents = {}
+        for parent in (index or self.corpora.default).vectorstore.get_by_metadata("chunk_key", parent_keys):
+            parents.setdefault(parent.metadata["chunk_key"], []).append(parent)
+
+        expanded, seen = [], set()
+        for doc in docs:
+            candidates = [doc]
+            if doc.metadata.get("chunk_type") == "docstring" and doc.metadata["parent_key"] in parents:
+                candidates = sorted(parents[doc.metadata["parent_key"]], key=lambda d: d.metadata.get("part", 0))
+            for candidate in candidates:
+                key = candidate.metadata.get("chunk_key")
+                identity = (key, candidate.metadata.get("part")) if key else candidate.page_content
+                if identity not in seen:
+                    seen.add(identity)
+                    expanded.append(candidate)
+        return expanded
+
+    async def _run_in_embedding_executor(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the caller's context so per-request timings follow the work
+        call = functools.partial(func, *args, **kwargs)
+        return await loop.run_in_executor(self.embedding_executor, contextvars.copy_context().run, call)
+
+    async def aembed_query(self, query: str):
+        return await self._run_in_embedding_executor(self.embed_query, query)
+
+    def retrieve(self, query: str):
+        """Documents for `query`; search() also returns the query vector for reuse"""
+        return self.search(query)["documents"]
+
+    async def aretrieve(self, query: str):
+        return (await self.asearch(query))["documents"]
+
+    async def asearch(self, query: str, rerank: bool = None, query_embedding=None, corpus: str = None,
+                      where: dict = None):
+        return await self._run_in_embedding_executor(self.search, query, rerank=rerank, query_embedding=query_embedding,
+                                                      corpus=corpus, where=where)
+
+    def build_chains(self):
+        from app.config import settings
+
+        # One pooled, rate-limited, retrying client with ordered model fallbacks
+        models = [settings.LLM_MODEL or DEFAULT_LLM_MODEL]
+        models += [m.strip() for m in settings.LLM_FALLBACK_MODELS.split(",") if m.strip()]
+        self.llm_client = create_llm_client(
+            OPENROUTER_BASE_URL,
+            OPENROUTER_API_KEY,
+            models,
+            temperature=settings.LLM_TEMPERATURE if settings.LLM_TEMPERATURE is not None else 0.2,
+            max_tokens=settings.LLM_MAX_TOKENS,
+            timeout=settings.LLM_TIMEOUT,
+            pool_connections=settings.LLM_POOL_CONNECTIONS,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            rate_limit=settings.LLM_RATE_LIMIT,
+            burst=settings.LLM_RATE_BURST,
+            max_retries=settings.LLM_MAX_RETRIES,
+            backoff_base=settings.LLM_BACKOFF_BASE,
+            backoff_max=settings.LLM_BACKOFF_MAX,
+        )
+        self.llm = self.llm_client.as_runnable()
+
+        # Retrieval runs once in the graph's retrieve node; the chains take
+        # {"context": str, "question": user_input}, where the context is
+        # assembled from the retrieved documents under a token budget.
+        self.context_builder = ContextBuilder(
+            token_budget=CONTEXT_TOKEN_BUDGET,
+            max_per_task=CONTEXT_MAX_PER_TASK,
+            overlap_threshold=CONTEXT_OVERLAP_THRESHOLD,
+        )
+        code_generation_prompt = ChatPromptTemplate.from_template(CODE_GENERATION_TEMPLATE)
+        explanation_prompt = ChatPromptTemplate.from_template(EXPLANATION_TEMPLATE)
+        self.code_rag_chain = code_generation_prompt | self.llm | StrOutputParser()
+        self.explain_rag_chain = explanation_prompt | self.llm | StrOutputParser()
+        self.summary_chain = ChatPromptTemplate.from_template(SUMMARY_TEMPLATE) | self.llm | StrOutputParser()
+
+        self.response_cache = create_semantic_cache(
+            SEMANTIC_CACHE,
+            threshold=SEMANTIC_CACHE_THRESHOLD,
+            ttl_seconds=SEMANTIC_CACHE_TTL,
+            max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+            path=SEMANTIC_CACHE_PATH,
+        )
+
+# ----------------------------------------
+# Shared instance
+# ----------------------------------------
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+def init_pipeline(persist_directory=PERSIST_DIR) -> RAGPipeline:
+    """Build the shared pipeline once (FastAPI lifespan / CLI entry); later calls reuse it"""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = RAGPipeline(persist_directory).build()
+        return _pipeline
+
+def get_pipeline() -> RAGPipeline:
+    """Pipeline used by the graph nodes, built on first use if nobody initialized it"""
+    return _pipeline if _pipeline is not None else init_pipeline()
+
+def set_pipeline(pipeline: RAGPipeline):
+    """Inject a prebuilt (or fake) pipeline"""
+    global _pipeline
+    with _pipeline_lock:
+        _pipeline = pipeline
+
+def setup_rag_pipeline(persist_directory=PERSIST_DIR):
+    """Setup the complete RAG pipeline with LangChain"""
+    pipeline = init_pipeline(persist_directory)
+    return pipeline.code_rag_chain, pipeline.explain_rag_chain, pipeline.retriever, pipeline.vectorstore
@@ -0,0 +1,91 @@
+"""
+Cross-encoder reranking.
+
+The first stage (vector, BM25 or hybrid) returns a deeper candidate list;
+a local CPU cross-encoder scores the (query, candidate) pairs in one
+batched forward pass and only the top k are kept. Candidate depth adapts
+to the first-stage score margin: only candidates scoring close to the
+k-th are sent to the model, and when the top k are already clearly
+ahead of the rest the query skips reranking entirely.
+"""
+from typing import List, Sequence
+import logging
+import threading
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+def candidate_depth(scores: Sequence[float], k: int, margin: float) -> int:
+    """
+    Number of leading candidates worth reranking: the top k plus every
+    candidate within `margin` (relative to the top score) of the k-th.
+    A depth of k means nothing is close enough to change the top k.
+    """
+    if len(scores) <= k:
+        return len(scores)
+    threshold = scores[k - 1] - margin * abs(scores[0])
+    depth = k
+    while depth < len(scores) and scores[depth] >= threshold:
+        depth += 1
+    return depth
+
+class CrossEncoderReranker:
+    """
+    Reranks candidate Documents with a sentence-transformers CrossEncoder.
+
+    The model is loaded on first use (or by `load()` at startup) and runs
+    on CPU. `margin` controls the adaptive depth: 0 never reranks,
+    float("inf") always reranks every candidate.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL_NAME, margin: float = 0.2, max_length: int = 512, model=None):
+        self.model_name = model_name
+        self.margin = margin
+        self.max_length = max_length
+        self._model = model
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                logger.info("Loading reranker %s", self.model_name)
+                self._model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+        return self._model
+
+    def rerank(self, queries: Sequence[str], candidate_lists, k: int) -> List[list]:
+        """
+        Top-k Documents per query. Each candidate list holds (Document,
+        first-stage score) pairs, best first. The pairs of every query that
+        needs reranking are scored together in a single predict call.
+        """
+        pairs, spans = [], []
+        for query, candidates in zip(queries, candidate_lists):
+            depth = candidate_depth([score for _, score in candidates], k, self.margin)
+            if depth <= k:
+                metrics.incr("rerank_skipped")
+                spans.append(None)
+                continue
+            spans.append((len(pairs), depth))
+            pairs.extend((query, doc.page_content) for doc, _ in candidates[:depth])
+
+        scores = []
+        if pairs:
+            metrics.incr("rerank_queries", sum(span is not None for span in spans))
+            metrics.incr("rerank_pairs", len(pairs))
+            with metrics.timer("rerank_duration_seconds", key="rerank"):
+                scores = self.load().predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+
+        results = []
+        for candidates, span in zip(candidate_lists, spans):
+            if span is None:
+                results.append([doc for doc, _ in candidates[:k]])
+                continue
+            start, depth = span
+            order = sorted(range(depth), key=lambda i: scores[start + i], reverse=True)[:k]
+            results.append([candidates[i][0] for i in order])
+        return results
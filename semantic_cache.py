@@ -0,0 +1,187 @@
+from collections import OrderedDict
+from typing import List, Optional
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+import numpy as np
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------
+# Backends
+# ----------------------------------------
+class InMemoryCacheBackend:
+    """Process-local entries kept in LRU order"""
+
+    def __init__(self):
+        self._entries = OrderedDict()  # key -> (intent, vector, response, created_at)
+        self._ids = itertools.count()
+
+    def entries(self, intent: str):
+        return [
+            (key, vector, response, created_at)
+            for key, (entry_intent, vector, response, created_at) in self._entries.items()
+            if entry_intent == intent
+        ]
+
+    def add(self, intent: str, vector: np.ndarray, response: str, now: float):
+        key = next(self._ids)
+        self._entries[key] = (intent, vector, response, now)
+        return key
+
+    def touch(self, key, now: float):
+        self._entries.move_to_end(key)
+
+    def delete(self, keys):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def evict(self, max_entries: int):
+        while len(self._entries) > max_entries:
+            self._entries.popitem(last=False)
+
+    def expire(self, cutoff: float):
+        self.delete([key for key, entry in self._entries.items() if entry[3] < cutoff])
+
+    def size(self) -> int:
+        return len(self._entries)
+
+class SQLiteCacheBackend:
+    """On-disk entries that survive restarts and can be shared by workers"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS semantic_cache (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                intent TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS semantic_cache_intent ON semantic_cache(intent)")
+        self._conn.commit()
+
+    def entries(self, intent: str):
+        rows = self._conn.execute(
+            "SELECT id, vector, response, created_at FROM semantic_cache WHERE intent = ?", (intent,)
+        ).fetchall()
+        return [
+            (key, np.frombuffer(blob, dtype=np.float32), response, created_at)
+            for key, blob, response, created_at in rows
+        ]
+
+    def add(self, intent: str, vector: np.ndarray, response: str, now: float):
+        cursor = self._conn.execute(
+            "INSERT INTO semantic_cache (intent, vector, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+            (intent, vector.astype(np.float32).tobytes(), response, now, now),
+        )
+        self._conn.commit()
+        return cursor.lastrowid
+
+    def touch(self, key, now: float):
+        self._conn.execute("UPDATE semantic_cache SET last_access = ? WHERE id = ?", (now, key))
+        self._conn.commit()
+
+    def delete(self, keys):
+        self._conn.executemany("DELETE FROM semantic_cache WHERE id = ?", [(key,) for key in keys])
+        self._conn.commit()
+
+    def evict(self, max_entries: int):
+        self._conn.execute("""
+            DELETE FROM semantic_cache WHERE id IN (
+                SELECT id FROM semantic_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        """, (max_entries,))
+        self._conn.commit()
+
+    def expire(self, cutoff: float):
+        self._conn.execute("DELETE FROM semantic_cache WHERE created_at < ?", (cutoff,))
+        self._conn.commit()
+
+    def size(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM semantic_cache").fetchone()[0]
+
+# ----------------------------------------
+# Semantic cache
+# ----------------------------------------
+class SemanticCache:
+    """
+    Response cache keyed on (query embedding, intent).
+
+    A lookup hits when a stored entry with the same intent has cosine
+    similarity >= `threshold` and is younger than `ttl_seconds`. The cache
+    holds at most `max_entries`, evicting the least recently used.
+    """
+
+    def __init__(self, backend, threshold: float = 0.95, ttl_seconds: float = 3600.0, max_entries: int = 1000):
+        self.backend = backend
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector: List[float], intent: str) -> Optional[str]:
+        """Return a cached response for a near-identical query, or None"""
+        query = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            self.backend.expire(now - self.ttl_seconds)
+            entries = self.backend.entries(intent)
+            if entries:
+                matrix = np.stack([entry[1] for entry in entries])
+                scores = matrix @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key, _, response, _ = entries[best]
+                    self.backend.touch(key, now)
+                    self.hits += 1
+                    metrics.incr("semantic_cache_hits")
+                    return response
+            self.misses += 1
+            metrics.incr("semantic_cache_misses")
+            return None
+
+    def store(self, vector: List[float], intent: str, response: str):
+        """Cache a fresh LLM response"""
+        with self._lock:
+            self.backend.add(intent, self._normalize(vector), response, time.time())
+            self.backend.evict(self.max_entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": self.backend.size(),
+            }
+
+def create_semantic_cache(backend: str, threshold: float, ttl_seconds: float, max_entries: int,
+                          path: str = "./semantic_cache.sqlite3") -> Optional[SemanticCache]:
+    """Build a cache for backend "memory" or "sqlite"; "off" disables caching"""
+    if backend == "off":
+        return None
+    if backend == "memory":
+        store = InMemoryCacheBackend()
+    elif backend == "sqlite":
+        store = SQLiteCacheBackend(path)
+    else:
+        raise ValueError(f"Unknown semantic cache backend: {backend}")
+    logger.info("✓ Semantic cache enabled (%s, threshold=%s)", backend, threshold)
+    return SemanticCache(store, threshold=threshold, ttl_seconds=ttl_seconds, max_entries=max_entries)
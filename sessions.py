@@ -0,0 +1,75 @@
+"""
+Session-scoped conversations.
+
+A session is a LangGraph thread: the graph is compiled with a checkpointer
+and each turn runs with `{"configurable": {"thread_id": session_id}}`, so
+`messages` and `summary` carry over between turns. The memory node keeps
+the history bounded, so per-turn cost does not grow with session length.
+
+SESSION_BACKEND selects "sqlite" (default, file at SESSION_DB) or
+"memory" (process-local, for tests and benchmarks).
+"""
+from contextlib import asynccontextmanager
+import os
+import sqlite3
+import threading
+
+from graph import build_blueprint_graph
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+SESSION_DB = os.getenv("SESSION_DB", "./sessions.sqlite3")
+
+_session_graphs = {}  # (backend, path) -> compiled graph
+_session_graph_lock = threading.Lock()
+
+def session_config(session_id: str) -> dict:
+    return {"configurable": {"thread_id": session_id}}
+
+def turn_input(user_input: str, intent: str = "", rerank: bool = None, corpus: str = None,
+               where: dict = None) -> dict:
+    """
+    State for one turn. `messages` and `summary` are left out so they come
+    from the checkpoint; everything else is per-turn and reset here.
+    """
+    return {
+        "user_input": user_input,
+        "intent": intent,
+        "documents": None,
+        "query_embedding": [],
+        "rerank": rerank,
+        "corpus": corpus,
+        "filter": where,
+        "retrieved_context": [],
+        "llm_response": ""
+    }
+
+def _memory_saver():
+    from langgraph.checkpoint.memory import MemorySaver
+    return MemorySaver()
+
+def get_session_graph(backend: str = SESSION_BACKEND, path: str = SESSION_DB):
+    """Graph with a synchronous checkpointer, for graph.invoke / graph.stream (CLI, threads)"""
+    with _session_graph_lock:
+        session_graph = _session_graphs.get((backend, path))
+        if session_graph is None:
+            if backend == "memory":
+                checkpointer = _memory_saver()
+            elif backend == "sqlite":
+                from langgraph.checkpoint.sqlite import SqliteSaver
+                checkpointer = SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+            else:
+                raise ValueError(f"Unknown session backend: {backend}")
+            session_graph = _session_graphs[(backend, path)] = build_blueprint_graph(checkpointer=checkpointer)
+        return session_graph
+
+@asynccontextmanager
+async def open_async_session_graph(backend: str = SESSION_BACKEND, path: str = SESSION_DB):
+    """Graph with an async checkpointer for graph.ainvoke / astream; held open for the app's lifetime"""
+    if backend == "memory":
+        yield build_blueprint_graph(checkpointer=_memory_saver())
+    elif backend == "sqlite":
+        from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        async with AsyncSqliteSaver.from_conn_string(path) as checkpointer:
+            yield build_blueprint_graph(checkpointer=checkpointer)
+    else:
+        raise ValueError(f"Unknown session backend: {backend}")
@@ -0,0 +1,117 @@
+from contextlib import contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable
+import asyncio
+import re
+import metrics
+
+# ----------------------------------------
+# Request coalescing (single flight)
+# ----------------------------------------
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used in coalescing keys"""
+    return _WHITESPACE.sub(" ", query).strip().lower()
+
+class _Broadcast:
+    """Items of one async iterator, replayed from the start to every subscriber"""
+
+    def __init__(self):
+        self.items = []
+        self.finished = False
+        self.task = None  # the pump, set by SingleFlight
+        self._updated = asyncio.Event()
+
+    def _notify(self):
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def pump(self, iterator: AsyncIterator):
+        try:
+            async for item in iterator:
+                self.items.append(item)
+                self._notify()
+        finally:
+            self.finished = True
+            self._notify()
+
+    async def subscribe(self) -> AsyncIterator:
+        position = 0
+        while True:
+            while position < len(self.items):
+                yield self.items[position]
+                position += 1
+            if self.finished:
+                return
+            await self._updated.wait()
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one execution.
+
+    `run` awaits a coroutine once per key and hands its result (or
+    exception) to every caller that arrived while it was in flight.
+    `stream` does the same for async iterators: every subscriber receives
+    all items, including those produced before it joined. The shared work
+    runs in its own task, so a caller that disconnects or gives up does
+    not cancel it for the others; it is cancelled once every caller has
+    left. Keys are forgotten as soon as the execution finishes; later
+    calls start a new one.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self._callers: Dict[asyncio.Task, int] = {}  # execution -> callers still waiting on it
+
+    def _start(self, registry: dict, key: Hashable, awaitable: Awaitable, entry=None) -> asyncio.Task:
+        """Run `awaitable` in its own task; `entry` (default: the task) stays under `key` until it finishes"""
+        task = asyncio.ensure_future(awaitable)
+        entry = task if entry is None else entry
+        registry[key] = entry
+
+        def forget(done: asyncio.Task):
+            if registry.get(key) is entry:
+                del registry[key]
+            if not done.cancelled():
+                done.exception()  # retrieved here, so an error nobody awaited is not logged as lost
+
+        task.add_done_callback(forget)
+        metrics.incr("singleflight_executions", flight=self.name)
+        return task
+
+    @contextmanager
+    def _caller(self, task: asyncio.Task):
+        """Count the caller in for the block; the last one out cancels an unfinished execution"""
+        self._callers[task] = self._callers.get(task, 0) + 1
+        try:
+            yield
+        finally:
+            self._callers[task] -= 1
+            if not self._callers[task]:
+                del self._callers[task]
+                if not task.done():
+                    task.cancel()
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable]):
+        """Result of `func()`, shared with identical calls already in flight"""
+        task = self._calls.get(key)
+        if task is None:
+            task = self._start(self._calls, key, func())
+        else:
+            metrics.incr("singleflight_coalesced", flight=self.name)
+        with self._caller(task):
+            return await asyncio.shield(task)
+
+    async def stream(self, key: Hashable, func: Callable[[], AsyncIterator]) -> AsyncIterator:
+        """Items of `func()`, shared with identical streams already in flight"""
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            broadcast.task = self._start(self._streams, key, broadcast.pump(func()), entry=broadcast)
+        else:
+            metrics.incr("singleflight_coalesced", flight=self.name)
+        with self._caller(broadcast.task):
+            async for item in broadcast.subscribe():
+                yield item
@@ -1,9 +1,16 @@
-from typing import TypedDict, List, Annotated
-import operator
+from typing import TypedDict, List, Annotated, Optional
+from langchain_core.documents import Document
+from langgraph.graph.message import add_messages
 
 class AssistantState(TypedDict):
-    messages: Annotated[List, operator.add] # List of chat messages
+    messages: Annotated[List, add_messages] # Chat history (merged by message id; bounded per session)
+    summary: str # Running summary of turns trimmed from `messages`
     user_input: str # Raw user input
     intent: str  # "generate_code" or "explain_code"
+    documents: Optional[List[Document]] # Documents retrieved once per request (None = not retrieved yet)
+    query_embedding: List[float] # Query vector computed for retrieval
+    rerank: Optional[bool] # Cross-encoder rerank for this request (None = pipeline default)
+    corpus: Optional[str] # Named corpus to retrieve from (None = HumanEval)
+    filter: Optional[dict] # Metadata filter applied inside retrieval (None = no filter)
     retrieved_context: List[dict] # List of context snippets
-    llm_response: str  # Response from the language model
\ No newline at end of file
+    llm_response: str  # Response from the language model
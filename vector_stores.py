@@ -0,0 +1,639 @@
+"""
+Vector store backends behind one small interface.
+
+- "chroma": langchain_community's Chroma (the original backend)
+- "numpy":  in-process engine; a contiguous float32 matrix memory-mapped
+            from disk, brute-force top-k with one matrix product
+- "hnsw":   the numpy engine plus an hnswlib graph index for large corpora
+            (falls back to brute force when hnswlib is not installed)
+
+Ingestion writes through upsert/delete/persist; retrieval reads through
+query/get/get_by_metadata. A metadata filter (`where`) is applied inside
+the search, before the top-n cut, so a selective filter still returns n
+matching results.
+"""
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("chroma", "numpy", "hnsw")
+PERSIST_CHUNK_ROWS = 65536  # rows copied per step when vectors.npy is rewritten
+FILTER_BRUTE_FORCE_ROWS = 20000  # hnsw: filters matching fewer rows are scored exactly
+FILTER_CACHE_SIZE = 64  # numpy: row sets of recent filters, dropped on any write
+FILTER_FULL_SCAN_FRACTION = 0.25  # numpy: broader filters score every row and mask, cheaper than gathering rows
+METADATA_KEY_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+SCALAR_TYPES = (str, int, float, bool)
+
+class CorruptVectorStore(Exception):
+    """The store's files exist but cannot be read back; rebuilding it is the only way forward"""
+
+def _is_corrupt_database(error: Exception) -> bool:
+    # OperationalError ("database is locked", missing permissions) is transient, not corruption
+    return isinstance(error, sqlite3.DatabaseError) and not isinstance(error, sqlite3.OperationalError)
+
+def normalize_where(where: Optional[dict]) -> Optional[Dict[str, list]]:
+    """
+    Validate a metadata filter and bring it to {key: [allowed values]}.
+    `where` maps metadata keys to a value or a list of values; a document
+    matches when every key has one of its values. None or {} is no filter.
+    """
+    if not where:
+        return None
+    normalized = {}
+    for key, value in sorted(where.items()):
+        if not isinstance(key, str) or not METADATA_KEY_RE.match(key):
+            raise ValueError(f"Invalid metadata key: {key!r}")
+        values = list(value) if isinstance(value, (list, tuple)) else [value]
+        if not values or not all(isinstance(v, SCALAR_TYPES) for v in values):
+            raise ValueError(f"Filter values for {key!r} must be strings, numbers or booleans")
+        normalized[key] = values
+    return normalized
+
+class VectorStore:
+    """Interface shared by all backends"""
+
+    def upsert(self, ids: Sequence[str], vectors, documents: Sequence[str], metadatas: Sequence[dict]):
+        raise NotImplementedError
+
+    def delete(self, ids: Sequence[str]):
+        raise NotImplementedError
+
+    def query(self, query_embeddings, n: int, where: Optional[dict] = None) -> List[List[Tuple[str, Document, float]]]:
+        """Top-n (id, Document, cosine similarity) for each query vector, best first, among documents matching `where`"""
+        raise NotImplementedError
+
+    def ids_where(self, where: dict) -> frozenset:
+        """Ids of the documents matching the metadata filter `where`"""
+        raise NotImplementedError
+
+    def get(self, ids: Sequence[str]) -> List[Tuple[str, Document]]:
+        """(id, Document) pairs for the ids that exist, in the given order"""
+        raise NotImplementedError
+
+    def get_by_metadata(self, key: str, values: Sequence) -> List[Document]:
+        """Documents whose metadata[key] is one of `values`"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def persist(self):
+        """Flush pending writes to disk"""
+
+    def after_fork(self):
+        """Re-open process-bound handles in a forked worker, which only reads from here on"""
+
+    def close(self):
+        """Release file handles and mapped memory; the store is unusable afterwards"""
+
+# ----------------------------------------
+# Chroma
+# ----------------------------------------
+def _chroma_where(where: Optional[dict]) -> Optional[dict]:
+    where = normalize_where(where)
+    if where is None:
+        return None
+    clauses = [{key: {"$in": values}} for key, values in where.items()]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+class ChromaVectorStore(VectorStore):
+    DEFAULT_COLLECTION = "langchain"  # langchain_community's default name
+
+    def __init__(self, persist_directory: str, embedding_model, collection_name: str = DEFAULT_COLLECTION):
+        self.persist_directory = persist_directory
+        self.embedding_model = embedding_model
+        self.collection_name = collection_name
+        self._open()
+
+    def _open(self):
+        from langchain_community.vectorstores import Chroma
+
+        try:
+            self.chroma = Chroma(collection_name=self.collection_name, persist_directory=self.persist_directory,
+                                 embedding_function=self.embedding_model)
+            # Touch the collection so a corrupt store fails here, not on first query
+            self.chroma._collection.count()
+        except sqlite3.DatabaseError as e:
+            if _is_corrupt_database(e):
+                raise CorruptVectorStore(f"{self.persist_directory}: {e}") from e
+            raise
+
+    def upsert(self, ids, vectors, documents, metadatas):
+        self.chroma._collection.upsert(
+            ids=list(ids),
+            embeddings=[np.asarray(v, dtype=np.float32).tolist() for v in vectors],
+            metadatas=list(metadatas),
+            documents=list(documents),
+        )
+
+    def delete(self, ids):
+        self.chroma.delete(ids=list(ids))
+
+    def query(self, query_embeddings, n, where=None):
+        result = self.chroma._collection.query(
+            query_embeddings=[np.asarray(q, dtype=np.float32).tolist() for q in query_embeddings],
+            n_results=n,
+            where=_chroma_where(where),
+            include=["documents", "metadatas", "distances"],
+        )
+        # Chroma's default space is squared L2; on unit vectors that is 2 - 2 * cosine
+        return [
+            [
+                (doc_id, Document(page_content=content, metadata=metadata or {}), 1.0 - distance / 2.0)
+                for doc_id, content, metadata, distance in zip(ids, documents, metadatas, distances)
+            ]
+            for ids, documents, metadatas, distances in zip(
+                result["ids"], result["documents"], result["metadatas"], result["distances"]
+            )
+        ]
+
+    def get(self, ids):
+        if not ids:
+            return []
+        found = self.chroma.get(ids=list(ids))
+        by_id = {
+            doc_id: Document(page_content=content, metadata=metadata or {})
+            for doc_id, content, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        return [(doc_id, by_id[doc_id]) for doc_id in ids if doc_id in by_id]
+
+    def get_by_metadata(self, key, values):
+        found = self.chroma.get(where={key: {"$in": list(values)}})
+        return [
+            Document(page_content=content, metadata=metadata or {})
+            for content, metadata in zip(found["documents"], found["metadatas"])
+        ]
+
+    def ids_where(self, where):
+        return frozenset(self.chroma.get(where=_chroma_where(where), include=[])["ids"])
+
+    def count(self):
+        return self.chroma._collection.count()
+
+    def after_fork(self):
+        # Chroma caches one client per path, and its SQLite handle must not cross a fork
+        from chromadb.api.client import SharedSystemClient
+
+        SharedSystemClient.clear_system_cache()
+        self._open()
+
+    def close(self):
+        # The client is shared per path by chromadb; dropping our handle is all that is safe here
+        self.chroma = None
+
+# ----------------------------------------
+# NumPy / HNSW
+# ----------------------------------------
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+class NumpyVectorStore(VectorStore):
+    """
+    Cosine-similarity store with no service and no required dependency.
+
+    Files in `directory`:
+      vectors.npy      N x D float32, L2-normalized, opened read-only via mmap
+      records.sqlite3  id -> (row, document, metadata); only result rows are read
+      hnsw.bin         optional hnswlib index over the rows (index="hnsw")
+
+    Writes are buffered in memory and folded into a new matrix by
+    `persist()`, which also compacts deleted rows and rebuilds the HNSW graph.
+    Each persist bumps a generation number (SQLite `user_version`) in the
+    same transaction that renumbers the rows; a store open in another
+    process sees the change on its next search and reopens the matrix.
+    With `read_only` (serving processes, named corpora) nothing is written:
+    no schema or metadata indexes, no cleanup, no HNSW file.
+
+    A metadata filter selects its rows in SQLite first (cached per filter,
+    through an expression index created for each key on its first use).
+    Only those rows are scored; with HNSW, filters matching many rows
+    search the graph restricted to them instead.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    RECORDS_FILE = "records.sqlite3"
+    HNSW_FILE = "hnsw.bin"
+
+    def __init__(self, directory: str, index: str = "flat", hnsw_m: int = 16,
+                 hnsw_ef_construction: int = 200, hnsw_ef_search: int = 64, read_only: bool = False):
+        self.directory = directory
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef_search = hnsw_ef_search
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self.read_only = read_only
+
+        try:
+            self._open_files(directory)
+        except (sqlite3.DatabaseError, ValueError) as e:
+            # A locked database is not corrupt; an unreadable records file or matrix is
+            if isinstance(e, sqlite3.DatabaseError) and not _is_corrupt_database(e):
+                raise
+            raise CorruptVectorStore(f"{directory}: {e}") from e
+        self._pending: List[np.ndarray] = []   # appended row blocks not yet in the matrix
+        self._overrides: Dict[int, np.ndarray] = {}  # rewritten rows of the matrix
+        self._dead = set()                      # deleted rows, dropped at persist
+        self._filter_cache = OrderedDict()      # filter -> (rows, ids) matching it
+        self._indexed_keys = {"chunk_key"}      # metadata keys with an expression index
+        self._rows = len(self._matrix) if self._matrix is not None else 0
+        self._generation = self._stored_generation()
+        if not read_only:
+            # Records written by a run that never reached persist() have no vector
+            self._conn.execute("DELETE FROM records WHERE row >= ?", (self._rows,))
+            self._conn.commit()
+
+        # None: brute force; False: HNSW wanted but not built yet (empty store)
+        self._hnsw = None
+        if index == "hnsw":
+            self._hnsw = self._load_hnsw()
+
+    def _connect_read_only(self) -> sqlite3.Connection:
+        from urllib.request import pathname2url
+
+        path = os.path.abspath(os.path.join(self.directory, self.RECORDS_FILE))
+        return sqlite3.connect(f"file:{pathname2url(path)}?mode=ro", uri=True, check_same_thread=False)
+
+    def _open_files(self, directory: str):
+        if self.read_only:
+            self._conn = self._connect_read_only()
+        else:
+            self._create_schema(directory)
+
+        vectors_path = os.path.join(directory, self.VECTORS_FILE)
+        self._matrix = np.load(vectors_path, mmap_mode="r") if os.path.exists(vectors_path) else None
+        if self._matrix is not None and (self._matrix.ndim != 2 or self._matrix.dtype != np.float32):
+            raise ValueError(f"{self.VECTORS_FILE} holds a {self._matrix.dtype} array of shape {self._matrix.shape}")
+
+    def _create_schema(self, directory: str):
+        self._conn = sqlite3.connect(os.path.join(directory, self.RECORDS_FILE), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                id TEXT PRIMARY KEY,
+                row INTEGER NOT NULL,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS records_row ON records(row)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS records_chunk_key ON records(json_extract(metadata, '$.chunk_key'))")
+        self._conn.commit()
+
+    def after_fork(self):
+        """
+        A forked worker gets its own SQLite connection, opened read-only.
+        The memory-mapped matrix and the HNSW graph stay shared with the
+        parent, copy-on-write.
+        """
+        self._lock = threading.RLock()
+        self._inherited_conn = self._conn  # never used or closed here: it belongs to the parent
+        self._conn = self._connect_read_only()
+        self.read_only = True
+
+    def _stored_generation(self) -> int:
+        return self._conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def _check_generation(self):
+        """Reopen the matrix and HNSW graph once another process has persisted (and maybe renumbered) the store"""
+        generation = self._stored_generation()
+        if generation == self._generation or self._dirty():
+            return
+        self._filter_cache.clear()
+        vectors_path = os.path.join(self.directory, self.VECTORS_FILE)
+        self._matrix = np.load(vectors_path, mmap_mode="r") if os.path.exists(vectors_path) else None
+        self._rows = len(self._matrix) if self._matrix is not None else 0
+        if self._hnsw is not None:
+            self._hnsw = self._load_hnsw()
+        self._generation = generation
+        logger.info("🔄 %s was persisted by another process; reopened generation %d", self.directory, generation)
+
+    # ---------- writes ----------
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError(f"{self.directory} is open read-only in this process")
+
+    def upsert(self, ids, vectors, documents, metadatas):
+        self._check_writable()
+        vectors = _normalize(vectors)
+        with self._lock:
+            self._filter_cache.clear()
+            existing = dict(self._conn.execute(
+                f"SELECT id, row FROM records WHERE id IN ({','.join('?' * len(ids))})", list(ids)
+            ).fetchall()) if ids else {}
+            new_rows = []
+            records = []
+            for doc_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+                row = existing.get(doc_id)
+                if row is None:
+                    row = self._rows
+                    self._rows += 1
+                    new_rows.append(vector)
+                else:
+                    self._overrides[row] = vector
+                records.append((doc_id, row, document, json.dumps(metadata, default=str)))
+            if new_rows:
+                self._pending.append(np.stack(new_rows))
+            self._conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)", records)
+            self._conn.commit()
+
+    def delete(self, ids):
+        self._check_writable()
+        if not ids:
+            return
+        with self._lock:
+            self._filter_cache.clear()
+            placeholders = ",".join("?" * len(ids))
+            rows = [row for (row,) in self._conn.execute(
+                f"SELECT row FROM records WHERE id IN ({placeholders})", list(ids)
+            )]
+            self._dead.update(rows)
+            self._conn.execute(f"DELETE FROM records WHERE id IN ({placeholders})", list(ids))
+            self._conn.commit()
+
+    def _dirty(self) -> bool:
+        return bool(self._pending or self._overrides or self._dead)
+
+    def _full_matrix(self) -> np.ndarray:
+        """Matrix including pending writes (in memory)"""
+        blocks = ([np.asarray(self._matrix)] if self._matrix is not None else []) + self._pending
+        if not blocks:
+            return np.zeros((0, 0), dtype=np.float32)
+        matrix = np.concatenate(blocks) if len(blocks) > 1 else blocks[0]
+        if self._overrides and not matrix.flags.writeable:
+            matrix = np.array(matrix)
+        for row, vector in self._overrides.items():
+            matrix[row] = vector
+        return matrix
+
+    def _write_matrix(self, path: str, alive: np.ndarray) -> np.ndarray:
+        """Stream the live rows (matrix + pending, overrides applied) into a new .npy; returns old row -> new row"""
+        blocks = ([self._matrix] if self._matrix is not None else []) + self._pending
+        new_index = np.cumsum(alive) - 1
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(int(alive.sum()), blocks[0].shape[1]))
+        offset = written = 0
+        for block in blocks:
+            for start in range(0, len(block), PERSIST_CHUNK_ROWS):
+                chunk = block[start:start + PERSIST_CHUNK_ROWS]
+                keep = alive[offset + start:offset + start + len(chunk)]
+                count = int(keep.sum())
+                out[written:written + count] = chunk[keep]
+                written += count
+            offset += len(block)
+        for row, vector in self._overrides.items():
+            if alive[row]:
+                out[new_index[row]] = vector
+        out.flush()
+        del out
+        return new_index
+
+    def persist(self):
+        with self._lock:
+            if not self._dirty():
+                return
+            self._filter_cache.clear()  # compaction renumbers the rows
+            alive = np.ones(self._rows, dtype=bool)
+            if self._dead:
+                alive[list(self._dead)] = False
+
+            # Rows are copied in chunks, so peak memory does not double with the index size
+            path = os.path.join(self.directory, self.VECTORS_FILE)
+            tmp_path = path + ".tmp.npy"
+            new_index = self._write_matrix(tmp_path, alive)
+            self._matrix = None
+            os.replace(tmp_path, path)
+            self._matrix = np.load(path, mmap_mode="r")
+            if self._hnsw is not None:
+                # An empty store has nothing to index; it is built again on the next persist with rows
+                self._hnsw = self._build_hnsw() if len(self._matrix) else self._drop_hnsw()
+            # Other processes keep their open matrix until the new row numbers and generation are committed together
+            self._generation = self._stored_generation() + 1
+            if self._dead:
+                remap = [(int(new_index[row]), doc_id) for doc_id, row in self._conn.execute("SELECT id, row FROM records")]
+                self._conn.executemany("UPDATE records SET row = ? WHERE id = ?", remap)
+            self._conn.execute(f"PRAGMA user_version = {self._generation}")
+            self._conn.commit()
+            self._pending, self._overrides, self._dead = [], {}, set()
+            self._rows = len(self._matrix)
+
+    # ---------- HNSW ----------
+    def _load_hnsw(self):
+        try:
+            import hnswlib
+        except ImportError:
+            logger.warning("⚠️ hnswlib is not installed; using brute-force search")
+            return None
+        path = os.path.join(self.directory, self.HNSW_FILE)
+        if self._matrix is None or not len(self._matrix):
+            return False  # built on first persist
+        if not os.path.exists(path):
+            return self._build_hnsw()
+        index = hnswlib.Index(space="ip", dim=self._matrix.shape[1])
+        try:
+            index.load_index(path, max_elements=len(self._matrix))
+        except RuntimeError as e:
+            # The graph is derived from the matrix, so an unreadable one is rebuilt, not the store
+            logger.warning("⚠️ Unreadable %s (%s); rebuilding the HNSW graph", path, e)
+            return self._build_hnsw()
+        index.set_ef(self.hnsw_ef_search)
+        return index
+
+    def _build_hnsw(self):
+        import hnswlib
+
+        index = hnswlib.Index(space="ip", dim=self._matrix.shape[1])
+        index.init_index(max_elements=len(self._matrix), ef_construction=self.hnsw_ef_construction, M=self.hnsw_m)
+        index.add_items(np.asarray(self._matrix), np.arange(len(self._matrix)))
+        index.set_ef(self.hnsw_ef_search)
+        if not self.read_only:
+            path = os.path.join(self.directory, self.HNSW_FILE)
+            index.save_index(path + ".tmp")
+            os.replace(path + ".tmp", path)
+        return index
+
+    def _drop_hnsw(self) -> bool:
+        path = os.path.join(self.directory, self.HNSW_FILE)
+        if os.path.exists(path):
+            os.remove(path)
+        return False
+
+    # ---------- reads ----------
+    def _index_key(self, key: str):
+        """Index json_extract(metadata, key) so filters on it are lookups, not table scans"""
+        if key in self._indexed_keys or self.read_only:
+            return
+        try:
+            # `key` matched METADATA_KEY_RE, so it is safe to splice into SQL
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS records_meta_{key} ON records(json_extract(metadata, '$.{key}'))"
+            )
+            self._conn.commit()
+        except sqlite3.OperationalError as e:
+            # e.g. an ingestion run holds the write lock; retried on the next filter
+            logger.warning("⚠️ Could not index metadata key %s: %s", key, e)
+            return
+        self._indexed_keys.add(key)
+
+    def _matching(self, where: Dict[str, list]) -> Tuple[np.ndarray, frozenset]:
+        """(sorted rows, ids) of the records matching a normalized filter"""
+        key = json.dumps(where, sort_keys=True)
+        cached = self._filter_cache.get(key)
+        if cached is not None:
+            self._filter_cache.move_to_end(key)
+            return cached
+        clauses, params = [], []
+        for field, values in where.items():
+            self._index_key(field)
+            clauses.append(f"json_extract(metadata, '$.{field}') IN ({','.join('?' * len(values))})")
+            params.extend(values)
+        found = self._conn.execute(
+            f"SELECT row, id FROM records WHERE {' AND '.join(clauses)} ORDER BY row", params
+        ).fetchall()
+        cached = (np.array([row for row, _ in found], dtype=np.int64), frozenset(doc_id for _, doc_id in found))
+        self._filter_cache[key] = cached
+        if len(self._filter_cache) > FILTER_CACHE_SIZE:
+            self._filter_cache.popitem(last=False)
+        return cached
+
+    @staticmethod
+    def _rank(scores: np.ndarray, n: int, labels: Optional[np.ndarray] = None) -> List[List[Tuple[int, float]]]:
+        """Top-n (label, score) per column of an N x B score matrix; labels default to the row numbers"""
+        if n <= 0:
+            return [[] for _ in range(scores.shape[1])]
+        top = np.argpartition(-scores, n - 1, axis=0)[:n]
+        labels = np.arange(len(scores)) if labels is None else labels
+        return [
+            [(int(labels[row]), float(scores[row, i])) for row in top[:, i][np.argsort(-scores[top[:, i], i])]]
+            for i in range(scores.shape[1])
+        ]
+
+    def _hnsw_rows(self, queries: np.ndarray, n: int, allowed=None) -> List[List[Tuple[int, float]]]:
+        self._hnsw.set_ef(max(self.hnsw_ef_search, n))
+        if allowed is None:
+            labels, distances = self._hnsw.knn_query(queries, k=n)
+        else:
+            labels, distances = self._hnsw.knn_query(queries, k=n, filter=allowed.__contains__)
+        # "ip" space distance is 1 - inner product
+        return [
+            [(int(row), 1.0 - float(distance)) for row, distance in zip(row_labels, row_distances)]
+            for row_labels, row_distances in zip(labels, distances)
+        ]
+
+    def _top_rows(self, queries: np.ndarray, n: int, rows: Optional[np.ndarray] = None) -> List[List[Tuple[int, float]]]:
+        """Top-n rows per query; `rows` restricts the search to those (live) rows"""
+        if rows is not None:
+            n = min(n, len(rows))
+            if n == 0:
+                return [[] for _ in queries]
+            if self._hnsw and not self._dirty() and len(rows) > FILTER_BRUTE_FORCE_ROWS:
+                return self._hnsw_rows(queries, n, allowed=set(rows.tolist()))
+            matrix = self._full_matrix() if self._dirty() else self._matrix
+            if len(rows) > FILTER_FULL_SCAN_FRACTION * len(matrix):
+                scores = matrix @ queries.T
+                excluded = np.ones(len(matrix), dtype=bool)
+                excluded[rows] = False
+                scores[excluded] = -np.inf
+                return self._rank(scores, n)
+            # Only the matching rows are read and scored
+            return self._rank(matrix[rows] @ queries.T, n, labels=rows)
+
+        if self._hnsw and not self._dirty():
+            n = min(n, len(self._matrix))
+            if n == 0:
+                return [[] for _ in queries]
+            return self._hnsw_rows(queries, n)
+
+        matrix = self._full_matrix() if self._dirty() else self._matrix
+        if matrix is None or not len(matrix):
+            return [[] for _ in queries]
+        scores = matrix @ queries.T  # N x B, one pass over the matrix for the whole batch
+        if self._dead:
+            scores[list(self._dead)] = -np.inf
+        return self._rank(scores, min(n, len(matrix) - len(self._dead)))
+
+    def _records(self, column: str, values) -> Dict:
+        values = list(values)
+        if not values:
+            return {}
+        rows = self._conn.execute(
+            f"SELECT {column}, id, document, metadata FROM records WHERE {column} IN ({','.join('?' * len(values))})",
+            values,
+        ).fetchall()
+        return {key: (doc_id, Document(page_content=document, metadata=json.loads(metadata)))
+                for key, doc_id, document, metadata in rows}
+
+    def query(self, query_embeddings, n, where=None):
+        queries = _normalize(query_embeddings)
+        where = normalize_where(where)
+        with self._lock:
+            self._check_generation()
+            rows = self._matching(where)[0] if where else None
+            top_rows = self._top_rows(queries, n, rows)
+            records = self._records("row", {row for rows in top_rows for row, _ in rows})
+        return [[(*records[row], score) for row, score in rows if row in records] for rows in top_rows]
+
+    def get(self, ids):
+        with self._lock:
+            records = self._records("id", dict.fromkeys(ids))
+        return [records[doc_id] for doc_id in ids if doc_id in records]
+
+    def get_by_metadata(self, key, values):
+        values = list(values)
+        if not values:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT document, metadata FROM records WHERE json_extract(metadata, '$.{key}') "
+                f"IN ({','.join('?' * len(values))}) ORDER BY row",
+                values,
+            ).fetchall()
+        return [Document(page_content=document, metadata=json.loads(metadata)) for document, metadata in rows]
+
+    def ids_where(self, where):
+        where = normalize_where(where)
+        if where is None:
+            raise ValueError("ids_where needs a filter")
+        with self._lock:
+            self._check_generation()
+            return self._matching(where)[1]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+            self._matrix = None
+            self._hnsw = None
+            self._filter_cache.clear()
+
+def open_vector_store(backend: str, persist_directory: str, embedding_model=None,
+                      collection_name: str = ChromaVectorStore.DEFAULT_COLLECTION, read_only: bool = False) -> VectorStore:
+    """
+    Open (or create) the store for `backend` in `persist_directory`;
+    `collection_name` names the Chroma collection. `read_only` opens an
+    existing numpy/hnsw store for serving: no schema changes, no cleanup,
+    no files written. Chroma has no read-only mode and ignores it.
+    """
+    if backend == "chroma":
+        return ChromaVectorStore(persist_directory, embedding_model, collection_name)
+    if backend == "numpy":
+        return NumpyVectorStore(persist_directory, read_only=read_only)
+    if backend == "hnsw":
+        return NumpyVectorStore(persist_directory, index="hnsw", read_only=read_only)
+    raise ValueError(f"Unknown vector store backend: {backend}")